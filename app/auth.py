@@ -1,11 +1,14 @@
+import uuid
 from datetime import datetime, timedelta
+from typing import NamedTuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from . import crud, database
+from . import crud, database, revocations
 
 SECRET_KEY = "CHANGE_ME_SUPER_SECRET"
 ALGORITHM = "HS256"
@@ -27,7 +30,7 @@ def get_password_hash(password):
 
 def authenticate_user(db: Session, email: str, password: str):
     user = crud.get_user_by_email(db, email)
-    if not user:
+    if not user or not user.is_active:
         return None
     if not verify_password(password, user.hashed_password):
         return None
@@ -37,24 +40,79 @@ def authenticate_user(db: Session, email: str, password: str):
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "typ": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
+def create_refresh_token(
+    data: dict,
+    expires_delta: timedelta | None = None,
+    family_id: str | None = None,
+):
+    """Refresh JWT carrying its rotation family (``fam``) and a unique ``jti``.
+
+    A new login starts a new family; rotations pass the family on.  It is
+    typed ``refresh`` so it is never accepted as an access token.
+    """
     to_encode = data.copy()
     expire = datetime.utcnow() + (
         expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
     )
-    to_encode.update({"exp": expire})
+    to_encode.update(
+        {
+            "exp": expire,
+            "typ": "refresh",
+            "fam": family_id or uuid.uuid4().hex,
+            "jti": uuid.uuid4().hex,
+        }
+    )
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+class Principal(NamedTuple):
+    """The authenticated user as described by the access token's claims.
+
+    Routes only read ``id`` and the role flags, so the common path never
+    loads the ``User`` row.  Changing a user's roles or active flag bumps
+    ``token_version`` (see the flush hook below), which revokes the tokens
+    that still carry the old flags.
+    """
+
+    id: int
+    email: str
+    is_admin: bool
+    is_delivery_partner: bool
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_on_privilege_change(session, flush_context, instances):
+    expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    revocations.revoke_on_privilege_change(session, expires_at)
+
+
+def create_user_access_token(user, expires_delta: timedelta | None = None) -> str:
+    roles = [
+        role
+        for role, granted in (("admin", user.is_admin), ("delivery", user.is_delivery_partner))
+        if granted
+    ]
+    return create_access_token(
+        {
+            "sub": user.email,
+            "uid": user.id,
+            "roles": roles,
+            "ver": user.token_version or 0,
+            "jti": uuid.uuid4().hex,
+        },
+        expires_delta,
+    )
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(database.SessionLocal),
-):
+    db: Session = Depends(database.get_db),
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -67,7 +125,20 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    # refresh tokens issued before ``typ`` existed still carry ``fam``
+    if payload.get("typ", "access") != "access" or "fam" in payload:
+        raise credentials_exception
+    if "uid" in payload:
+        if revocations.is_revoked(payload):
+            raise credentials_exception
+        roles = payload.get("roles", ())
+        return Principal(payload["uid"], email, "admin" in roles, "delivery" in roles)
+    # tokens issued before claims were embedded: look the user up.  They
+    # carry no ``ver``, so any logout-all, password reset or role change
+    # (which bumps the user's token version) revokes them.
     user = crud.get_user_by_email(db, email=email)
-    if user is None:
+    if user is None or not user.is_active:
         raise credentials_exception
-    return user
+    if revocations.is_revoked({**payload, "uid": user.id}):
+        raise credentials_exception
+    return Principal(user.id, user.email, bool(user.is_admin), bool(user.is_delivery_partner))
@@ -0,0 +1,112 @@
+"""The category tree, kept in memory.
+
+Categories form a shallow tree (``parent_id``, plus a materialized ``path``
+used for moves).  The whole tree is small, so it is loaded in one query and
+cached for ``CACHE_SECONDS`` with everything the hot paths need
+precomputed:
+
+* ``rows`` / ``nested`` - the ``GET /categories`` payloads (flat and nested);
+* ``subtree[id]`` - the category and all its descendants, so filtering
+  products by any ancestor is one indexed ``category_id IN (...)``;
+* ``ancestors[id]`` - the category and its parents, for scoping rules
+  (coupons) that name an inner category.
+
+Writers call ``invalidate()``; other workers catch up within the TTL.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from . import database, models, schemas
+
+CACHE_SECONDS = float(os.getenv("CATEGORY_CACHE_SECONDS", "60"))
+
+
+class Tree:
+    def __init__(self, rows: List[schemas.CategoryListRow]):
+        self.rows = rows
+        children: Dict[Optional[int], list] = defaultdict(list)
+        ids = {row["id"] for row in rows}
+        for row in rows:
+            # an unknown parent (dangling reference) makes the row a root
+            parent = row["parent_id"] if row["parent_id"] in ids else None
+            children[parent].append(row)
+
+        self.ancestors: Dict[int, Tuple[int, ...]] = {}
+        order = []  # parents before children
+        stack = [(row, ()) for row in reversed(children[None])]
+        while stack:
+            row, parents = stack.pop()
+            lineage = (row["id"],) + parents
+            self.ancestors[row["id"]] = lineage
+            order.append(row["id"])
+            stack.extend((child, lineage) for child in reversed(children[row["id"]]))
+        descendants: Dict[int, list] = defaultdict(list)
+        for category_id in reversed(order):
+            for ancestor in self.ancestors[category_id]:
+                descendants[ancestor].append(category_id)
+        self.subtree: Dict[int, Tuple[int, ...]] = {
+            cid: tuple(sorted(members)) for cid, members in descendants.items()
+        }
+
+        def node(row) -> schemas.CategoryNodeRow:
+            return {
+                "id": row["id"],
+                "name": row["name"],
+                "children": [node(child) for child in children[row["id"]]],
+            }
+
+        self.nested = [node(row) for row in children[None]]
+
+
+def load() -> Tree:
+    db = database.SessionLocal()
+    try:
+        stmt = select(
+            models.Category.id, models.Category.name, models.Category.parent_id
+        ).order_by(models.Category.id)
+        return Tree([r._asdict() for r in db.execute(stmt)])
+    finally:
+        db.close()
+
+
+_cached: Optional[Tuple[float, Tree]] = None
+# bumped by invalidate(); a load that started before a write must not be
+# cached after it, or the old tree would be served for another TTL
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_tree() -> Tree:
+    global _cached
+    hit = _cached
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    generation = _generation
+    tree = load()
+    with _lock:
+        if generation == _generation:
+            _cached = (time.monotonic() + CACHE_SECONDS, tree)
+    return tree
+
+
+def subtree_ids(category_id: int) -> Tuple[int, ...]:
+    """``category_id`` and all its descendants (just itself if unknown)."""
+    return get_tree().subtree.get(category_id, (category_id,))
+
+
+def ancestor_ids(category_id: Optional[int]) -> Tuple[int, ...]:
+    if category_id is None:
+        return ()
+    return get_tree().ancestors.get(category_id, (category_id,))
+
+
+def invalidate() -> None:
+    global _cached, _generation
+    with _lock:
+        _generation += 1
+        _cached = None
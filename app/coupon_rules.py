@@ -0,0 +1,200 @@
+"""Coupon rules engine: the active coupons, compiled once and kept in memory.
+
+A coupon discounts ``discount_percent`` of the part of the cart it covers:
+the whole cart, one category (with everything below it), one brand, or a
+category+brand pair.  It
+applies when that part adds up to at least ``min_basket``, ``now`` falls
+inside its time window and the user has redeemed it fewer than
+``per_user_limit`` times.
+
+``RuleSet`` buckets the rules by scope, each bucket sorted by percentage
+(best first).  A ``Basket`` adds the cart up per scope once, so finding the
+best coupon walks only the buckets the cart touches and stops at the first
+applicable rule in each: within a bucket the covered amount is the same, so
+the highest percentage wins.  The compiled set is cached for
+``CACHE_SECONDS`` and dropped with ``invalidate()`` whenever coupons change.
+
+Redemption counts live in ``coupon_redemptions`` and are taken atomically by
+``crud.redeem_coupon`` in the order's transaction.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from . import category_tree, models
+
+CACHE_SECONDS = float(os.getenv("COUPON_CACHE_SECONDS", "30"))
+
+Scope = Tuple[Optional[int], Optional[str]]  # (category_id, brand)
+
+
+class Rule(NamedTuple):
+    id: int
+    code: str
+    discount_percent: int
+    min_basket: float
+    category_id: Optional[int]
+    brand: Optional[str]
+    per_user_limit: Optional[int]
+    starts_at: Optional[datetime.datetime]
+    ends_at: Optional[datetime.datetime]
+
+
+class Offer(NamedTuple):
+    rule: Rule
+    discount: float
+
+
+class Basket:
+    """Cart totals per coupon scope; built once per evaluation."""
+
+    def __init__(self, lines: Iterable[Tuple[Optional[int], Optional[str], float]]):
+        self.amounts: Dict[Scope, float] = defaultdict(float)
+        for category_id, brand, amount in lines:
+            scopes = {(None, None), (None, brand)}
+            for category in category_tree.ancestor_ids(category_id):
+                scopes.update(((category, None), (category, brand)))
+            for scope in scopes:
+                self.amounts[scope] += amount
+        self.total = self.amounts[(None, None)]
+
+    @classmethod
+    def from_cart(cls, cart_items) -> "Basket":
+        return cls(
+            (ci.product.category_id, ci.product.brand, ci.quantity * float(ci.product.price))
+            for ci in cart_items
+        )
+
+    def discount(self, rule: Rule, used: int, now: datetime.datetime) -> Optional[float]:
+        """What ``rule`` takes off this basket, or ``None`` if it does not apply."""
+        if rule.starts_at and now < rule.starts_at:
+            return None
+        if rule.ends_at and now >= rule.ends_at:
+            return None
+        if rule.per_user_limit is not None and used >= rule.per_user_limit:
+            return None
+        amount = self.amounts.get((rule.category_id, rule.brand), 0.0)
+        if amount <= 0 or amount < rule.min_basket:
+            return None
+        return round(amount * rule.discount_percent / 100, 2)
+
+
+class RuleSet:
+    def __init__(self, rules: Iterable[Rule]):
+        self.by_code: Dict[str, Rule] = {}
+        self.by_scope: Dict[Scope, list] = defaultdict(list)
+        for rule in rules:
+            self.by_code[rule.code] = rule
+            self.by_scope[(rule.category_id, rule.brand)].append(rule)
+        for bucket in self.by_scope.values():
+            bucket.sort(key=lambda r: (-r.discount_percent, r.id))
+        self.has_limits = any(r.per_user_limit is not None for r in self.by_code.values())
+
+    def best(
+        self, basket: Basket, used: Dict[int, int], now: Optional[datetime.datetime] = None
+    ) -> Optional[Offer]:
+        now = now or datetime.datetime.utcnow()
+        best, best_rank = None, None
+        for scope in basket.amounts:
+            for rule in self.by_scope.get(scope, ()):
+                discount = basket.discount(rule, used.get(rule.id, 0), now)
+                if discount is not None:
+                    # equal discounts: higher percentage, then older coupon, so
+                    # the answer does not depend on scope iteration order
+                    rank = (discount, rule.discount_percent, -rule.id)
+                    if best is None or rank > best_rank:
+                        best, best_rank = Offer(rule, discount), rank
+                    break
+        return best
+
+
+def compile_rules(db: Session, now: Optional[datetime.datetime] = None) -> RuleSet:
+    now = now or datetime.datetime.utcnow()
+    c = models.Coupon
+    rows = db.execute(
+        select(
+            c.id, c.code, c.discount_percent, c.min_basket, c.category_id,
+            c.brand, c.per_user_limit, c.starts_at, c.ends_at,
+        ).where(c.active.is_(True), or_(c.ends_at.is_(None), c.ends_at > now))
+    )
+    return RuleSet(
+        Rule(
+            r.id, r.code, r.discount_percent, float(r.min_basket or 0), r.category_id,
+            r.brand, r.per_user_limit, r.starts_at, r.ends_at,
+        )
+        for r in rows
+    )
+
+
+_cached: Optional[Tuple[float, RuleSet]] = None
+# bumped by invalidate(); rules compiled before a coupon write are not cached
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_rules(db: Session) -> RuleSet:
+    global _cached
+    hit = _cached
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    generation = _generation
+    rules = compile_rules(db)
+    with _lock:
+        if generation == _generation:
+            _cached = (time.monotonic() + CACHE_SECONDS, rules)
+    return rules
+
+
+def invalidate() -> None:
+    global _cached, _generation
+    with _lock:
+        _generation += 1
+        _cached = None
+
+
+def redemptions(db: Session, user_id: int) -> Dict[int, int]:
+    rows = db.execute(
+        select(models.CouponRedemption.coupon_id, models.CouponRedemption.count)
+        .where(models.CouponRedemption.user_id == user_id)
+    )
+    return {coupon_id: count for coupon_id, count in rows}
+
+
+def _used(db: Session, user_id: int, rule: Rule) -> int:
+    if rule.per_user_limit is None:
+        return 0
+    return db.execute(
+        select(models.CouponRedemption.count).where(
+            models.CouponRedemption.user_id == user_id,
+            models.CouponRedemption.coupon_id == rule.id,
+        )
+    ).scalar() or 0
+
+
+def find(db: Session, code: str) -> Optional[Rule]:
+    """The active coupon with ``code``, without checking it against a cart."""
+    return get_rules(db).by_code.get(code)
+
+
+def apply_code(db: Session, user_id: int, basket: Basket, code: str) -> Optional[Offer]:
+    """``code``'s discount on ``basket``; ``None`` when it does not apply.
+
+    Only coupons with a per-user limit cost a (primary key) lookup.
+    """
+    rule = find(db, code)
+    if rule is None:
+        return None
+    discount = basket.discount(rule, _used(db, user_id, rule), datetime.datetime.utcnow())
+    return Offer(rule, discount) if discount is not None else None
+
+
+def best_offer(db: Session, user_id: int, basket: Basket) -> Optional[Offer]:
+    rules = get_rules(db)
+    used = redemptions(db, user_id) if rules.has_limits else {}
+    return rules.best(basket, used)
@@ -1,10 +1,30 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, update
-from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    String,
+    bindparam,
+    case,
+    cast,
+    delete,
+    func,
+    literal,
+    null,
+    select,
+    type_coerce,
+    union_all,
+    update,
+)
+from typing import Iterator, List, Optional, Sequence
+from collections import Counter, defaultdict
 import datetime
+import hashlib
+import os
 
-from . import models, schemas, sms
-from .auth import get_password_hash
+from . import category_tree, coupon_rules, geo, menu, models, schemas, sms
+from . import auth
 from .email_utils import send_email
 
 
@@ -14,7 +34,7 @@ def get_user_by_email(db: Session, email: str):
 
 
 def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -27,28 +47,68 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 
 # Category CRUD
-def get_or_create_category(db: Session, name: str):
+def get_or_create_category(db: Session, name: str, parent_id: Optional[int] = None):
+    """The category called ``name``, created under ``parent_id`` if missing.
+
+    Names are unique across the tree, so an existing category is returned
+    wherever it is; callers compare its ``parent_id``.
+    """
     category = db.query(models.Category).filter(models.Category.name == name).first()
     if category:
         return category
-    category = models.Category(name=name)
+    category = models.Category(name=name, parent_id=parent_id)
     db.add(category)
+    db.flush()
+    category.path = f"{_category_path(db.get(models.Category, parent_id)) if parent_id else '/'}{category.id}/"
     db.commit()
     db.refresh(category)
     return category
 
 
+def _category_path(category: models.Category) -> str:
+    # rows created before paths existed are treated as roots
+    return category.path or f"/{category.id}/"
+
+
+def is_category_descendant(db: Session, category_id: int, ancestor: models.Category) -> bool:
+    """Whether ``category_id`` is ``ancestor`` or lies below it (by path)."""
+    category = db.get(models.Category, category_id)
+    return category is not None and _category_path(category).startswith(_category_path(ancestor))
+
+
 def update_category(
-    db: Session, category: models.Category, data: schemas.CategoryBase
+    db: Session, category: models.Category, data: schemas.CategoryCreate
 ) -> models.Category:
-    """Update a category with the provided data."""
+    """Update a category with the provided data.
+
+    Moving it under another parent rewrites the path prefix of its whole
+    subtree with one ``UPDATE``; the caller checks the move is not a cycle.
+    """
+    old_path = _category_path(category)
     for field, value in data.dict().items():
         setattr(category, field, value)
+    parent = db.get(models.Category, category.parent_id) if category.parent_id else None
+    new_path = f"{_category_path(parent) if parent else '/'}{category.id}/"
+    if new_path != category.path:
+        table = models.Category.__table__
+        db.execute(
+            update(table)
+            .where(table.c.path.startswith(old_path, autoescape=True))
+            .values(path=literal(new_path) + func.substr(table.c.path, len(old_path) + 1))
+            .execution_options(synchronize_session=False)
+        )
+        category.path = new_path
     db.commit()
     db.refresh(category)
     return category
 
 
+def has_subcategories(db: Session, category_id: int) -> bool:
+    return db.execute(
+        select(models.Category.id).where(models.Category.parent_id == category_id).limit(1)
+    ).first() is not None
+
+
 def delete_category(db: Session, category: models.Category) -> None:
     """Delete a category object."""
     db.delete(category)
@@ -57,13 +117,55 @@ def delete_category(db: Session, category: models.Category) -> None:
 
 # Product CRUD
 def create_product(db: Session, product: schemas.ProductCreate):
-    db_product = models.Product(**product.dict())
+    db_product = models.Product(**product.dict(), lowest_price_30d=product.price)
     db.add(db_product)
+    db.flush()
+    db.add(
+        models.PriceHistory(
+            product_id=db_product.id, price=product.price, mrp=product.mrp
+        )
+    )
+    counted = adjust_in_stock_counts(db, [(None, 0, product.category_id, product.stock)])
     db.commit()
+    if counted:
+        menu.bump()
     db.refresh(db_product)
     return db_product
 
 
+def _product_filters(
+    q: Optional[str] = None,
+    category_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+) -> list:
+    conditions = []
+    if q:
+        conditions.append(models.Product.name.ilike(f"%{q}%"))
+    if category_id:
+        # the category and everything below it, resolved from the cached tree
+        conditions.append(
+            models.Product.category_id.in_(category_tree.subtree_ids(category_id))
+        )
+    if brand:
+        conditions.append(models.Product.brand.ilike(f"%{brand}%"))
+    if price_min is not None:
+        conditions.append(models.Product.price >= price_min)
+    if price_max is not None:
+        conditions.append(models.Product.price <= price_max)
+    return conditions
+
+
+# id breaks ties (most products share a discount of 0) so offset pages
+# neither repeat nor skip rows; same direction, so one index scan serves both
+PRODUCT_SORTS = {
+    "price_asc": (models.Product.price.asc(), models.Product.id.asc()),
+    "price_desc": (models.Product.price.desc(), models.Product.id.desc()),
+    "discount_desc": (models.Product.effective_discount.desc(), models.Product.id.desc()),
+}
+
+
 def get_products(
     db: Session,
     skip: int = 0,
@@ -75,66 +177,924 @@ def get_products(
     price_max: Optional[float] = None,
     sort: Optional[str] = None,
 ):
-    query = db.query(models.Product)
-    if q:
-        query = query.filter(models.Product.name.ilike(f"%{q}%"))
-    if category_id:
-        query = query.filter(models.Product.category_id == category_id)
-    if brand:
-        query = query.filter(models.Product.brand.ilike(f"%{brand}%"))
-    if price_min is not None:
-        query = query.filter(models.Product.price >= price_min)
-    if price_max is not None:
-        query = query.filter(models.Product.price <= price_max)
-    if sort == "price_asc":
-        query = query.order_by(models.Product.price.asc())
-    elif sort == "price_desc":
-        query = query.order_by(models.Product.price.desc())
+    query = db.query(models.Product).filter(
+        *_product_filters(q, category_id, brand, price_min, price_max)
+    )
+    if sort in PRODUCT_SORTS:
+        query = query.order_by(*PRODUCT_SORTS[sort])
     return query.offset(skip).limit(limit).all()
 
 
+# Price bands for facet counts: (label, lower bound inclusive, upper exclusive)
+PRICE_BANDS = (
+    ("0-50", 0, 50),
+    ("50-100", 50, 100),
+    ("100-200", 100, 200),
+    ("200-500", 200, 500),
+    ("500+", 500, None),
+)
+
+
+def _price_band():
+    whens = [
+        (models.Product.price < upper, label)
+        for label, _, upper in PRICE_BANDS
+        if upper is not None
+    ]
+    return case(*whens, else_=PRICE_BANDS[-1][0])
+
+
+def get_product_facets(
+    db: Session,
+    q: Optional[str] = None,
+    category_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+) -> dict:
+    """Brand, category and price-band counts for a product search.
+
+    One round trip: three GROUP BYs joined with UNION ALL.  Each facet
+    ignores its own filter (so picking a brand still shows the other brands'
+    counts) but honours all the others.
+    """
+    search = (q, category_id)
+    by_brand = (
+        select(
+            literal("brand").label("facet"),
+            models.Product.brand.label("value"),
+            null().label("label"),
+            func.count().label("n"),
+        )
+        .where(*_product_filters(*search, None, price_min, price_max))
+        .where(models.Product.brand.isnot(None))
+        .group_by(models.Product.brand)
+    )
+    by_category = (
+        select(
+            literal("category").label("facet"),
+            # UNION columns must agree on type (brand and band are strings)
+            cast(models.Product.category_id, String),
+            models.Category.name,
+            func.count(),
+        )
+        .join(models.Category, models.Category.id == models.Product.category_id)
+        .where(*_product_filters(q, None, brand, price_min, price_max))
+        .group_by(models.Product.category_id, models.Category.name)
+    )
+    band = _price_band()
+    by_price = (
+        select(literal("price_band"), band, null(), func.count())
+        .where(*_product_filters(q, category_id, brand))
+        .group_by(band)
+    )
+    facets = {"brand": [], "category": [], "price_band": []}
+    for facet, value, label, count in db.execute(union_all(by_brand, by_category, by_price)):
+        if facet == "category":
+            facets[facet].append({"id": int(value), "name": label, "count": count})
+        else:
+            facets[facet].append({"value": value, "count": count})
+    facets["brand"].sort(key=lambda f: (-f["count"], f["value"]))
+    facets["category"].sort(key=lambda f: (-f["count"], f["name"]))
+    order = {label: i for i, (label, _, _) in enumerate(PRICE_BANDS)}
+    facets["price_band"].sort(key=lambda f: order[f["value"]])
+    return facets
+
+
+# ── Lean read paths ───────────────────────────────────────
+# List endpoints select plain columns and build dicts shaped like the
+# response schemas, skipping ORM hydration and response-model validation.
+# Numeric columns are read as floats so the rows serialize directly.
+_PRODUCT_ROW_COLUMNS = (
+    models.Product.id,
+    models.Product.name,
+    models.Product.description,
+    models.Product.brand,
+    type_coerce(models.Product.mrp, Float).label("mrp"),
+    type_coerce(models.Product.price, Float).label("price"),
+    models.Product.discount_pct,
+    models.Product.image_url,
+    models.Product.stock,
+    models.Product.reserved,
+    models.Product.category_id,
+    type_coerce(models.Product.effective_discount, Float).label("effective_discount"),
+    type_coerce(models.Product.lowest_price_30d, Float).label("lowest_price_30d"),
+    models.Category.name.label("category_name"),
+)
+
+# Columns a caller may project with ``fields=``; the two derived ones are
+# computed in SQL so the grid never needs the full row.
+PRODUCT_FIELDS = {c.key: c for c in _PRODUCT_ROW_COLUMNS}
+PRODUCT_FIELDS["in_stock"] = type_coerce(
+    models.Product.stock > func.coalesce(models.Product.reserved, 0), Boolean
+).label("in_stock")
+PRODUCT_CARD_FIELDS = (
+    "id",
+    "name",
+    "price",
+    "mrp",
+    "discount_pct",
+    "image_url",
+    "in_stock",
+    "category_name",
+)
+
+
+def get_product_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 20,
+    q: Optional[str] = None,
+    category_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    sort: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[schemas.ProductRow]:
+    """Same filtering as :func:`get_products`, returned as ``ProductRow`` dicts.
+
+    With ``fields`` (names from ``PRODUCT_FIELDS``) only those columns are
+    selected and each row is a flat dict with exactly those keys.
+    """
+    columns = [PRODUCT_FIELDS[f] for f in fields] if fields else _PRODUCT_ROW_COLUMNS
+    stmt = select(*columns).where(
+        *_product_filters(q, category_id, brand, price_min, price_max)
+    )
+    if not fields or "category_name" in fields:
+        stmt = stmt.outerjoin(
+            models.Category, models.Category.id == models.Product.category_id
+        )
+    if sort in PRODUCT_SORTS:
+        stmt = stmt.order_by(*PRODUCT_SORTS[sort])
+    result = db.execute(stmt.offset(skip).limit(limit))
+    if fields:
+        return [r._asdict() for r in result]
+    rows = []
+    for r in result:
+        row = r._asdict()
+        category_name = row.pop("category_name")
+        row["category"] = (
+            {"id": row["category_id"], "name": category_name}
+            if category_name is not None
+            else None
+        )
+        rows.append(row)
+    return rows
+
+
+def get_order_rows(db: Session) -> List[schemas.OrderRow]:
+    """All orders with their items, in two queries (orders, then items)."""
+    order_stmt = select(
+        models.Order.id,
+        models.Order.shipping_address_id,
+        models.Order.created_at,
+        models.Order.total,
+        models.Order.coupon_id,
+        models.Order.status,
+        models.Order.estimated_delivery,
+        models.Order.delivery_slot_id,
+    ).order_by(models.Order.id)
+    orders = {}
+    for r in db.execute(order_stmt):
+        row = r._asdict()
+        row["items"] = []
+        orders[row["id"]] = row
+    item_stmt = select(
+        models.OrderItem.order_id,
+        models.OrderItem.product_id,
+        models.OrderItem.quantity,
+        models.OrderItem.price,
+    ).order_by(models.OrderItem.order_id, models.OrderItem.id)
+    for order_id, product_id, quantity, price in db.execute(item_stmt):
+        order = orders.get(order_id)
+        if order is not None:
+            order["items"].append(
+                {"product_id": product_id, "quantity": quantity, "price": price}
+            )
+    return list(orders.values())
+
+
 def get_product(db: Session, product_id: int):
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
 
 # Order CRUD helpers
-def update_order_status(db: Session, order: models.Order, status: models.OrderStatus):
+def _set_order_status(order: models.Order, status: models.OrderStatus) -> None:
     order.status = status
-    db.commit()
+    if status == models.OrderStatus.paid and order.delivery_assignment is None:
+        order.ready_for_pickup_at = datetime.datetime.utcnow()
+    elif status != models.OrderStatus.paid:
+        order.ready_for_pickup_at = None
+
+
+def update_order_status(db: Session, order: models.Order, status: models.OrderStatus):
+    _set_order_status(order, status)
+    notify_order_status(db, [order], status)
     db.refresh(order)
+    return order
 
-    # Create a notification for the user
-    message = f"Order {order.id} status updated to {status.value}"
-    create_notification(db, order.user_id, message)
 
-    # Notify via SMS and email (best effort)
-    try:
-        sms.get_sms_driver().send_sms("", message)
-    except Exception:
-        pass
+def notify_order_status(
+    db: Session, orders: Sequence[models.Order], status: models.OrderStatus
+) -> None:
+    """Tell each order's customer it moved to ``status``.
+
+    The in-app notifications are committed together with whatever else the
+    session holds; SMS and email go out afterwards, best effort.
+    """
+    messages = [(order.user_id, f"Order {order.id} status updated to {status.value}") for order in orders]
+    for user_id, message in messages:
+        db.add(models.Notification(user_id=user_id, message=message))
+        _adjust_unread(db, user_id, 1)
+    db.commit()
+
+    for user_id, message in messages:
+        try:
+            sms.get_sms_driver().send_sms("", message)
+        except Exception:
+            pass
+
+        try:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+            if user:
+                send_email(user.email, "Order Update", message)
+        except Exception:
+            pass
+
+
+# Dialects whose ``SELECT ... FOR UPDATE SKIP LOCKED`` lets concurrent riders
+# claim different rows without waiting on each other.
+SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "mariadb"}
+
+
+def _claim(db: Session, order_id: Optional[int] = None) -> Optional[int]:
+    orders = models.Order.__table__
+    ready = orders.c.ready_for_pickup_at.isnot(None)
+    if order_id is not None:
+        result = db.execute(
+            update(orders)
+            .where(orders.c.id == order_id, ready)
+            .values(ready_for_pickup_at=None)
+        )
+        return order_id if result.rowcount == 1 else None
+
+    next_ready = (
+        select(orders.c.id)
+        .where(ready)
+        .order_by(orders.c.ready_for_pickup_at, orders.c.id)
+        .limit(1)
+    )
+    if db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS:
+        claimed = db.execute(next_ready.with_for_update(skip_locked=True)).scalar()
+        if claimed is not None:
+            db.execute(
+                update(orders)
+                .where(orders.c.id == claimed)
+                .values(ready_for_pickup_at=None)
+            )
+        return claimed
+    # SQLite serialises writers, so a single UPDATE ... RETURNING is atomic.
+    return db.execute(
+        update(orders)
+        .where(orders.c.id == next_ready.scalar_subquery(), ready)
+        .values(ready_for_pickup_at=None)
+        .returning(orders.c.id)
+    ).scalar()
+
+
+def claim_order_for_delivery(
+    db: Session, partner_id: int, order_id: Optional[int] = None
+) -> Optional[models.DeliveryAssignment]:
+    """Atomically take an order off the dispatch queue and assign it.
+
+    With ``order_id`` the given order is claimed, otherwise the oldest ready
+    order is.  Returns ``None`` when there is nothing (left) to claim, so two
+    riders racing for the same order never both get it.
+    """
+    claimed = _claim(db, order_id)
+    if claimed is None:
+        db.rollback()
+        return None
+    order = db.get(models.Order, claimed)
+    assignment = models.DeliveryAssignment(
+        order_id=order.id, delivery_partner_id=partner_id
+    )
+    distance = None
+    rider = get_rider_location(db, partner_id)
+    address = get_address(db, order.shipping_address_id) if order.shipping_address_id else None
+    if rider and address and address.latitude is not None and address.longitude is not None:
+        distance = geo.haversine_km(
+            rider.latitude, rider.longitude, address.latitude, address.longitude
+        )
+    minutes = geo.eta_minutes(distance, active_delivery_count(db, partner_id))
+    order.estimated_delivery = datetime.datetime.utcnow() + datetime.timedelta(minutes=minutes)
+    db.add(assignment)
+    update_order_status(db, order, models.OrderStatus.out_for_delivery)
+    db.refresh(assignment)
+    return assignment
+
+
+def claim_orders_for_delivery(
+    db: Session, partner_id: int, order_ids: Sequence[int]
+) -> List[models.Order]:
+    """Take the given orders off the dispatch queue and assign them to the rider.
+
+    Orders another rider got first are skipped.  Nothing is committed: the
+    caller stores the route's ETAs and commits the whole batch with
+    ``notify_order_status``, or rolls back and releases every order.
+    """
+    orders = []
+    for order_id in order_ids:
+        if _claim(db, order_id) is None:
+            continue
+        order = db.get(models.Order, order_id)
+        db.add(models.DeliveryAssignment(order_id=order_id, delivery_partner_id=partner_id))
+        _set_order_status(order, models.OrderStatus.out_for_delivery)
+        orders.append(order)
+    return orders
+
+
+def active_delivery_count(db: Session, partner_id: int) -> int:
+    """Number of assignments the rider has picked up but not delivered."""
+    return (
+        db.query(func.count(models.DeliveryAssignment.id))
+        .filter(
+            models.DeliveryAssignment.delivery_partner_id == partner_id,
+            models.DeliveryAssignment.delivered_at.is_(None),
+        )
+        .scalar()
+    )
+
+
+def get_rider_location(db: Session, user_id: int) -> Optional[models.RiderLocation]:
+    return db.get(models.RiderLocation, user_id)
+
 
+def update_rider_location(
+    db: Session, user_id: int, location: schemas.Location
+) -> models.RiderLocation:
+    loc = db.get(models.RiderLocation, user_id)
+    if loc is None:
+        loc = models.RiderLocation(user_id=user_id)
+        db.add(loc)
+    loc.latitude = location.latitude
+    loc.longitude = location.longitude
+    loc.updated_at = datetime.datetime.utcnow()
+    db.commit()
+    db.refresh(loc)
+    return loc
+
+
+GEO_MAX_RINGS = 10
+
+
+def nearest_ready_orders(
+    db: Session, lat: float, lon: float, limit: int = 20, max_rings: int = GEO_MAX_RINGS
+) -> List[tuple]:
+    """Return up to ``limit`` ``(distance_km, order_id)`` pairs, nearest first.
+
+    Grid rings around the rider are searched outwards until ``limit`` ready
+    orders are found and no unsearched cell can hold a closer one
+    (:func:`geo.min_ring_distance_km`), or ``max_rings`` is reached.  Only ids
+    and coordinates are read here.
+    """
+    orders = models.Order.__table__
+    addresses = models.Address.__table__
+    found = []
+    for ring in range(max_rings + 1):
+        rows = db.execute(
+            select(orders.c.id, addresses.c.latitude, addresses.c.longitude)
+            .join(addresses, addresses.c.id == orders.c.shipping_address_id)
+            .where(
+                orders.c.ready_for_pickup_at.isnot(None),
+                orders.c.delivery_cell.in_(geo.ring_cells(lat, lon, ring)),
+            )
+        )
+        found.extend(
+            (geo.haversine_km(lat, lon, r.latitude, r.longitude), r.id) for r in rows
+        )
+        if len(found) >= limit:
+            found.sort()
+            if found[limit - 1][0] <= geo.min_ring_distance_km(lat, ring):
+                break
+    found.sort()
+    return found[:limit]
+
+
+def get_order_coordinates(db: Session, order_ids: List[int]) -> dict:
+    """Map order id -> ``(latitude, longitude)`` of its shipping address."""
+    orders = models.Order.__table__
+    addresses = models.Address.__table__
+    rows = db.execute(
+        select(orders.c.id, addresses.c.latitude, addresses.c.longitude)
+        .join(addresses, addresses.c.id == orders.c.shipping_address_id)
+        .where(
+            orders.c.id.in_(order_ids),
+            addresses.c.latitude.isnot(None),
+            addresses.c.longitude.isnot(None),
+        )
+    )
+    return {r.id: (r.latitude, r.longitude) for r in rows}
+
+
+# ---- Delivery slots ----
+def create_delivery_slot(
+    db: Session, slot: schemas.DeliverySlotBase
+) -> Optional[models.DeliverySlot]:
+    """Create the slot; ``None`` if its zone already has one at ``starts_at``."""
+    db_slot = models.DeliverySlot(**slot.dict())
+    db.add(db_slot)
     try:
-        user = db.query(models.User).filter(models.User.id == order.user_id).first()
-        if user:
-            send_email(user.email, "Order Update", message)
-    except Exception:
-        pass
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(db_slot)
+    return db_slot
+
+
+def book_delivery_slot(db: Session, slot_id: int) -> bool:
+    """Take one unit of slot capacity; ``False`` if the slot is full.
+
+    A single conditional ``UPDATE`` so concurrent checkouts can never book
+    more than ``capacity``.  The caller commits.
+    """
+    slots = models.DeliverySlot.__table__
+    result = db.execute(
+        update(slots)
+        .where(slots.c.id == slot_id, slots.c.booked < slots.c.capacity)
+        .values(booked=slots.c.booked + 1)
+    )
+    return result.rowcount == 1
+
+
+def redeem_coupon(
+    db: Session, coupon_id: int, user_id: int, limit: Optional[int] = None
+) -> bool:
+    """Count one redemption of a coupon by a user; ``False`` at ``limit``.
+
+    A conditional ``UPDATE`` like :func:`book_delivery_slot`; the first
+    redemption inserts the counter row instead (in a savepoint, so losing
+    the race to a concurrent checkout falls back to the update).  The caller
+    commits.
+    """
+    table = models.CouponRedemption.__table__
+    pair = (table.c.coupon_id == coupon_id, table.c.user_id == user_id)
+    below_limit = (table.c.count < limit,) if limit is not None else ()
+    for _ in range(2):
+        result = db.execute(
+            update(table).where(*pair, *below_limit).values(count=table.c.count + 1)
+        )
+        if result.rowcount == 1:
+            return True
+        if db.execute(select(table.c.id).where(*pair)).first() is not None:
+            return False
+        if limit is not None and limit < 1:
+            return False
+        try:
+            with db.begin_nested():
+                db.execute(table.insert().values(coupon_id=coupon_id, user_id=user_id, count=1))
+            return True
+        except IntegrityError:
+            continue
+    return False
+
+
+def redeem_order_coupon(db: Session, order: models.Order) -> bool:
+    """Count the order's coupon against its user's limit, once it is paid.
+
+    Pending orders only check the limit, so unpaid ones never use it up.
+    ``False`` when the limit was reached in the meantime; the caller commits.
+    """
+    if order.coupon_id is None:
+        return True
+    limit = db.scalar(
+        select(models.Coupon.per_user_limit).where(models.Coupon.id == order.coupon_id)
+    )
+    return redeem_coupon(db, order.coupon_id, order.user_id, limit)
+
+
+def list_available_slots(
+    db: Session, zone: str, after: datetime.datetime, limit: int = 50
+) -> List[dict]:
+    slots = models.DeliverySlot.__table__
+    rows = db.execute(
+        select(
+            slots.c.id,
+            slots.c.zone,
+            slots.c.starts_at,
+            slots.c.ends_at,
+            (slots.c.capacity - slots.c.booked).label("remaining"),
+        )
+        .where(
+            slots.c.zone == zone,
+            slots.c.starts_at > after,
+            slots.c.booked < slots.c.capacity,
+        )
+        .order_by(slots.c.starts_at)
+        .limit(limit)
+    )
+    return [dict(r._mapping) for r in rows]
 
-    return order
+
+EXPORT_PAGE_SIZE = 1000
+
+
+def iter_orders_for_export(
+    db: Session,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    status: Optional[models.OrderStatus] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> Iterator[tuple]:
+    """Yield ``(order_row, item_rows)`` for matching orders in id order.
+
+    Orders are paged with a keyset on ``id`` and each page's items are loaded
+    with one ``IN`` query, so memory stays bounded by ``page_size`` no matter
+    how many orders match.  Plain rows are returned, not ORM objects.
+    """
+    orders = models.Order.__table__
+    items = models.OrderItem.__table__
+    last_id = 0
+    while True:
+        stmt = select(orders).where(orders.c.id > last_id)
+        if start is not None:
+            stmt = stmt.where(orders.c.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(orders.c.created_at < end)
+        if status is not None:
+            stmt = stmt.where(orders.c.status == status)
+        page = db.execute(stmt.order_by(orders.c.id).limit(page_size)).all()
+        if not page:
+            return
+        ids = [row.id for row in page]
+        lines = defaultdict(list)
+        for item in db.execute(
+            select(items.c.order_id, items.c.product_id, items.c.quantity, items.c.price)
+            .where(items.c.order_id.in_(ids))
+            .order_by(items.c.order_id, items.c.id)
+        ):
+            lines[item.order_id].append(item)
+        for row in page:
+            yield row, lines.get(row.id, [])
+        if len(page) < page_size:
+            return
+        last_id = ids[-1]
 
 
 # ----- Additional CRUD helpers -----
+# ---- Price history ----
+PRICE_WINDOW = datetime.timedelta(days=30)
+
+
+def _lowest_after_change(
+    lowest, until, old_price, new_price, now: datetime.datetime
+) -> tuple:
+    """``(lowest_price_30d, lowest_price_until)`` once the price moves at ``now``.
+
+    The old price stays in the 30-day window until ``now + PRICE_WINDOW``;
+    when it was the lowest, that is when the lowest expires (and has to be
+    recomputed by :func:`refresh_lowest_prices`).
+    """
+    if lowest is None and old_price is not None:
+        lowest, until = old_price, None
+    if until is None and lowest is not None:
+        until = now + PRICE_WINDOW
+    if lowest is None or new_price <= lowest:
+        return new_price, None
+    return lowest, until
+
+
 def update_product(db: Session, product: models.Product, data: schemas.ProductCreate):
+    old_price, old_mrp = product.price, product.mrp
+    reserved = product.reserved or 0
+    stock_change = (
+        product.category_id, (product.stock or 0) - reserved, data.category_id, data.stock - reserved
+    )
     for field, value in data.dict().items():
         setattr(product, field, value)
+    counted = adjust_in_stock_counts(db, [stock_change])
+    if _price_changed(old_price, data.price) or _price_changed(old_mrp, data.mrp):
+        now = datetime.datetime.utcnow()
+        if _price_changed(old_price, data.price):
+            product.lowest_price_30d, product.lowest_price_until = _lowest_after_change(
+                product.lowest_price_30d, product.lowest_price_until, old_price, data.price, now
+            )
+        db.add(
+            models.PriceHistory(
+                product_id=product.id, price=data.price, mrp=data.mrp, changed_at=now
+            )
+        )
     db.commit()
+    if counted:
+        menu.bump()
     db.refresh(product)
     return product
 
 
+def _price_changed(old, new) -> bool:
+    if old is None or new is None:
+        return old is not new
+    return float(old) != float(new)
+
+
+def refresh_lowest_prices(
+    db: Session, now: Optional[datetime.datetime] = None, batch_size: int = 1000
+) -> int:
+    """Recompute the 30-day lowest price where it has left the window.
+
+    Only products whose ``lowest_price_until`` has passed are touched; their
+    price periods overlapping the window come from ``price_history`` (the end
+    of each period is the next row's ``changed_at``).
+    """
+    now = now or datetime.datetime.utcnow()
+    cutoff = now - PRICE_WINDOW
+    product = models.Product.__table__
+    history = models.PriceHistory.__table__
+    total = 0
+    while True:
+        current = {
+            row.id: row.price
+            for row in db.execute(
+                select(product.c.id, product.c.price)
+                .where(product.c.lowest_price_until < now)
+                .limit(batch_size)
+            )
+        }
+        if not current:
+            return total
+        ended_at = func.lead(history.c.changed_at, type_=DateTime).over(
+            partition_by=history.c.product_id, order_by=history.c.changed_at
+        )
+        periods = (
+            select(history.c.product_id, history.c.price, ended_at.label("ended_at"))
+            .where(history.c.product_id.in_(list(current)))
+            .subquery()
+        )
+        lowest = {pid: (price, None) for pid, price in current.items()}
+        for row in db.execute(
+            select(periods).where(
+                (periods.c.ended_at.is_(None)) | (periods.c.ended_at > cutoff)
+            )
+        ):
+            if row.ended_at is None:
+                continue  # the current price, already in ``lowest``
+            price, until = lowest[row.product_id]
+            expires = row.ended_at + PRICE_WINDOW
+            if row.price < price or (row.price == price and until and expires > until):
+                lowest[row.product_id] = (row.price, expires)
+        db.execute(
+            update(product)
+            .where(product.c.id == bindparam("b_id"))
+            .values(lowest_price_30d=bindparam("b_lowest"), lowest_price_until=bindparam("b_until")),
+            [{"b_id": pid, "b_lowest": p, "b_until": u} for pid, (p, u) in lowest.items()],
+        )
+        db.commit()
+        total += len(current)
+
+
+BULK_UPDATE_CHUNK = 500
+# attempts for an absolute stock write whose row keeps changing underneath
+BULK_UPDATE_RETRIES = 3
+
+
+def bulk_update_products(
+    db: Session, items: List[schemas.ProductBulkUpdateItem]
+) -> dict:
+    """Apply partial stock/price updates to many products in one transaction.
+
+    Target rows are read with one ``IN`` query per chunk (for the price
+    bookkeeping), then every item is applied with its own conditional
+    ``UPDATE ... RETURNING``.  Stock moves in SQL: a ``stock_delta`` is
+    ``stock = stock + delta``, an absolute ``stock`` only applies while the
+    row still holds the stock it was computed against (re-read and retried
+    otherwise), so a checkout or cart reservation committing meanwhile is
+    never overwritten.  A change that would push stock below the units
+    already ``reserved`` by carts (or below zero) is rejected and the rest
+    of the batch still applies.  The in-stock counters move by the values
+    the statements return.  Price/mrp changes are appended to
+    ``price_history`` with one executemany ``INSERT``.
+    """
+    table = models.Product.__table__
+    ids = sorted({item.id for item in items})
+    current = {}
+    for start in range(0, len(ids), BULK_UPDATE_CHUNK):
+        chunk = ids[start : start + BULK_UPDATE_CHUNK]
+        rows = db.execute(
+            select(
+                table.c.id,
+                table.c.stock,
+                table.c.price,
+                table.c.mrp,
+                table.c.discount_pct,
+                table.c.lowest_price_30d,
+                table.c.lowest_price_until,
+                table.c.category_id,
+            )
+            .where(table.c.id.in_(chunk))
+            .with_for_update()
+        )
+        for row in rows:
+            current[row.id] = dict(row._mapping)
+
+    now = datetime.datetime.utcnow()
+    stock = func.coalesce(table.c.stock, 0)
+    reserved = func.coalesce(table.c.reserved, 0)
+    # built once; fields an item leaves out are bound as NULL and kept
+    b_lowest = bindparam("b_lowest", type_=table.c.lowest_price_30d.type)
+    base = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            price=func.coalesce(bindparam("b_price", type_=table.c.price.type), table.c.price),
+            mrp=func.coalesce(bindparam("b_mrp", type_=table.c.mrp.type), table.c.mrp),
+            discount_pct=func.coalesce(
+                bindparam("b_discount_pct", type_=table.c.discount_pct.type), table.c.discount_pct
+            ),
+            lowest_price_30d=func.coalesce(b_lowest, table.c.lowest_price_30d),
+            lowest_price_until=case(
+                (b_lowest.is_(None), table.c.lowest_price_until),
+                else_=bindparam("b_until", type_=table.c.lowest_price_until.type),
+            ),
+        )
+        .returning(table.c.stock, table.c.reserved)
+    )
+    add_stock = base.where(stock + bindparam("b_delta") >= reserved).values(
+        stock=stock + bindparam("b_delta")
+    )
+    set_stock = base.where(stock == bindparam("b_seen"), reserved <= bindparam("b_stock")).values(
+        stock=bindparam("b_stock")
+    )
+    not_found, rejected, changed, repriced = [], [], set(), set()
+    stock_changes = []
+    for item in items:
+        row = current.get(item.id)
+        if row is None:
+            not_found.append(item.id)
+            continue
+        if item.stock is not None and item.stock_delta is not None:
+            rejected.append(item.id)
+            continue
+        params = {
+            "b_id": item.id,
+            "b_price": item.price,
+            "b_mrp": item.mrp,
+            "b_discount_pct": item.discount_pct,
+            "b_lowest": None,
+            "b_until": None,
+        }
+        if item.price is not None and _price_changed(row["price"], item.price):
+            params["b_lowest"], params["b_until"] = _lowest_after_change(
+                row["lowest_price_30d"], row["lowest_price_until"], row["price"], item.price, now
+            )
+
+        old_stock = None
+        if item.stock_delta is not None:
+            result = db.execute(add_stock, {**params, "b_delta": item.stock_delta}).first()
+            if result is not None:
+                old_stock = result.stock - item.stock_delta
+        elif item.stock is not None:
+            for _ in range(BULK_UPDATE_RETRIES):
+                old_stock = row["stock"] or 0
+                result = db.execute(
+                    set_stock, {**params, "b_seen": old_stock, "b_stock": item.stock}
+                ).first()
+                if result is not None:
+                    break
+                # moved since it was read (or reserved too much): look again
+                seen = db.execute(
+                    select(table.c.stock, table.c.reserved).where(table.c.id == item.id)
+                ).first()
+                if seen is None or (seen.reserved or 0) > item.stock:
+                    break
+                row["stock"] = seen.stock
+        else:
+            result = db.execute(base, params).first()
+        if result is None:
+            rejected.append(item.id)
+            continue
+
+        if old_stock is not None:
+            held = result.reserved or 0
+            stock_changes.append(
+                (row["category_id"], old_stock - held, row["category_id"], result.stock - held)
+            )
+            row["stock"] = result.stock
+        if params["b_lowest"] is not None:
+            row["lowest_price_30d"], row["lowest_price_until"] = params["b_lowest"], params["b_until"]
+            repriced.add(item.id)
+        if item.mrp is not None and _price_changed(row["mrp"], item.mrp):
+            repriced.add(item.id)
+        for field in ("price", "mrp", "discount_pct"):
+            value = getattr(item, field)
+            if value is not None:
+                row[field] = value
+        changed.add(item.id)
+
+    if repriced:
+        db.execute(
+            models.PriceHistory.__table__.insert(),
+            [
+                {
+                    "product_id": pid,
+                    "price": current[pid]["price"],
+                    "mrp": current[pid]["mrp"],
+                    "changed_at": now,
+                }
+                for pid in sorted(repriced)
+            ],
+        )
+    counted = adjust_in_stock_counts(db, stock_changes)
+    db.commit()
+    if counted:
+        menu.bump()
+    return {"updated": len(changed), "not_found": not_found, "rejected": rejected}
+
+
 def delete_product(db: Session, product: models.Product):
+    available = (product.stock or 0) - (product.reserved or 0)
+    counted = adjust_in_stock_counts(db, [(product.category_id, available, None, 0)])
     db.delete(product)
     db.commit()
+    if counted:
+        menu.bump()
+
+
+# ---- Per-category in-stock counts ----
+def adjust_in_stock_counts(db: Session, changes) -> bool:
+    """Move ``categories.in_stock_count`` for products whose availability/category changed.
+
+    A product is in stock while ``stock > reserved``, the same test as the
+    ``in_stock`` product field.  ``changes`` holds ``(old_category_id,
+    old_available, new_category_id, new_available)`` per product, where
+    available is ``stock - reserved``; the counters move with one
+    executemany ``UPDATE``.  Nothing is committed; returns whether any
+    counter moved (the caller bumps ``menu`` after committing).
+    """
+    deltas = defaultdict(int)
+    for old_category, old_available, new_category, new_available in changes:
+        if old_category is not None and (old_available or 0) > 0:
+            deltas[old_category] -= 1
+        if new_category is not None and (new_available or 0) > 0:
+            deltas[new_category] += 1
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return False
+    table = models.Category.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(in_stock_count=func.coalesce(table.c.in_stock_count, 0) + bindparam("b_delta")),
+        [{"b_id": k, "b_delta": v} for k, v in sorted(deltas.items())],
+    )
+    return True
+
+
+def recount_in_stock(db: Session) -> int:
+    """Recompute every category's in-stock count; returns how many were off.
+
+    The counters are maintained incrementally, this only repairs drift from
+    writes that bypass crud (and backfills databases that predate them).  It
+    is one ``UPDATE`` whose new value is counted in the statement itself, so
+    a counter moved by a concurrent write is never overwritten with a count
+    taken before it.
+    """
+    product = models.Product.__table__
+    category = models.Category.__table__
+    actual = (
+        select(func.count())
+        .select_from(product)
+        .where(
+            product.c.category_id == category.c.id,
+            product.c.stock > func.coalesce(product.c.reserved, 0),
+        )
+        .scalar_subquery()
+    )
+    wrong = db.execute(
+        update(category)
+        .where(func.coalesce(category.c.in_stock_count, -1) != actual)
+        .values(in_stock_count=actual)
+    ).rowcount
+    db.commit()
+    if wrong:
+        menu.bump()
+    return wrong
+
+
+def reserve_stock(db: Session, product: models.Product, diff: int) -> bool:
+    """Move ``product.reserved`` by ``diff`` (cart add/change/remove).
+
+    Reserving the last free units takes the product out of stock, releasing
+    them puts it back, so the category counter moves with it.  Nothing is
+    committed; returns whether a counter moved (bump ``menu`` after commit).
+    """
+    reserved = product.reserved or 0
+    available = (product.stock or 0) - reserved
+    product.reserved = reserved + diff
+    return adjust_in_stock_counts(
+        db, [(product.category_id, available, product.category_id, available - diff)]
+    )
 
 
 def create_address(db: Session, user_id: int, address: schemas.AddressBase):
@@ -199,24 +1159,85 @@ def get_wallet_balance(db: Session, user_id: int) -> float:
     return sum(tx.amount for tx in total)
 
 
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+
+
+def _adjust_unread(db: Session, user_id: int, delta: int) -> None:
+    user = models.User.__table__
+    db.execute(
+        update(user)
+        .where(user.c.id == user_id)
+        .values(unread_notifications=user.c.unread_notifications + delta)
+    )
+
+
 def create_notification(db: Session, user_id: int, message: str):
     notif = models.Notification(user_id=user_id, message=message)
     db.add(notif)
+    _adjust_unread(db, user_id, 1)
     db.commit()
     db.refresh(notif)
     return notif
 
 
+def get_notifications(
+    db: Session, user_id: int, skip: int = 0, limit: int = 20
+) -> List[models.Notification]:
+    """A page of the user's notifications, newest first."""
+    n = models.Notification
+    return (
+        db.query(n)
+        .filter(n.user_id == user_id)
+        .order_by(n.created_at.desc(), n.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def unread_notification_count(db: Session, user_id: int) -> int:
+    return db.scalar(
+        select(models.User.unread_notifications).where(models.User.id == user_id)
+    ) or 0
+
+
 def mark_notification_read(
     db: Session, notif: models.Notification
 ) -> models.Notification:
-    notif.read = True
+    n = models.Notification.__table__
+    # conditional, so concurrent calls decrement the counter only once
+    changed = db.execute(
+        update(n).where(n.c.id == notif.id, n.c.read.is_(False)).values(read=True)
+    ).rowcount
+    if changed:
+        _adjust_unread(db, notif.user_id, -1)
     db.commit()
     db.refresh(notif)
     return notif
 
 
+def mark_all_notifications_read(db: Session, user_id: int) -> int:
+    """Mark every unread notification of the user read in one statement."""
+    n = models.Notification.__table__
+    changed = db.execute(
+        update(n).where(n.c.user_id == user_id, n.c.read.is_(False)).values(read=True)
+    ).rowcount
+    if changed:
+        _adjust_unread(db, user_id, -changed)
+    db.commit()
+    return changed
+
+
 # ---- Cart helpers ----
+def get_cart_items(db: Session, user_id: int) -> List[models.CartItem]:
+    return (
+        db.query(models.CartItem)
+        .options(joinedload(models.CartItem.product))
+        .filter(models.CartItem.user_id == user_id)
+        .all()
+    )
+
+
 def update_cart_item_quantity(
     db: Session, item: models.CartItem, quantity: int
 ) -> models.CartItem:
@@ -231,6 +1252,130 @@ def delete_cart_item(db: Session, item: models.CartItem) -> None:
     db.commit()
 
 
+def get_cart_summary(
+    db: Session, user_id: int, coupon_code: Optional[str] = None
+) -> schemas.CartSummaryRow:
+    """The user's cart lines with product details and the basket totals.
+
+    One statement: each line is joined to its product and the subtotal is a
+    window sum repeated on every row.  ``coupon_code`` is evaluated by the
+    in-memory rules engine; ``coupon_code`` in the result is only set when
+    the coupon applies to this cart.
+    """
+    product = models.Product
+    price = type_coerce(product.price, Float)
+    line_total = models.CartItem.quantity * price
+    stmt = (
+        select(
+            models.CartItem.id,
+            models.CartItem.product_id,
+            product.name,
+            product.brand,
+            product.category_id,
+            product.image_url,
+            price.label("price"),
+            type_coerce(product.mrp, Float).label("mrp"),
+            models.CartItem.quantity,
+            type_coerce(line_total, Float).label("line_total"),
+            (func.coalesce(product.stock, 0) - func.coalesce(product.reserved, 0)).label("available"),
+            type_coerce(func.sum(line_total).over(), Float).label("subtotal"),
+        )
+        .join(product, product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )
+    rows = [r._asdict() for r in db.execute(stmt)]
+    subtotal = round(rows[0]["subtotal"], 2) if rows else 0.0
+    for row in rows:
+        del row["subtotal"]
+        # ``reserved`` already counts this line, so the line can be filled
+        # as long as carts haven't reserved more than there is
+        row["in_stock"] = row["available"] >= 0
+    offer = None
+    if coupon_code:
+        basket = coupon_rules.Basket(
+            (row["category_id"], row["brand"], row["line_total"]) for row in rows
+        )
+        offer = coupon_rules.apply_code(db, user_id, basket, coupon_code)
+    discount = offer.discount if offer else 0.0
+    return {
+        "items": rows,
+        "subtotal": subtotal,
+        "coupon_code": offer.rule.code if offer else None,
+        "discount": discount,
+        "total": round(subtotal - discount, 2),
+    }
+
+
+def set_cart_quantities(db: Session, user_id: int, quantities: dict) -> dict:
+    """Set the cart quantity of several products at once (``0`` removes them).
+
+    Products are read (and locked where supported) with one ``IN`` query and
+    reservations move by the difference in one executemany ``UPDATE``.  All
+    or nothing: if any product is unknown or lacks stock, nothing changes and
+    the offending ids are returned under ``not_found`` / ``insufficient``.
+    """
+    table = models.Product.__table__
+    ids = sorted(quantities)
+    products = {
+        row.id: row
+        for row in db.execute(
+            select(table.c.id, table.c.stock, table.c.reserved, table.c.category_id)
+            .where(table.c.id.in_(ids))
+            .with_for_update()
+        )
+    }
+    lines = defaultdict(list)
+    for item in db.execute(
+        select(models.CartItem)
+        .where(models.CartItem.user_id == user_id, models.CartItem.product_id.in_(ids))
+        .order_by(models.CartItem.id)
+    ).scalars():
+        lines[item.product_id].append(item)
+
+    not_found, insufficient, reserve = [], [], {}
+    for product_id in ids:
+        row = products.get(product_id)
+        if row is None:
+            not_found.append(product_id)
+            continue
+        diff = quantities[product_id] - sum(i.quantity for i in lines[product_id])
+        if diff > 0 and (row.stock or 0) - (row.reserved or 0) < diff:
+            insufficient.append(product_id)
+        elif diff:
+            reserve[product_id] = diff
+    if not_found or insufficient:
+        db.rollback()
+        return {"not_found": not_found, "insufficient": insufficient}
+
+    for product_id in ids:
+        quantity, items = quantities[product_id], lines[product_id]
+        if items and quantity:
+            items[0].quantity = quantity
+            items = items[1:]
+        elif quantity:
+            db.add(models.CartItem(user_id=user_id, product_id=product_id, quantity=quantity))
+        for item in items:
+            db.delete(item)
+    if reserve:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(reserved=func.coalesce(table.c.reserved, 0) + bindparam("b_diff")),
+            [{"b_id": k, "b_diff": v} for k, v in reserve.items()],
+        )
+    changes = []
+    for product_id, diff in reserve.items():
+        row = products[product_id]
+        available = (row.stock or 0) - (row.reserved or 0)
+        changes.append((row.category_id, available, row.category_id, available - diff))
+    counted = adjust_in_stock_counts(db, changes)
+    db.commit()
+    if counted:
+        menu.bump()
+    return {"not_found": [], "insufficient": []}
+
+
 # ---- Wishlist helpers ----
 def add_to_wishlist(db: Session, user_id: int, product_id: int) -> models.WishlistItem:
     item = (
@@ -267,11 +1412,66 @@ def list_wishlist(db: Session, user_id: int) -> List[models.WishlistItem]:
 
 
 # ---- Auth helpers ----
+MAX_SESSIONS_PER_USER = int(os.getenv("MAX_SESSIONS_PER_USER", "10"))
+PURGE_BATCH_SIZE = 10_000
+
+
+def _delete_in_batches(db: Session, model, condition, batch_size: int) -> int:
+    """Delete rows matching ``condition`` ``batch_size`` ids at a time.
+
+    Each batch is its own short transaction, so purging a large backlog never
+    holds long locks; selecting ids first keeps it portable (no LIMIT on
+    DELETE or in IN-subqueries).
+    """
+    batch = select(model.id).where(condition).limit(batch_size)
+    total = 0
+    while True:
+        ids = db.scalars(batch).all()
+        if ids:
+            db.execute(
+                delete(model)
+                .where(model.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 def create_refresh_token_record(
-    db: Session, user: models.User, token: str, expires_at: datetime.datetime
+    db: Session,
+    user: models.User,
+    token: str,
+    expires_at: datetime.datetime,
+    family_id: str,
 ):
-    db_obj = models.RefreshToken(user_id=user.id, token=token, expires_at=expires_at)
+    """Store a new login's refresh token, evicting the user's oldest sessions
+    beyond ``MAX_SESSIONS_PER_USER``."""
+    db_obj = models.RefreshToken(
+        user_id=user.id,
+        token_hash=hash_token(token),
+        family_id=family_id,
+        expires_at=expires_at,
+    )
     db.add(db_obj)
+    db.flush()
+    evicted = db.scalars(
+        select(models.RefreshToken.id)
+        .where(models.RefreshToken.user_id == user.id)
+        .order_by(models.RefreshToken.id.desc())
+        .offset(MAX_SESSIONS_PER_USER)
+    ).all()
+    if evicted:
+        db.execute(
+            delete(models.RefreshToken)
+            .where(models.RefreshToken.id.in_(evicted))
+            .execution_options(synchronize_session=False)
+        )
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -279,13 +1479,80 @@ def create_refresh_token_record(
 
 def get_refresh_token(db: Session, token: str) -> Optional[models.RefreshToken]:
     return (
-        db.query(models.RefreshToken).filter(models.RefreshToken.token == token).first()
+        db.query(models.RefreshToken)
+        .filter(models.RefreshToken.token_hash == hash_token(token))
+        .first()
     )
 
 
+def rotate_refresh_token(
+    db: Session,
+    old: models.RefreshToken,
+    token: str,
+    expires_at: datetime.datetime,
+) -> Optional[models.RefreshToken]:
+    """Replace ``old`` by ``token`` in the same family, in one transaction.
+
+    Returns ``None`` when ``old`` was already gone: a concurrent refresh
+    with the same token rotated it first, which the caller treats as reuse.
+    """
+    deleted = db.execute(
+        delete(models.RefreshToken)
+        # the hash too: SQLite may hand the freed id to the winner's new row
+        .where(models.RefreshToken.id == old.id, models.RefreshToken.token_hash == old.token_hash)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not deleted:
+        db.rollback()
+        return None
+    db_obj = models.RefreshToken(
+        user_id=old.user_id,
+        token_hash=hash_token(token),
+        family_id=old.family_id,
+        expires_at=expires_at,
+    )
+    db.add(db_obj)
+    db.commit()
+    return db_obj
+
+
 def delete_refresh_token(db: Session, token: str) -> None:
-    db.query(models.RefreshToken).filter(models.RefreshToken.token == token).delete()
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_token(token)
+    ).delete()
+    db.commit()
+
+
+def delete_user_refresh_tokens(db: Session, user_id: int) -> int:
+    deleted = (
+        db.query(models.RefreshToken)
+        .filter(models.RefreshToken.user_id == user_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def revoke_refresh_token_family(db: Session, family_id: str) -> int:
+    deleted = (
+        db.query(models.RefreshToken)
+        .filter(models.RefreshToken.family_id == family_id)
+        .delete(synchronize_session=False)
+    )
     db.commit()
+    return deleted
+
+
+def purge_expired_refresh_tokens(
+    db: Session,
+    now: Optional[datetime.datetime] = None,
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> int:
+    """Delete expired refresh tokens (see :func:`_delete_in_batches`)."""
+    now = now or datetime.datetime.utcnow()
+    return _delete_in_batches(
+        db, models.RefreshToken, models.RefreshToken.expires_at < now, batch_size
+    )
 
 
 def create_otp_request(
@@ -298,6 +1565,22 @@ def create_otp_request(
     return req
 
 
+def mark_otp_verified(db: Session, otp_id: int) -> bool:
+    """Consume a still-valid OTP by id; False if it was used or expired."""
+    consumed = db.execute(
+        update(models.OTPRequest)
+        .where(
+            models.OTPRequest.id == otp_id,
+            models.OTPRequest.verified.is_(False),
+            models.OTPRequest.expires_at > datetime.datetime.utcnow(),
+        )
+        .values(verified=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return consumed == 1
+
+
 def verify_otp_code(db: Session, phone_number: str, code: str) -> bool:
     now = datetime.datetime.utcnow()
     req = (
@@ -315,3 +1598,146 @@ def verify_otp_code(db: Session, phone_number: str, code: str) -> bool:
     req.verified = True
     db.commit()
     return True
+
+
+def purge_otp_requests(
+    db: Session,
+    now: Optional[datetime.datetime] = None,
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> int:
+    """Delete expired or already-used OTPs (see :func:`_delete_in_batches`)."""
+    now = now or datetime.datetime.utcnow()
+    return _delete_in_batches(
+        db,
+        models.OTPRequest,
+        (models.OTPRequest.expires_at < now) | models.OTPRequest.verified.is_(True),
+        batch_size,
+    )
+
+
+def purge_notifications(
+    db: Session,
+    now: Optional[datetime.datetime] = None,
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> int:
+    """Delete notifications older than ``NOTIFICATION_RETENTION_DAYS``.
+
+    Like :func:`_delete_in_batches`, but unread ones also come off their
+    users' unread counters in the same transaction.  Unread rows are deleted
+    first with ``read IS false`` in the ``DELETE`` itself and the counters
+    move by the user ids it returns, so a notification marked read after the
+    batch was selected (and already decremented) is not counted twice.
+    """
+    now = now or datetime.datetime.utcnow()
+    n = models.Notification
+    cutoff = now - datetime.timedelta(days=NOTIFICATION_RETENTION_DAYS)
+    batch = select(n.id, n.read).where(n.created_at < cutoff).limit(batch_size)
+    user = models.User.__table__
+    total = 0
+    while True:
+        rows = db.execute(batch).all()
+        if rows:
+            unread_ids = [row.id for row in rows if not row.read]
+            unread = Counter()
+            if unread_ids:
+                unread.update(
+                    db.scalars(
+                        delete(n)
+                        .where(n.id.in_(unread_ids), n.read.is_(False))
+                        .returning(n.user_id)
+                        .execution_options(synchronize_session=False)
+                    ).all()
+                )
+            db.execute(
+                delete(n)
+                .where(n.id.in_([row.id for row in rows]))
+                .execution_options(synchronize_session=False)
+            )
+            if unread:
+                db.execute(
+                    update(user)
+                    .where(user.c.id == bindparam("b_id"))
+                    .values(unread_notifications=user.c.unread_notifications - bindparam("b_n")),
+                    [{"b_id": uid, "b_n": count} for uid, count in unread.items()],
+                )
+            db.commit()
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def recount_unread_notifications(db: Session, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Recompute users' unread counters where they drifted; returns how many were off.
+
+    The counters are maintained incrementally, this only repairs drift from
+    writes that bypass crud (and backfills databases that predate them).
+    Users are walked ``batch_size`` at a time; the fix-up ``UPDATE`` counts
+    again in SQL, so a notification arriving meanwhile is not lost.
+    """
+    user = models.User.__table__
+    n = models.Notification.__table__
+    actual = (
+        select(func.count())
+        .select_from(n)
+        .where(n.c.user_id == user.c.id, n.c.read.is_(False))
+        .scalar_subquery()
+    )
+    page = select(user.c.id, user.c.unread_notifications, actual.label("actual"))
+    wrong_total, last_id = 0, 0
+    while True:
+        rows = db.execute(
+            page.where(user.c.id > last_id).order_by(user.c.id).limit(batch_size)
+        ).all()
+        wrong = [row.id for row in rows if row.unread_notifications != row.actual]
+        if wrong:
+            db.execute(
+                update(user).where(user.c.id.in_(wrong)).values(unread_notifications=actual)
+            )
+            db.commit()
+            wrong_total += len(wrong)
+        if len(rows) < batch_size:
+            return wrong_total
+        last_id = rows[-1].id
+
+
+def claim_job_lease(
+    db: Session,
+    name: str,
+    seconds: float,
+    now: Optional[datetime.datetime] = None,
+) -> bool:
+    """Take the ``name`` lease for ``seconds`` unless another worker holds it.
+
+    ``True`` for exactly one caller per period across all workers; the lease
+    is simply left to expire, so a worker that dies mid-job does not block
+    the next period.  Commits.
+    """
+    now = now or datetime.datetime.utcnow()
+    until = now + datetime.timedelta(seconds=seconds)
+    lease = models.JobLease.__table__
+    claimed = db.execute(
+        update(lease)
+        .where(lease.c.name == name, lease.c.locked_until <= now)
+        .values(locked_until=until)
+    ).rowcount == 1
+    if not claimed:
+        try:
+            with db.begin_nested():
+                db.execute(lease.insert().values(name=name, locked_until=until))
+            claimed = True
+        except IntegrityError:
+            pass
+    db.commit()
+    return claimed
+
+
+def purge_token_revocations(
+    db: Session,
+    now: Optional[datetime.datetime] = None,
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> int:
+    """Delete revocations whose tokens have all expired anyway."""
+    now = now or datetime.datetime.utcnow()
+    return _delete_in_batches(
+        db, models.TokenRevocation, models.TokenRevocation.expires_at < now, batch_size
+    )
@@ -0,0 +1,44 @@
+"""Per-zone cache of bookable delivery slots.
+
+Listing slots is the hot read path (every checkout screen), booking is rare
+by comparison.  Each zone's upcoming slots are cached for ``CACHE_SECONDS``
+and dropped locally as soon as a booking in that zone commits.  Capacity is
+always enforced by ``crud.book_delivery_slot`` in the database, so a stale
+cache can at worst show a slot that then turns out to be full.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+CACHE_SECONDS = float(os.getenv("SLOT_CACHE_SECONDS", "5"))
+
+_cache: dict = {}
+# per zone, bumped by invalidate(); slots listed before a booking are not cached
+_generation: dict = defaultdict(int)
+_lock = threading.Lock()
+
+
+def available_slots(db: Session, zone: str) -> List[dict]:
+    now = time.monotonic()
+    hit = _cache.get(zone)
+    if hit and hit[0] > now:
+        return hit[1]
+    generation = _generation[zone]
+    slots = crud.list_available_slots(db, zone, datetime.datetime.utcnow())
+    with _lock:
+        if generation == _generation[zone]:
+            _cache[zone] = (now + CACHE_SECONDS, slots)
+    return slots
+
+
+def invalidate(zone: str) -> None:
+    with _lock:
+        _generation[zone] += 1
+        _cache.pop(zone, None)
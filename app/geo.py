@@ -0,0 +1,75 @@
+"""Grid-bucket geo helpers for delivery dispatch.
+
+Coordinates are bucketed into fixed ``CELL_DEGREES`` cells.  Orders store the
+cell of their delivery address so "orders near a rider" becomes an indexed
+``IN`` lookup over a few cells instead of a distance scan over every open
+order.  No PostGIS required; a ``geography`` column can replace this later
+without changing callers.
+"""
+import math
+from typing import List, Optional
+
+CELL_DEGREES = 0.01  # ~1.1 km north-south
+EARTH_RADIUS_KM = 6371.0
+
+# ETA model: fixed handling time, average city speed and extra time for every
+# delivery already on the rider's bike.
+HANDLING_MINUTES = 10
+AVERAGE_SPEED_KMH = 20.0
+MINUTES_PER_ACTIVE_DELIVERY = 15
+DEFAULT_ETA_MINUTES = 60
+
+
+def _index(lat: float, lon: float) -> tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+
+def cell_of(lat: Optional[float], lon: Optional[float]) -> Optional[str]:
+    """Return the grid cell key for a coordinate, or ``None`` if unknown."""
+    if lat is None or lon is None:
+        return None
+    i, j = _index(lat, lon)
+    return f"{i}:{j}"
+
+
+def ring_cells(lat: float, lon: float, ring: int) -> List[str]:
+    """Cells at Chebyshev distance exactly ``ring`` from the cell of a point."""
+    ci, cj = _index(lat, lon)
+    if ring == 0:
+        return [f"{ci}:{cj}"]
+    cells = []
+    for di in range(-ring, ring + 1):
+        for dj in range(-ring, ring + 1):
+            if max(abs(di), abs(dj)) == ring:
+                cells.append(f"{ci + di}:{cj + dj}")
+    return cells
+
+
+def min_ring_distance_km(lat: float, ring: int) -> float:
+    """Lower bound on the distance from a point to any cell beyond ``ring``.
+
+    A point can sit on the edge of its own cell, so cells in ring ``ring + 1``
+    are at least ``ring`` cell widths away.  East-west widths shrink with
+    ``cos(lat)``; the narrowest width in the searched area is used.
+    """
+    edge = min(90.0, abs(lat) + (ring + 1) * CELL_DEGREES)
+    width = math.radians(CELL_DEGREES) * EARTH_RADIUS_KM * math.cos(math.radians(edge))
+    return ring * width
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def eta_minutes(distance_km: Optional[float], active_deliveries: int = 0) -> int:
+    """Estimate minutes until delivery from distance and current rider load."""
+    if distance_km is None:
+        return DEFAULT_ETA_MINUTES + active_deliveries * MINUTES_PER_ACTIVE_DELIVERY
+    travel = distance_km / AVERAGE_SPEED_KMH * 60
+    return math.ceil(
+        HANDLING_MINUTES + travel + active_deliveries * MINUTES_PER_ACTIVE_DELIVERY
+    )
@@ -0,0 +1,96 @@
+"""Periodic cleanup of rows that only ever accumulate, and of aged-out values.
+
+Each job works in bounded batches with short transactions, so it is safe
+for every worker process to run them: the ones that lose the race simply
+find nothing left to do.  Jobs run every ``HOUSEKEEPING_SECONDS`` in one
+daemon thread started with the app (``0`` disables the thread; ``run_once``
+can be called from cron instead).
+
+``REPAIRS`` recount denormalized counters that crud keeps current; they only
+fix drift from writes that bypass it, scan whole tables, and must not race
+each other, so they run every ``HOUSEKEEPING_REPAIR_SECONDS`` and only in the
+worker that claims the database lease for that period.
+"""
+import logging
+import os
+import threading
+from typing import Callable, Dict
+
+from sqlalchemy.orm import Session
+
+from . import crud, database
+
+INTERVAL_SECONDS = float(os.getenv("HOUSEKEEPING_SECONDS", "300"))
+REPAIR_SECONDS = float(os.getenv("HOUSEKEEPING_REPAIR_SECONDS", "86400"))
+REPAIR_LEASE = "housekeeping_repairs"
+
+logger = logging.getLogger("greenbasket.housekeeping")
+
+JOBS: Dict[str, Callable[[Session], int]] = {
+    "expired_refresh_tokens": crud.purge_expired_refresh_tokens,
+    "used_or_expired_otps": crud.purge_otp_requests,
+    "expired_token_revocations": crud.purge_token_revocations,
+    "old_notifications": crud.purge_notifications,
+    "expired_lowest_prices": crud.refresh_lowest_prices,
+}
+
+REPAIRS: Dict[str, Callable[[Session], int]] = {
+    "category_in_stock_counts": crud.recount_in_stock,
+    "unread_notification_counts": crud.recount_unread_notifications,
+}
+
+_stop = threading.Event()
+_thread = None
+
+
+def _run(jobs: Dict[str, Callable[[Session], int]]) -> Dict[str, int]:
+    removed = {}
+    for name, job in jobs.items():
+        db = database.SessionLocal()
+        try:
+            removed[name] = job(db)
+        except Exception:
+            logger.exception("housekeeping job %s failed", name)
+            db.rollback()
+        finally:
+            db.close()
+    return removed
+
+
+def run_once() -> Dict[str, int]:
+    """Run every job once; returns rows removed (or refreshed) per job."""
+    return _run(JOBS)
+
+
+def repair_once() -> Dict[str, int]:
+    """Run every repair if this worker wins the lease; rows fixed per repair."""
+    db = database.SessionLocal()
+    try:
+        if not crud.claim_job_lease(db, REPAIR_LEASE, REPAIR_SECONDS):
+            return {}
+    finally:
+        db.close()
+    return _run(REPAIRS)
+
+
+def _loop() -> None:
+    while not _stop.wait(INTERVAL_SECONDS):
+        removed = run_once()
+        if any(removed.values()):
+            logger.info("housekeeping removed %s", removed)
+        repaired = repair_once()
+        if any(repaired.values()):
+            logger.warning("housekeeping repaired drifted counters %s", repaired)
+
+
+def start() -> None:
+    global _thread
+    if INTERVAL_SECONDS <= 0 or (_thread and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="housekeeping", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    _stop.set()
@@ -1,14 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .database import Base, engine
+from . import metrics, profiling, ratelimit
 
 # 1️⃣  create FastAPI app first
 app = FastAPI(
     title="GreenBasket API (Advanced)",
     description="BigBasket-level backend with admin, delivery, payments",
     version="2.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+# rate limiting sits inside CORS so 429s still carry CORS headers
+ratelimit.install(app)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://sampledev-eng.github.io"],
@@ -17,6 +23,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# request / DB metrics on /metrics (must be installed before routers)
+metrics.install(app, engine)
+# opt-in SQL profiling (SQL_PROFILING=1)
+profiling.install(app, engine)
+
 # 2️⃣  create DB tables
 Base.metadata.create_all(bind=engine)
 
@@ -43,7 +54,9 @@ from .routers import (          # noqa: E402
     admin_analytics,
     recommendations as recommendations_router,
     misc,
+    slots,
 )
+from . import housekeeping, serviceability, suggest  # noqa: E402
 
 # 4️⃣  register routers
 app.include_router(auth_router.router)
@@ -67,3 +80,21 @@ app.include_router(checkout.router)
 app.include_router(admin_analytics.router)
 app.include_router(recommendations_router.router)
 app.include_router(misc.router)
+app.include_router(slots.router)
+
+
+@app.on_event("startup")
+def warm_caches():
+    # load the in-memory indexes before the first request needs them
+    serviceability.get_index()
+    suggest.get_index()
+
+
+@app.on_event("startup")
+def start_background_jobs():
+    housekeeping.start()
+
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    housekeeping.stop()
@@ -0,0 +1,85 @@
+"""Cached ``GET /categories`` payloads (the storefront navigation menu).
+
+The menu is the category tree, optionally with the number of in-stock
+products under every category.  Counting is never done per request:
+``categories.in_stock_count`` holds each category's own in-stock products
+(``stock > reserved``, like the product ``in_stock`` field) and is moved by
+the crud functions that create, update or delete products or change stock
+and cart reservations; the menu rolls the counts up the cached tree.
+
+Payloads are serialized once and kept under a version number.  Anything
+that changes counts calls ``bump()`` after committing, and the next request
+rebuilds; so does a reload of the category tree (category writes invalidate
+``category_tree``).  Other workers rebuild after ``CACHE_SECONDS``.  The
+ETag is taken from the payload bytes, so every worker hands out the same
+tag for the same menu.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+import orjson
+from sqlalchemy import select
+
+from . import category_tree, database, models
+
+CACHE_SECONDS = float(os.getenv("MENU_CACHE_SECONDS", "30"))
+
+_version = 0
+# (view, counts) -> (version, tree, expires, body, etag)
+_cache: Dict[Tuple[str, bool], tuple] = {}
+_lock = threading.Lock()
+
+
+def bump() -> None:
+    """Invalidate every cached payload (in-stock counts changed)."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _counts() -> Dict[int, int]:
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(select(models.Category.id, models.Category.in_stock_count))
+        return {category_id: count or 0 for category_id, count in rows}
+    finally:
+        db.close()
+
+
+def _build(tree: category_tree.Tree, view: str, counts: bool):
+    if not counts:
+        return tree.nested if view == "tree" else tree.rows
+    own = _counts()
+    totals = {
+        category_id: sum(own.get(member, 0) for member in members)
+        for category_id, members in tree.subtree.items()
+    }
+
+    def with_count(node):
+        return {
+            "id": node["id"],
+            "name": node["name"],
+            "product_count": totals.get(node["id"], 0),
+            "children": [with_count(child) for child in node["children"]],
+        }
+
+    if view == "tree":
+        return [with_count(node) for node in tree.nested]
+    return [{**row, "product_count": totals.get(row["id"], 0)} for row in tree.rows]
+
+
+def payload(view: str = "flat", counts: bool = False) -> Tuple[bytes, str]:
+    """The serialized menu and its ETag."""
+    key = (view, counts)
+    version, tree = _version, category_tree.get_tree()
+    hit = _cache.get(key)
+    if hit and hit[0] == version and hit[1] is tree and hit[2] > time.monotonic():
+        return hit[3], hit[4]
+    body = orjson.dumps(_build(tree, view, counts))
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    with _lock:
+        _cache[key] = (version, tree, time.monotonic() + CACHE_SECONDS, body, etag)
+    return body, etag
@@ -0,0 +1,224 @@
+"""Prometheus metrics without extra dependencies.
+
+``install(app, engine)`` adds a pure ASGI middleware that records, per route
+template, request counts, latency histograms and in-flight requests, and
+subscribes to ``query_timing`` to count queries and DB time per request.
+``render()`` produces the Prometheus text exposition format served on
+``/metrics``.  Set ``METRICS_ENABLED=0`` to turn everything off.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Request, Response
+from sqlalchemy.engine import Engine
+
+from . import query_timing
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "False")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class RequestStats:
+    __slots__ = ("method", "route", "queries", "db_seconds", "started", "in_flight")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.route = "unmatched"
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.started = time.perf_counter()
+        self.in_flight = False
+
+
+# Stats of the request being served; SQLAlchemy events add to it.  Starlette
+# copies the context into the threadpool that runs sync endpoints, so the
+# same object is visible there.
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def _fmt_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_: str, labels=()):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount: float = 1.0) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels=(), value: float = 0.0) -> None:
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value: float) -> None:
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                # per-bucket counts (+Inf last), sum, count
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                labels = _fmt_labels(self.labels + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _fmt_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests served.", ("method", "route", "status")
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.", ("method", "route")
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per HTTP request.",
+    ("route",),
+    QUERY_COUNT_BUCKETS,
+)
+DB_SECONDS = Counter(
+    "db_query_seconds_total", "Time spent executing SQL, by route.", ("route",)
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out", "Connections currently checked out of the pool."
+)
+_METRICS = [REQUESTS, LATENCY, IN_FLIGHT, DB_QUERIES, DB_SECONDS, POOL_CHECKED_OUT]
+_engine: Optional[Engine] = None
+
+
+def render() -> str:
+    if _engine is not None:
+        checkedout = getattr(_engine.pool, "checkedout", None)
+        if checkedout is not None:
+            POOL_CHECKED_OUT.set((), checkedout())
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _record_query(statement, parameters, executemany, elapsed: float) -> None:
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope["method"])
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            stats.route = getattr(route, "path", "unmatched")
+            key = (stats.method, stats.route)
+            if stats.in_flight:
+                IN_FLIGHT.inc(key, -1)
+            REQUESTS.inc((stats.method, stats.route, status))
+            LATENCY.observe(key, time.perf_counter() - stats.started)
+            DB_QUERIES.observe((stats.route,), stats.queries)
+            if stats.db_seconds:
+                DB_SECONDS.inc((stats.route,), stats.db_seconds)
+
+
+async def _track_in_flight(request: Request):
+    # Runs as an app-wide dependency, i.e. after routing, when the route
+    # template is known.
+    stats = current_request.get()
+    if stats is not None:
+        stats.route = request.scope["route"].path
+        stats.in_flight = True
+        IN_FLIGHT.inc((stats.method, stats.route))
+
+
+def metrics_endpoint(request: Request) -> Response:
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def install(app: FastAPI, engine: Engine) -> None:
+    """Instrument ``app`` and ``engine``.  Call before routers are included."""
+    global _engine
+    if not ENABLED:
+        return
+    _engine = engine
+    query_timing.subscribe(engine, _record_query)
+    app.router.dependencies.append(Depends(_track_in_flight))
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
@@ -2,6 +2,7 @@ import enum
 import datetime
 from sqlalchemy import (
     Column,
+    Computed,
     Integer,
     String,
     Float,
@@ -9,6 +10,7 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Enum,
+    Index,
     Numeric,
 )
 from sqlalchemy.orm import relationship
@@ -40,6 +42,11 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     is_delivery_partner = Column(Boolean, default=False)
+    # bumped to invalidate every access token issued so far (reset, logout-all)
+    token_version = Column(Integer, default=0, nullable=False)
+    # notifications with read = false, kept up to date by crud so the badge
+    # count is a primary-key lookup
+    unread_notifications = Column(Integer, default=0, nullable=False)
 
     carts = relationship("CartItem", back_populates="user")
     orders = relationship("Order", back_populates="user")
@@ -51,6 +58,14 @@ class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
+    parent_id = Column(Integer, ForeignKey("categories.id"), index=True)
+    # materialized path of ids from the root, e.g. "/1/4/9/"; a subtree is
+    # every row whose path starts with its root's path
+    path = Column(String, index=True)
+    # products directly in this category with stock > reserved, kept up to
+    # date by the crud functions that change stock, reservations or category
+    # (see app/menu.py)
+    in_stock_count = Column(Integer, nullable=False, default=0)
     products = relationship("Product", back_populates="category")
 
 
@@ -66,11 +81,39 @@ class Product(Base):
     image_url = Column(String)
     stock = Column(Integer, default=0)
     reserved = Column(Integer, default=0)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
+    # % off mrp, always consistent with mrp/price (sort=discount_desc)
+    effective_discount = Column(
+        Numeric(5, 2),
+        Computed(
+            "CASE WHEN mrp > price THEN ROUND((mrp - price) * 100.0 / mrp, 2) ELSE 0 END",
+            persisted=True,
+        ),
+        index=True,
+    )
+    # lowest price in effect at any time in the last 30 days; it leaves the
+    # window at lowest_price_until (NULL while it is still the current price)
+    lowest_price_30d = Column(Numeric(10, 2))
+    lowest_price_until = Column(DateTime, index=True)
 
     category = relationship("Category", back_populates="products")
 
 
+class PriceHistory(Base):
+    """One row per price/mrp change; a price is in effect until the next row."""
+
+    __tablename__ = "price_history"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
+    mrp = Column(Numeric(10, 2))
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_price_history_product_changed", "product_id", "changed_at"),
+    )
+
+
 class CartItem(Base):
     __tablename__ = "cart_items"
     id = Column(Integer, primary_key=True, index=True)
@@ -97,11 +140,32 @@ class Order(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     shipping_address_id = Column(Integer, ForeignKey("addresses.id"))
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
     total = Column(Float, default=0.0)
     coupon_id = Column(Integer, ForeignKey("coupons.id"), nullable=True)
     status = Column(Enum(OrderStatus), default=OrderStatus.pending)
     estimated_delivery = Column(DateTime, nullable=True)
+    # Set while a paid order waits for a rider; cleared when it is claimed.
+    ready_for_pickup_at = Column(DateTime, nullable=True)
+    # Grid cell (see app.geo) of the shipping address, for nearest-order lookups.
+    delivery_cell = Column(String, nullable=True)
+    delivery_slot_id = Column(Integer, ForeignKey("delivery_slots.id"), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_orders_dispatch_queue",
+            "ready_for_pickup_at",
+            "id",
+            postgresql_where=ready_for_pickup_at.isnot(None),
+            sqlite_where=ready_for_pickup_at.isnot(None),
+        ),
+        Index(
+            "ix_orders_dispatch_cell",
+            "delivery_cell",
+            postgresql_where=ready_for_pickup_at.isnot(None),
+            sqlite_where=ready_for_pickup_at.isnot(None),
+        ),
+    )
 
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
@@ -112,7 +176,7 @@ class Order(Base):
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
     price = Column(Float, nullable=False)
@@ -145,6 +209,14 @@ class DeliveryAssignment(Base):
     delivery_partner = relationship("User", back_populates="deliveries")
 
 
+class RiderLocation(Base):
+    __tablename__ = "rider_locations"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
 # ─── Extensions ─────────────────────────────────────────
 class Address(Base):
     __tablename__ = "addresses"
@@ -155,6 +227,8 @@ class Address(Base):
     pincode = Column(String, nullable=False)
     label = Column(String)
     is_default = Column(Boolean, default=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
 
     user = relationship("User")
 
@@ -178,6 +252,28 @@ class Coupon(Base):
     code = Column(String, unique=True, index=True, nullable=False)
     discount_percent = Column(Integer, nullable=False)
     active = Column(Boolean, default=True)
+    # rules, all optional: spend at least min_basket on the coupon's scope
+    # (a category and/or brand, else the whole cart) inside the time window
+    min_basket = Column(Numeric(10, 2))
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    brand = Column(String)
+    per_user_limit = Column(Integer)
+    starts_at = Column(DateTime)
+    ends_at = Column(DateTime)
+
+
+class CouponRedemption(Base):
+    """How many times a user has redeemed a coupon (one row per pair)."""
+
+    __tablename__ = "coupon_redemptions"
+    id = Column(Integer, primary_key=True)
+    coupon_id = Column(Integer, ForeignKey("coupons.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_coupon_redemptions_user_coupon", "user_id", "coupon_id", unique=True),
+    )
 
 
 class WalletTransaction(Base):
@@ -196,26 +292,83 @@ class Notification(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     message = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    read = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    read = Column(Boolean, default=False, nullable=False)
 
     user = relationship("User")
 
+    __table_args__ = (
+        # the inbox: one user's notifications, newest first
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
+
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    token = Column(String, unique=True, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # sha256 of the JWT: fixed-size key, and a leaked table can't be replayed
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # all tokens rotated from one login share a family
+    family_id = Column(String(32), index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
 
     user = relationship("User", back_populates="refresh_tokens")
 
 
+class TokenRevocation(Base):
+    """Access-token revocation event: one token (``jti``) or every token of a
+    user below ``min_version``.  Kept until the tokens it covers expire."""
+
+    __tablename__ = "token_revocations"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    jti = Column(String(32), nullable=True)
+    min_version = Column(Integer, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class DeliverySlot(Base):
+    __tablename__ = "delivery_slots"
+    id = Column(Integer, primary_key=True, index=True)
+    zone = Column(String, nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    capacity = Column(Integer, nullable=False)
+    booked = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_delivery_slots_zone_start", "zone", "starts_at", unique=True),
+    )
+
+
+class ServiceablePincode(Base):
+    """Pincode -> delivery zone mapping, used when PINCODES_SOURCE=db."""
+
+    __tablename__ = "serviceable_pincodes"
+    pincode = Column(String, primary_key=True)
+    zone = Column(String, nullable=False)
+    dark_store = Column(String)
+    delivery_fee = Column(Float, default=0.0)
+    eta_minutes = Column(Integer, default=0)
+    updated_at = Column(
+        DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+
+
 class OTPRequest(Base):
     __tablename__ = "otp_requests"
     id = Column(Integer, primary_key=True, index=True)
     phone_number = Column(String, index=True, nullable=False)
     code = Column(String, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     verified = Column(Boolean, default=False)
+
+
+class JobLease(Base):
+    """Which worker may run a periodic job until ``locked_until``."""
+
+    __tablename__ = "job_leases"
+    name = Column(String, primary_key=True)
+    locked_until = Column(DateTime, nullable=False)
@@ -0,0 +1,90 @@
+"""One-time codes: issuing, verifying and throttling.
+
+Codes are written to ``otp_requests`` (the source of truth, shared by all
+workers) and also kept in a per-process hot store, so the usual "issue, then
+verify on the same worker" path checks the code without reading the table.
+A miss or mismatch falls back to the database.  Expired and verified rows
+are deleted in batches by the housekeeping sweeper.
+
+Requests are limited per identifier (phone number or email) and per client
+IP; verification attempts are limited per identifier so a six-digit code
+can't be brute forced.
+"""
+import datetime
+import os
+import secrets
+import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .ratelimit import TokenBucket
+
+TTL = datetime.timedelta(minutes=5)
+HOT_STORE_MAX = 50_000
+
+SEND_PER_IDENTIFIER = TokenBucket(
+    "otp-send",
+    per_minute=float(os.getenv("OTP_SENDS_PER_MINUTE", "1")),
+    burst=int(os.getenv("OTP_SEND_BURST", "3")),
+)
+SEND_PER_IP = TokenBucket(
+    "otp-send-ip",
+    per_minute=float(os.getenv("OTP_IP_SENDS_PER_MINUTE", "10")),
+    burst=int(os.getenv("OTP_IP_SEND_BURST", "20")),
+)
+VERIFY_PER_IDENTIFIER = TokenBucket("otp-verify", per_minute=2, burst=5)
+
+# identifier -> (code, expires_at, row id)
+_hot: Dict[str, Tuple[str, datetime.datetime, int]] = {}
+_lock = threading.Lock()
+
+
+def send_allowed(identifier: str, client_ip: Optional[str]) -> int:
+    """0 if an OTP may be sent now, else seconds until the next one."""
+    if client_ip:
+        wait = SEND_PER_IP.hit(client_ip)
+        if wait:
+            return wait
+    return SEND_PER_IDENTIFIER.hit(identifier)
+
+
+def verify_allowed(identifier: str) -> int:
+    return VERIFY_PER_IDENTIFIER.hit(identifier)
+
+
+def issue(db: Session, identifier: str) -> str:
+    code = f"{secrets.randbelow(900000) + 100000}"
+    expires = datetime.datetime.utcnow() + TTL
+    req = crud.create_otp_request(db, identifier, code, expires)
+    with _lock:
+        if len(_hot) >= HOT_STORE_MAX:
+            _prune(datetime.datetime.utcnow())
+        _hot[identifier] = (code, expires, req.id)
+    return code
+
+
+def verify(db: Session, identifier: str, code: str) -> bool:
+    with _lock:
+        hit = _hot.get(identifier)
+    if hit and hit[0] == code and hit[1] > datetime.datetime.utcnow():
+        # consume it in the database too, unless another worker already did
+        if crud.mark_otp_verified(db, hit[2]):
+            with _lock:
+                if _hot.get(identifier) == hit:
+                    del _hot[identifier]
+            return True
+    return crud.verify_otp_code(db, identifier, code)
+
+
+def _prune(now: datetime.datetime) -> None:
+    for key in [k for k, (_, expires, _) in _hot.items() if expires <= now]:
+        del _hot[key]
+    while len(_hot) >= HOT_STORE_MAX:
+        del _hot[next(iter(_hot))]
+
+
+def reset() -> None:
+    with _lock:
+        _hot.clear()
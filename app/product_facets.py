@@ -0,0 +1,73 @@
+"""Cache of facet counts per product search.
+
+Facet counts are the same for every shopper issuing the same search, and the
+catalogue changes far less often than it is browsed.  Results are cached per
+query signature (the normalised filter set) for ``CACHE_SECONDS`` and the
+whole cache is dropped whenever products or categories are written through
+the API.  Other workers catch up when their entries expire.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+CACHE_SECONDS = float(os.getenv("FACET_CACHE_SECONDS", "60"))
+MAX_ENTRIES = int(os.getenv("FACET_CACHE_MAX_ENTRIES", "2048"))
+
+_cache: dict = {}
+# bumped by invalidate(); counts read before a product write are not cached
+_generation = 0
+_lock = threading.Lock()
+
+
+def _norm(text: Optional[str]) -> Optional[str]:
+    # the text filters are case-insensitive substring matches, so "Apple "
+    # and "apple" are the same search
+    return text.strip().lower() or None if text else None
+
+
+def signature(
+    q: Optional[str] = None,
+    category_id: Optional[int] = None,
+    brand: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+) -> tuple:
+    return (_norm(q), category_id or None, _norm(brand), price_min, price_max)
+
+
+def facets(db: Session, **filters) -> dict:
+    key = signature(**filters)
+    now = time.monotonic()
+    hit = _cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    q, category_id, brand, price_min, price_max = key
+    generation = _generation
+    result = crud.get_product_facets(
+        db,
+        q=q,
+        category_id=category_id,
+        brand=brand,
+        price_min=price_min,
+        price_max=price_max,
+    )
+    with _lock:
+        if generation != _generation:
+            return result
+        if len(_cache) >= MAX_ENTRIES:
+            # oldest insertion first; good enough for a short-lived cache
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = (now + CACHE_SECONDS, result)
+    return result
+
+
+def invalidate() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
@@ -0,0 +1,129 @@
+"""Opt-in SQL profiling: slow-query log, N+1 detection and Server-Timing.
+
+Enabled with ``SQL_PROFILING=1``.  Every statement on the engine is timed by
+the shared ``query_timing`` hook and attributed to the route being served.
+
+* statements slower than ``SLOW_QUERY_MS`` are logged on ``greenbasket.sql``
+  with their bound values redacted (only the parameter types are shown);
+* when one statement shape runs more than ``N_PLUS_ONE_THRESHOLD`` times in a
+  request it is logged once as a likely N+1;
+* responses carry a ``Server-Timing`` header with DB time and query count.
+"""
+import collections
+import contextvars
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from fastapi import FastAPI
+from sqlalchemy.engine import Engine
+
+from . import query_timing
+
+ENABLED = os.getenv("SQL_PROFILING", "0") in ("1", "true", "True")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+logger = logging.getLogger("greenbasket.sql")
+
+_WHITESPACE = re.compile(r"\s+")
+# "IN (?, ?, ?)" / "(%(p1)s, %(p2)s)" -> "(?)" so batches of any size share a shape
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)")
+
+
+class RequestProfile:
+    __slots__ = ("scope", "queries", "db_seconds", "shapes", "started")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes = collections.Counter()
+        self.started = time.perf_counter()
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return getattr(route, "path", self.scope.get("path", "-"))
+
+
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAM_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _redact(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+def _record_query(statement, parameters, executemany, elapsed: float) -> None:
+    profile = current_profile.get()
+    route = profile.route if profile else "-"
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query %.1f ms route=%s params=%s sql=%s",
+            elapsed * 1000,
+            route,
+            _redact(parameters, executemany),
+            _WHITESPACE.sub(" ", statement),
+        )
+    if profile is None:
+        return
+    profile.queries += 1
+    profile.db_seconds += elapsed
+    shape = statement_shape(statement)
+    profile.shapes[shape] += 1
+    if profile.shapes[shape] == N_PLUS_ONE_THRESHOLD + 1:
+        logger.warning(
+            "possible N+1: statement repeated more than %d times route=%s sql=%s",
+            N_PLUS_ONE_THRESHOLD,
+            route,
+            shape,
+        )
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(scope)
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - profile.started) * 1000
+                timing = (
+                    f'db;dur={profile.db_seconds * 1000:.2f};desc="{profile.queries} queries", '
+                    f"app;dur={total:.2f}"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+
+
+def install(app: FastAPI, engine: Engine, force: bool = False) -> None:
+    """Hook ``engine`` and add the middleware when profiling is enabled."""
+    if not (ENABLED or force):
+        return
+    query_timing.subscribe(engine, _record_query)
+    app.add_middleware(ProfilingMiddleware)
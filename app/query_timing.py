@@ -0,0 +1,45 @@
+"""One timing hook per engine for every SQL statement, shared by subscribers.
+
+``metrics`` and ``profiling`` both need the duration of each statement.
+Rather than each pushing start times onto the pooled connection, one pair of
+``before/after_cursor_execute`` listeners keeps the start on the statement's
+execution context and hands ``(statement, parameters, executemany, seconds)``
+to every subscriber once it has run.  A statement that raises never reaches
+``after_cursor_execute``; its start goes away with its context, so nothing
+accumulates on the connection.
+"""
+import time
+import weakref
+from typing import Callable, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+Subscriber = Callable[[str, object, bool, float], None]
+
+_subscribers: "weakref.WeakKeyDictionary[Engine, List[Subscriber]]" = weakref.WeakKeyDictionary()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    for subscriber in _subscribers.get(conn.engine, ()):
+        subscriber(statement, parameters, executemany, elapsed)
+
+
+def subscribe(engine: Engine, subscriber: Subscriber) -> None:
+    """Call ``subscriber`` after every statement ``engine`` executes."""
+    subscribers = _subscribers.get(engine)
+    if subscribers is None:
+        subscribers = _subscribers[engine] = []
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if subscriber not in subscribers:
+        subscribers.append(subscriber)
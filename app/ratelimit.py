@@ -0,0 +1,285 @@
+"""Token-bucket rate limiting with pluggable storage, and the API middleware.
+
+A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second; each request takes one.  State lives in a backend:
+
+* ``MemoryBackend`` (default) - per process, so with N workers the effective
+  limit is N times higher.
+* ``RedisBackend`` - shared by all workers; selected with
+  ``RATE_LIMIT_BACKEND=redis://host:6379/0`` and needs the ``redis`` package.
+  The bucket update runs as one Lua script, so it is atomic across workers.
+
+``RateLimitMiddleware`` applies ``RULES`` to every request: the first rule
+whose path prefix matches decides the route group, and the request must get
+a token from the group's per-IP bucket and, when it carries a valid bearer
+token, the per-user bucket.  Otherwise it is answered with ``429`` and
+``Retry-After`` before reaching the app.  ``RATE_LIMIT_ENABLED=0`` turns the
+middleware off.
+
+Behind a reverse proxy every connection comes from the proxy, so
+``RATE_LIMIT_TRUSTED_PROXIES`` lists the proxies' addresses (comma
+separated, or ``*`` for whatever peer connects, when the app is only
+reachable through the proxy).  For requests from a trusted peer the client
+is the right-most ``X-Forwarded-For`` entry that is not itself a trusted
+proxy; entries further left are client-supplied and ignored.  Running
+uvicorn with ``--proxy-headers --forwarded-allow-ips`` instead rewrites the
+client address before this middleware sees it, to the same effect.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from jose import JWTError, jwt
+
+from . import auth, revocations
+
+
+class MemoryBackend:
+    # past this many keys, every write looks at up to EVICT_BATCH of the
+    # least recently written buckets and drops the ones that have refilled
+    # completely (a full bucket carries no state)
+    MAX_KEYS = 100_000
+    EVICT_BATCH = 64
+
+    def __init__(self):
+        # key -> (tokens, updated, full_at), least recently written first
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, now: Optional[float] = None) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is free."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated, _ = self._buckets.pop(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens < 1:
+                wait = (1 - tokens) / rate
+            else:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._evict_full(now)
+            return wait
+
+    def _evict_full(self, now: float) -> None:
+        # each bucket is judged by its own refill time, never the caller's
+        # rate; buckets still refilling go to the back and keep their state
+        for _ in range(min(self.EVICT_BATCH, len(self._buckets) - 1)):
+            key, entry = self._buckets.popitem(last=False)
+            if entry[2] > now:
+                self._buckets[key] = entry
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    _SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens < 1 then wait = (1 - tokens) / rate else tokens = tokens - 1 end
+    redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:  # optional dependency
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis:// needs the redis package") from exc
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self._SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return float(self._take(keys=[f"ratelimit:{key}"], args=[rate, burst, now]))
+
+    def reset(self) -> None:
+        for key in self._client.scan_iter("ratelimit:*"):
+            self._client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = os.getenv("RATE_LIMIT_BACKEND", "memory")
+                _backend = MemoryBackend() if url == "memory" else RedisBackend(url)
+    return _backend
+
+
+class TokenBucket:
+    """A named limit: ``burst`` requests at once, refilling ``per_minute``."""
+
+    def __init__(self, name: str, per_minute: float, burst: int, backend=None):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._backend = backend
+
+    def hit(self, key: str) -> int:
+        """Consume a token for ``key``; returns 0 or the whole seconds to wait."""
+        backend = self._backend or get_backend()
+        wait = backend.take(f"{self.name}:{key}", self.rate, self.burst)
+        return math.ceil(wait) if wait > 0 else 0
+
+
+# ── API middleware ────────────────────────────────────────
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+class Rule(NamedTuple):
+    group: str
+    prefixes: Tuple[str, ...]
+    per_ip: Optional[TokenBucket]
+    per_user: Optional[TokenBucket]
+
+
+def _rule(group, prefixes, ip=None, user=None) -> Rule:
+    # (per_minute, burst) pairs -> buckets named after the group
+    return Rule(
+        group,
+        prefixes,
+        TokenBucket(f"{group}-ip", *ip) if ip else None,
+        TokenBucket(f"{group}-user", *user) if user else None,
+    )
+
+
+RULES = [
+    _rule("exempt", ("/metrics",)),
+    _rule(
+        "login",
+        ("/auth/login", "/auth/token", "/auth/register", "/auth/refresh",
+         "/auth/verify-otp", "/auth/reset-password"),
+        ip=(20, 10),
+    ),
+    _rule("catalog", ("/products", "/categories", "/serviceable", "/slots"),
+          ip=(600, 120), user=(300, 60)),
+    _rule("api", ("/",), ip=(1200, 300), user=(600, 120)),
+]
+
+TRUSTED_PROXIES = frozenset(
+    p.strip() for p in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if p.strip()
+)
+
+_USER_CACHE_MAX = 10_000
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, rules=None, trusted_proxies=None):
+        self.app = app
+        self.rules = RULES if rules is None else rules
+        self.trusted = TRUSTED_PROXIES if trusted_proxies is None else frozenset(trusted_proxies)
+        # verified bearer token -> (claims, exp), or None for tokens that name
+        # no user; clients reuse one token for many requests, so the signature
+        # is checked once per token, not per call
+        self._users: Dict[str, Optional[Tuple[dict, float]]] = {}
+
+    def _match(self, path: str) -> Optional[Rule]:
+        for rule in self.rules:
+            if path.startswith(rule.prefixes):
+                return rule
+        return None
+
+    def _client_ip(self, scope) -> Optional[str]:
+        peer = scope["client"][0] if scope.get("client") else None
+        if peer is None or not ("*" in self.trusted or peer in self.trusted):
+            return peer
+        hops = [
+            hop.strip()
+            for name, value in scope["headers"]
+            if name == b"x-forwarded-for"
+            for hop in value.decode("latin-1").split(",")
+        ]
+        # walk back from the hop our proxy appended; left of the first
+        # untrusted address everything is client-supplied
+        for hop in reversed(hops):
+            if hop and hop not in self.trusted:
+                return hop
+        return peer
+
+    def _user_id(self, scope) -> Optional[int]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                break
+        else:
+            return None
+        scheme, _, token = value.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        if token in self._users:
+            entry = self._users[token]
+        else:
+            entry = None
+            try:
+                claims = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            except JWTError:
+                claims = {}
+            # only access tokens name the user by id (refresh and pre-claims
+            # tokens would otherwise get a second bucket keyed by email)
+            if claims.get("uid") is not None and claims.get("typ", "access") == "access":
+                entry = claims, float(claims["exp"])
+            if len(self._users) >= _USER_CACHE_MAX:
+                self._users.clear()
+            self._users[token] = entry
+        if entry is None:
+            return None
+        claims, expires = entry
+        if expires <= time.time():
+            self._users.pop(token, None)
+            return None
+        if revocations.is_revoked(claims):
+            return None
+        return claims["uid"]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self._match(scope["path"])
+        wait = 0
+        if rule is not None and rule.per_ip is not None:
+            client_ip = self._client_ip(scope)
+            if client_ip:
+                wait = rule.per_ip.hit(client_ip)
+        if not wait and rule is not None and rule.per_user is not None:
+            user_id = self._user_id(scope)
+            if user_id is not None:
+                wait = rule.per_user.hit(str(user_id))
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(wait).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def install(app, force: bool = False) -> None:
+    """Add the rate limiter to ``app`` (no-op when ``RATE_LIMIT_ENABLED=0``)."""
+    if ENABLED or force:
+        app.add_middleware(RateLimitMiddleware)
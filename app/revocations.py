@@ -0,0 +1,142 @@
+"""In-memory map of revoked access tokens.
+
+Access tokens are verified without touching the database, so revocation has
+to be answerable from memory too.  Two kinds of entries, both tiny:
+
+* ``jti -> expiry`` for single tokens revoked by logout;
+* ``user id -> minimum token version`` after a password reset,
+  logout-everywhere or a change to the user's role or active flags
+  (``users.token_version`` was bumped).
+
+Revocations are written to ``token_revocations`` and applied locally at
+once; other workers pick them up within ``REVOCATION_SYNC_SECONDS`` by
+reading the rows added since their last sync.  Ids are not committed in
+order (a transaction holding a lower id can commit after a higher one was
+read), so every sync also re-reads the last ``SYNC_OVERLAP_IDS`` ids below
+the watermark; applying a row twice is harmless.  Rows are purged by the
+housekeeping job once every token they cover has expired.
+"""
+import datetime
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from . import database, models
+
+SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "15"))
+SYNC_OVERLAP_IDS = 1000
+
+_revoked_jti: Dict[str, datetime.datetime] = {}
+_min_version: Dict[int, int] = {}
+_last_id = 0
+_synced_at = float("-inf")
+_lock = threading.Lock()
+
+
+def _apply(row) -> None:
+    if row.jti:
+        _revoked_jti[row.jti] = row.expires_at
+    if row.min_version is not None:
+        current = _min_version.get(row.user_id, 0)
+        _min_version[row.user_id] = max(current, row.min_version)
+
+
+def sync() -> None:
+    """Apply revocations written (by any worker) since the last sync."""
+    global _last_id, _synced_at
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.TokenRevocation)
+            .where(models.TokenRevocation.id > _last_id - SYNC_OVERLAP_IDS)
+            .order_by(models.TokenRevocation.id)
+        ).scalars().all()
+    finally:
+        db.close()
+    now = datetime.datetime.utcnow()
+    with _lock:
+        for row in rows:
+            _apply(row)
+            _last_id = max(_last_id, row.id)
+        for jti in [j for j, exp in _revoked_jti.items() if exp < now]:
+            del _revoked_jti[jti]
+        _synced_at = time.monotonic()
+
+
+def is_revoked(claims: dict) -> bool:
+    if time.monotonic() - _synced_at > SYNC_SECONDS:
+        sync()
+    if claims.get("jti") in _revoked_jti:
+        return True
+    return claims.get("ver", 0) < _min_version.get(claims["uid"], 0)
+
+
+def revoke_token(db: Session, user_id: int, jti: str, expires_at: datetime.datetime) -> None:
+    row = models.TokenRevocation(user_id=user_id, jti=jti, expires_at=expires_at)
+    db.add(row)
+    db.commit()
+    with _lock:
+        _apply(row)
+
+
+def revoke_all(db: Session, user: models.User, expires_at: datetime.datetime) -> None:
+    """Invalidate every access token ``user`` holds; new logins get the new version."""
+    row = _bump_version(db, user, expires_at)
+    db.commit()
+    with _lock:
+        _apply(row)
+
+
+def _bump_version(db: Session, user: models.User, expires_at: datetime.datetime):
+    user.token_version = (user.token_version or 0) + 1
+    row = models.TokenRevocation(
+        user_id=user.id, min_version=user.token_version, expires_at=expires_at
+    )
+    db.add(row)
+    return row
+
+
+_PRIVILEGE_FLAGS = ("is_admin", "is_delivery_partner", "is_active")
+
+
+def revoke_on_privilege_change(db: Session, expires_at: datetime.datetime) -> None:
+    """Bump the version of every pending ``User`` whose role or active flag changed.
+
+    Called before flush (see ``auth``): access tokens carry the role flags,
+    so they must not outlive a demotion or deactivation.  The revocation
+    commits with the change and is applied locally after the commit.
+    """
+    for obj in list(db.dirty):
+        if not isinstance(obj, models.User):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[flag].history.has_changes() for flag in _PRIVILEGE_FLAGS):
+            _bump_version(db, obj, expires_at)
+            db.info.setdefault("pending_revocations", []).append((obj.id, obj.token_version))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(db: Session) -> None:
+    pending = db.info.pop("pending_revocations", None)
+    if pending:
+        with _lock:
+            for user_id, version in pending:
+                _min_version[user_id] = max(_min_version.get(user_id, 0), version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop("pending_revocations", None)
+
+
+def reset() -> None:
+    global _last_id, _synced_at
+    with _lock:
+        _revoked_jti.clear()
+        _min_version.clear()
+        _last_id = 0
+        _synced_at = float("-inf")
@@ -1,20 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from .. import schemas, crud, models, auth
+from .. import schemas, crud, auth
 from ..dependencies import get_db
 
 router = APIRouter(prefix="/users/{user_id}/addresses", tags=["addresses"])
 
 @router.post("/", response_model=schemas.Address)
-def create_address(user_id: int, address: schemas.AddressBase, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_address(user_id: int, address: schemas.AddressBase, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
     return crud.create_address(db, user_id, address)
 
 
 @router.get("/", response_model=list[schemas.Address])
-def list_addresses(user_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def list_addresses(user_id: int, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
     return crud.list_addresses(db, user_id)
@@ -25,7 +25,7 @@ def get_address(
     user_id: int,
     address_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
 ):
     if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
@@ -41,7 +41,7 @@ def update_address(
     address_id: int,
     address: schemas.AddressBase,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
 ):
     if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
@@ -56,7 +56,7 @@ def delete_address(
     user_id: int,
     address_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
 ):
     if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not allowed")
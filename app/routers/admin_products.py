@@ -1,17 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from .. import schemas, models, crud
+from .. import schemas, models, crud, product_facets, suggest
 from ..dependencies import get_db, admin_required
 
 router = APIRouter(prefix="/admin/products", tags=["admin"], dependencies=[Depends(admin_required)])
 
+MAX_BULK_ITEMS = 5000
+
+
+@router.patch("/bulk", response_model=schemas.ProductBulkUpdateResult)
+def bulk_update_products(payload: schemas.ProductBulkUpdate, db: Session = Depends(get_db)):
+    """Apply warehouse stock/price changes for many products at once."""
+    if len(payload.items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per request")
+    result = crud.bulk_update_products(db, payload.items)
+    product_facets.invalidate()
+    return result
+
+
 @router.put("/{product_id}", response_model=schemas.Product)
 def update_product(product_id: int, data: schemas.ProductCreate, db: Session = Depends(get_db)):
     product = crud.get_product(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return crud.update_product(db, product, data)
+    product = crud.update_product(db, product, data)
+    product_facets.invalidate()
+    suggest.add_product(product)
+    return product
 
 
 @router.delete("/{product_id}", status_code=204)
@@ -20,4 +36,6 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     crud.delete_product(db, product)
+    product_facets.invalidate()
+    suggest.remove_product(product_id)
     return None
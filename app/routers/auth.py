@@ -1,30 +1,35 @@
 from datetime import timedelta, datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from jose import JWTError
 
-import random
-from .. import schemas, auth, dependencies, sms, models, crud
+import uuid
+from .. import schemas, auth, dependencies, sms, models, crud, otp, revocations
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _login(db: Session, user: models.User) -> dict:
+    """Issue a token pair that starts a new refresh-token family (session)."""
+    family_id = uuid.uuid4().hex
+    refresh_token = auth.create_refresh_token({"sub": user.email}, family_id=family_id)
+    expires = datetime.utcnow() + timedelta(minutes=auth.REFRESH_TOKEN_EXPIRE_MINUTES)
+    crud.create_refresh_token_record(db, user, refresh_token, expires, family_id)
+    return {
+        "access_token": auth.create_user_access_token(user),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
 @router.post("/register", response_model=schemas.TokenPair)
 def register(user: schemas.UserCreate, db: Session = Depends(dependencies.get_db)):
     existing = crud.get_user_by_email(db, email=user.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     db_user = crud.create_user(db, user)
-    access_token = auth.create_access_token({"sub": db_user.email})
-    refresh_token = auth.create_refresh_token({"sub": db_user.email})
-    expires = datetime.utcnow() + timedelta(minutes=auth.REFRESH_TOKEN_EXPIRE_MINUTES)
-    crud.create_refresh_token_record(db, db_user, refresh_token, expires)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    return _login(db, db_user)
 
 @router.post("/token", response_model=schemas.TokenPair)
 def login(
@@ -34,15 +39,7 @@ def login(
     user = auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access_token = auth.create_access_token({"sub": user.email})
-    refresh_token = auth.create_refresh_token({"sub": user.email})
-    expires = datetime.utcnow() + timedelta(minutes=auth.REFRESH_TOKEN_EXPIRE_MINUTES)
-    crud.create_refresh_token_record(db, user, refresh_token, expires)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    return _login(db, user)
 
 
 @router.post("/login", response_model=schemas.TokenPair)
@@ -50,15 +47,13 @@ def login_json(payload: schemas.UserCreate, db: Session = Depends(dependencies.g
     user = auth.authenticate_user(db, payload.email, payload.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access_token = auth.create_access_token({"sub": user.email})
-    refresh_token = auth.create_refresh_token({"sub": user.email})
-    expires = datetime.utcnow() + timedelta(minutes=auth.REFRESH_TOKEN_EXPIRE_MINUTES)
-    crud.create_refresh_token_record(db, user, refresh_token, expires)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    return _login(db, user)
+
+
+def _reject_reused(db: Session, data: dict) -> None:
+    if data.get("fam"):
+        crud.revoke_refresh_token_family(db, data["fam"])
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
 
 @router.post("/refresh", response_model=schemas.TokenPair)
@@ -69,32 +64,97 @@ def refresh_token(payload: schemas.RefreshTokenRequest, db: Session = Depends(de
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
     db_token = crud.get_refresh_token(db, payload.refresh_token)
-    if not db_token or db_token.expires_at < datetime.utcnow():
+    if not db_token:
+        # a correctly signed token that is no longer stored was already
+        # rotated (or its session evicted): treat it as stolen and end the
+        # whole session family
+        _reject_reused(db, data)
+    if db_token.expires_at < datetime.utcnow():
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    email = data.get("sub")
-    if not email:
+    user = db.get(models.User, db_token.user_id)
+    if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-    crud.delete_refresh_token(db, payload.refresh_token)
-
-    access_token = auth.create_access_token({"sub": email})
-    new_refresh = auth.create_refresh_token({"sub": email})
+    new_refresh = auth.create_refresh_token({"sub": user.email}, family_id=db_token.family_id)
     expires = datetime.utcnow() + timedelta(minutes=auth.REFRESH_TOKEN_EXPIRE_MINUTES)
-    user = db.query(models.User).filter(models.User.email == email).first()
-    crud.create_refresh_token_record(db, user, new_refresh, expires)
+    if crud.rotate_refresh_token(db, db_token, new_refresh, expires) is None:
+        # a concurrent refresh with the same token won the rotation
+        _reject_reused(db, data)
     return {
-        "access_token": access_token,
+        "access_token": auth.create_user_access_token(user),
         "refresh_token": new_refresh,
         "token_type": "bearer",
     }
 
 
+def _access_token_lifetime_end() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+
+def _end_all_sessions(db: Session, user: models.User) -> None:
+    crud.delete_user_refresh_tokens(db, user.id)
+    revocations.revoke_all(db, user, _access_token_lifetime_end())
+
+
+@router.post("/logout")
+def logout(
+    payload: schemas.RefreshTokenRequest | None = None,
+    token: str = Depends(auth.oauth2_scheme),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Revoke this access token and, if given, the session's refresh tokens.
+
+    Tokens issued before they carried a ``jti`` cannot be revoked one by
+    one; logging out with one revokes every access token of the user.
+    """
+    claims = auth.jwt.get_unverified_claims(token)  # verified by get_current_user
+    if claims.get("jti"):
+        expires = datetime.utcfromtimestamp(claims["exp"])
+        revocations.revoke_token(db, current_user.id, claims["jti"], expires)
+    else:
+        revocations.revoke_all(db, db.get(models.User, current_user.id), _access_token_lifetime_end())
+    if payload:
+        db_token = crud.get_refresh_token(db, payload.refresh_token)
+        if db_token and db_token.user_id == current_user.id:
+            crud.revoke_refresh_token_family(db, db_token.family_id)
+    return {"detail": "Logged out"}
+
+
+@router.post("/logout-all")
+def logout_all(
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Sign out every device: all refresh tokens and all access tokens."""
+    user = db.get(models.User, current_user.id)
+    _end_all_sessions(db, user)
+    return {"detail": "Logged out everywhere"}
+
+
+def _too_many(wait: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many OTP requests, try again later",
+        headers={"Retry-After": str(wait)},
+    )
+
+
+def _client_ip(request: Request) -> str | None:
+    return request.client.host if request.client else None
+
+
 @router.post("/request-otp")
-def request_otp(payload: schemas.PhoneNumber, db: Session = Depends(dependencies.get_db)):
-    code = f"{random.randint(100000, 999999)}"
-    expires = datetime.utcnow() + timedelta(minutes=5)
-    crud.create_otp_request(db, payload.phone_number, code, expires)
+def request_otp(
+    payload: schemas.PhoneNumber,
+    request: Request,
+    db: Session = Depends(dependencies.get_db),
+):
+    wait = otp.send_allowed(payload.phone_number, _client_ip(request))
+    if wait:
+        raise _too_many(wait)
+    code = otp.issue(db, payload.phone_number)
     driver = sms.get_sms_driver()
     driver.send_sms(payload.phone_number, f"Your OTP is {code}")
     return {"detail": "OTP sent"}
@@ -102,33 +162,44 @@ def request_otp(payload: schemas.PhoneNumber, db: Session = Depends(dependencies
 
 @router.post("/verify-otp")
 def verify_otp(payload: schemas.VerifyOTP, db: Session = Depends(dependencies.get_db)):
-    valid = crud.verify_otp_code(db, payload.phone_number, payload.code)
+    wait = otp.verify_allowed(payload.phone_number)
+    if wait:
+        raise _too_many(wait)
+    valid = otp.verify(db, payload.phone_number, payload.code)
     if not valid:
         raise HTTPException(status_code=400, detail="Invalid OTP")
     return {"detail": "OTP verified"}
 
 
 @router.post("/forgot-password")
-def forgot_password(payload: schemas.EmailAddress, db: Session = Depends(dependencies.get_db)):
+def forgot_password(
+    payload: schemas.EmailAddress,
+    request: Request,
+    db: Session = Depends(dependencies.get_db),
+):
+    wait = otp.send_allowed(payload.email, _client_ip(request))
+    if wait:
+        raise _too_many(wait)
     user = crud.get_user_by_email(db, payload.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    code = f"{random.randint(100000, 999999)}"
-    expires = datetime.utcnow() + timedelta(minutes=5)
-    crud.create_otp_request(db, payload.email, code, expires)
+    code = otp.issue(db, payload.email)
     print(f"Password reset code for {payload.email}: {code}")
     return {"detail": "OTP sent"}
 
 
 @router.post("/reset-password")
 def reset_password(payload: schemas.ResetPassword, db: Session = Depends(dependencies.get_db)):
-    valid = crud.verify_otp_code(db, payload.email, payload.code)
+    wait = otp.verify_allowed(payload.email)
+    if wait:
+        raise _too_many(wait)
+    valid = otp.verify(db, payload.email, payload.code)
     if not valid:
         raise HTTPException(status_code=400, detail="Invalid OTP")
     user = crud.get_user_by_email(db, payload.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.hashed_password = auth.get_password_hash(payload.new_password)
-    db.commit()
+    _end_all_sessions(db, user)
     return {"detail": "Password updated"}
 
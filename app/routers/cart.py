@@ -1,15 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session, joinedload
 
-from .. import schemas, models, dependencies, auth as auth_utils, crud
+from .. import schemas, models, dependencies, auth as auth_utils, crud, coupon_rules, menu
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
+MAX_BULK_LINES = 200
+
+
+def _summary(db: Session, user_id: int, coupon_code: str | None):
+    summary = crud.get_cart_summary(db, user_id, coupon_code)
+    if coupon_code and summary["coupon_code"] is None:
+        if coupon_rules.find(db, coupon_code) is None:
+            raise HTTPException(status_code=404, detail="Invalid coupon")
+        raise HTTPException(status_code=400, detail="Coupon not applicable to this cart")
+    return ORJSONResponse(summary)
+
+
+def _own_item(db: Session, item_id: int, user_id: int) -> models.CartItem:
+    # the product comes with the item: every caller adjusts its reservation
+    item = (
+        db.query(models.CartItem)
+        .options(joinedload(models.CartItem.product))
+        .filter(models.CartItem.id == item_id)
+        .first()
+    )
+    if not item or item.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
 
 @router.post("/", response_model=schemas.CartItem)
 def add_to_cart(
     item: schemas.CartItemBase,
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
     db: Session = Depends(dependencies.get_db),
 ):
     product = crud.get_product(db, item.product_id)
@@ -17,51 +42,80 @@ def add_to_cart(
         raise HTTPException(status_code=404, detail="Product not found")
     if product.stock - product.reserved < item.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
-    product.reserved += item.quantity
+    counted = crud.reserve_stock(db, product, item.quantity)
     db_item = models.CartItem(user_id=current_user.id, product_id=item.product_id, quantity=item.quantity)
     db.add(db_item)
     db.commit()
+    if counted:
+        menu.bump()
     db.refresh(db_item)
     return db_item
 
 
 @router.get("/", response_model=list[schemas.CartItem])
 def get_cart(
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
     db: Session = Depends(dependencies.get_db),
 ):
     return db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).all()
 
 
+@router.get("/summary", response_model=schemas.CartSummary)
+def get_cart_summary(
+    coupon_code: str | None = Query(None),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Cart lines with product name, price, image and availability, plus totals."""
+    return _summary(db, current_user.id, coupon_code)
+
+
+@router.put("/bulk", response_model=schemas.CartSummary)
+def bulk_update_cart(
+    payload: schemas.CartBulkUpdate,
+    coupon_code: str | None = Query(None),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Set quantities for many products at once (0 removes); returns the new summary."""
+    if len(payload.items) > MAX_BULK_LINES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_LINES} lines per request")
+    quantities = {line.product_id: line.quantity for line in payload.items}
+    result = crud.set_cart_quantities(db, current_user.id, quantities)
+    if result["not_found"]:
+        raise HTTPException(status_code=404, detail={"not_found": result["not_found"]})
+    if result["insufficient"]:
+        raise HTTPException(status_code=400, detail={"insufficient_stock": result["insufficient"]})
+    return _summary(db, current_user.id, coupon_code)
+
+
 @router.put("/{item_id}", response_model=schemas.CartItem)
 def update_cart_item(
     item_id: int,
     quantity: int,
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
     db: Session = Depends(dependencies.get_db),
 ):
-    item = db.query(models.CartItem).filter(models.CartItem.id == item_id).first()
-    if not item or item.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Item not found")
+    item = _own_item(db, item_id, current_user.id)
     diff = quantity - item.quantity
-    if diff > 0:
-        if item.product.stock - item.product.reserved < diff:
-            raise HTTPException(status_code=400, detail="Insufficient stock")
-        item.product.reserved += diff
-    elif diff < 0:
-        item.product.reserved += diff  # diff is negative
-    return crud.update_cart_item_quantity(db, item, quantity)
+    if diff > 0 and item.product.stock - item.product.reserved < diff:
+        raise HTTPException(status_code=400, detail="Insufficient stock")
+    counted = crud.reserve_stock(db, item.product, diff)
+    item = crud.update_cart_item_quantity(db, item, quantity)
+    if counted:
+        menu.bump()
+    return item
 
 
 @router.delete("/{item_id}")
 def delete_cart_item(
     item_id: int,
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
     db: Session = Depends(dependencies.get_db),
 ):
-    item = db.query(models.CartItem).filter(models.CartItem.id == item_id).first()
-    if not item or item.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Item not found")
-    item.product.reserved -= item.quantity
+    item = _own_item(db, item_id, current_user.id)
+    counted = crud.reserve_stock(db, item.product, -item.quantity)
     crud.delete_cart_item(db, item)
+    if counted:
+        menu.bump()
     return {"detail": "deleted"}
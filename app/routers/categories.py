@@ -1,29 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from .. import schemas, crud, models
+from .. import schemas, crud, models, category_tree, menu, product_facets, suggest
 from ..dependencies import get_db, admin_required
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
-@router.post("/", response_model=schemas.Category, dependencies=[Depends(admin_required)])
-def create_category(category: schemas.CategoryBase, db: Session = Depends(get_db)):
-    db_cat = crud.get_or_create_category(db, name=category.name)
+def _check_parent(db: Session, parent_id: int | None) -> None:
+    if parent_id is not None and not db.get(models.Category, parent_id):
+        raise HTTPException(status_code=400, detail="Parent category not found")
+
+
+@router.post("/", response_model=schemas.CategoryListItem, dependencies=[Depends(admin_required)])
+def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_db)):
+    _check_parent(db, category.parent_id)
+    db_cat = crud.get_or_create_category(db, name=category.name, parent_id=category.parent_id)
+    if db_cat.parent_id != category.parent_id:
+        # names are unique across the whole tree
+        raise HTTPException(status_code=409, detail="Category name already used under another parent")
+    category_tree.invalidate()
+    suggest.invalidate()
     return db_cat
 
 
-@router.get("/", response_model=list[schemas.Category])
-def list_categories(db: Session = Depends(get_db)):
-    return db.query(models.Category).all()
+@router.get("/", response_model=list[schemas.CategoryListItem])
+def list_categories(
+    request: Request,
+    view: str = Query("flat", description="flat: rows with parent_id; tree: nested children"),
+    counts: bool = Query(False, description="Add product_count: in-stock products in the subtree"),
+):
+    """Every category in one response, served from the cached menu payload."""
+    if view not in ("flat", "tree"):
+        raise HTTPException(status_code=400, detail="view must be flat or tree")
+    body, etag = menu.payload(view, counts)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
-@router.put("/{category_id}", response_model=schemas.Category, dependencies=[Depends(admin_required)])
-def update_category(category_id: int, data: schemas.CategoryBase, db: Session = Depends(get_db)):
+@router.put("/{category_id}", response_model=schemas.CategoryListItem, dependencies=[Depends(admin_required)])
+def update_category(category_id: int, data: schemas.CategoryCreate, db: Session = Depends(get_db)):
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    return crud.update_category(db, category, data)
+    _check_parent(db, data.parent_id)
+    if data.parent_id is not None and crud.is_category_descendant(db, data.parent_id, category):
+        raise HTTPException(status_code=400, detail="A category cannot be moved below itself")
+    category = crud.update_category(db, category, data)
+    category_tree.invalidate()
+    product_facets.invalidate()
+    suggest.invalidate()
+    return category
 
 
 @router.delete("/{category_id}", status_code=204, dependencies=[Depends(admin_required)])
@@ -31,5 +59,10 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     category = db.query(models.Category).filter(models.Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    if crud.has_subcategories(db, category_id):
+        raise HTTPException(status_code=400, detail="Category has subcategories")
     crud.delete_category(db, category)
+    category_tree.invalidate()
+    product_facets.invalidate()
+    suggest.invalidate()
     return None
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+import datetime
 import uuid
 
-from .. import schemas, models, dependencies, auth as auth_utils, crud
+from .. import schemas, models, dependencies, auth as auth_utils, crud, geo
+from .. import coupon_rules, delivery_slots, serviceability
 
 router = APIRouter(tags=["checkout"])
 
@@ -11,8 +13,9 @@ router = APIRouter(tags=["checkout"])
 def checkout(
     address_id: int,
     coupon_code: str | None = Query(None),
+    slot_id: int | None = Query(None, description="Delivery slot to book"),
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     # 1. Grab all cart items for the current user
     cart_items = (
@@ -31,34 +34,51 @@ def checkout(
     # 3. Calculate cart total
     total = sum(ci.quantity * float(ci.product.price) for ci in cart_items)
 
-    # 4. Optional coupon application
-    coupon = None
+    # 4. Optional coupon (rules evaluated in memory, redemption counted atomically)
+    offer = None
     if coupon_code:
-        coupon = (
-            db.query(models.Coupon)
-            .filter(
-                models.Coupon.code == coupon_code,
-                models.Coupon.active.is_(True),
-            )
-            .first()
-        )
-        if not coupon:
+        if coupon_rules.find(db, coupon_code) is None:
             raise HTTPException(status_code=404, detail="Invalid coupon")
-        total *= 1 - (coupon.discount_percent / 100)
+        basket = coupon_rules.Basket.from_cart(cart_items)
+        offer = coupon_rules.apply_code(db, current_user.id, basket, coupon_code)
+        if offer is None:
+            raise HTTPException(status_code=400, detail="Coupon not applicable to this cart")
+        if not crud.redeem_coupon(db, offer.rule.id, current_user.id, offer.rule.per_user_limit):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Coupon usage limit reached")
+        total -= offer.discount
+
+    # 5. Book the delivery slot (committed together with the order)
+    slot = None
+    if slot_id is not None:
+        slot = db.get(models.DeliverySlot, slot_id)
+        zone = serviceability.check(address.pincode).get("zone")
+        if not slot or slot.zone != zone or slot.starts_at <= datetime.datetime.utcnow():
+            raise HTTPException(status_code=400, detail="Invalid delivery slot")
+        if not crud.book_delivery_slot(db, slot_id):
+            db.rollback()
+            delivery_slots.invalidate(slot.zone)
+            raise HTTPException(status_code=409, detail="Delivery slot is full")
 
-    # 5. Create the order
+    # 6. Create the order
     order = models.Order(
         user_id=current_user.id,
         shipping_address_id=address_id,
         total=total,
         status=models.OrderStatus.paid,
-        coupon_id=coupon.id if coupon else None,
+        coupon_id=offer.rule.id if offer else None,
+        delivery_cell=geo.cell_of(address.latitude, address.longitude),
+        ready_for_pickup_at=datetime.datetime.utcnow(),
+        delivery_slot_id=slot_id,
+        estimated_delivery=slot.ends_at if slot else None,
     )
     db.add(order)
     db.commit()
     db.refresh(order)
+    if slot:
+        delivery_slots.invalidate(slot.zone)
 
-    # 6. Convert cart items to order items & update stock/reserved
+    # 7. Convert cart items to order items & update stock/reserved
     for ci in cart_items:
         order_item = models.OrderItem(
             order_id=order.id,
@@ -71,7 +91,7 @@ def checkout(
         db.add(order_item)
         db.delete(ci)
 
-    # 7. Record payment (simulated here)
+    # 8. Record payment (simulated here)
     payment = models.Payment(
         order_id=order.id,
         provider_payment_id=str(uuid.uuid4()),
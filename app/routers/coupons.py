@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from .. import schemas, models, crud, auth
+from .. import schemas, models, crud, auth, coupon_rules
 from ..dependencies import get_db, admin_required
 
 router = APIRouter(prefix="/coupons", tags=["coupons"])
@@ -12,12 +12,36 @@ def create_coupon(coupon: schemas.Coupon, db: Session = Depends(get_db)):
     db.add(db_coupon)
     db.commit()
     db.refresh(db_coupon)
+    coupon_rules.invalidate()
     return db_coupon
 
 
-@router.post("/apply-coupon")
-def apply_coupon(code: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
-    coupon = db.query(models.Coupon).filter(models.Coupon.code == code, models.Coupon.active == True).first()
-    if not coupon:
+@router.put("/{coupon_id}", response_model=schemas.Coupon, dependencies=[Depends(admin_required)])
+def update_coupon(coupon_id: int, coupon: schemas.Coupon, db: Session = Depends(get_db)):
+    db_coupon = db.get(models.Coupon, coupon_id)
+    if not db_coupon:
+        raise HTTPException(status_code=404, detail="Coupon not found")
+    for field, value in coupon.dict(exclude={"id"}).items():
+        setattr(db_coupon, field, value)
+    db.commit()
+    db.refresh(db_coupon)
+    coupon_rules.invalidate()
+    return db_coupon
+
+
+@router.post("/apply-coupon", response_model=schemas.Coupon)
+def apply_coupon(code: str, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    rule = coupon_rules.find(db, code)
+    if not rule:
         raise HTTPException(status_code=404, detail="Invalid coupon")
-    return coupon
+    return {**rule._asdict(), "active": True}
+
+
+@router.get("/best", response_model=schemas.CouponOffer | None)
+def best_coupon(db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
+    """The coupon that takes the most off the current cart (``null`` if none applies)."""
+    cart_items = crud.get_cart_items(db, current_user.id)
+    offer = coupon_rules.best_offer(db, current_user.id, coupon_rules.Basket.from_cart(cart_items))
+    if offer is None:
+        return None
+    return {"code": offer.rule.code, "discount_percent": offer.rule.discount_percent, "discount": offer.discount}
@@ -1,27 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 import datetime
 
-from .. import schemas, models, dependencies, crud
+from .. import schemas, models, dependencies, crud, geo, routing, auth
 
 router = APIRouter(prefix="/delivery", tags=["delivery"])
 
 
-@router.get(
-    "/assignable",
-    response_model=list[schemas.Order],
+@router.get("/assignable", response_model=list[schemas.AssignableOrder])
+def list_assignable_orders(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Orders waiting for pickup, nearest to the rider's last location first.
+
+    Riders that have not reported a location, and orders without coordinates
+    or beyond the searched rings, fall back to oldest-first.
+    """
+    location = crud.get_rider_location(db, current_user.id)
+    nearest = []
+    if location:
+        nearest = crud.nearest_ready_orders(db, location.latitude, location.longitude, limit)
+    distances = {order_id: dist for dist, order_id in nearest}
+    orders = {
+        o.id: o
+        for o in db.query(models.Order).filter(models.Order.id.in_(distances))
+    }
+    ranked = [orders[order_id] for _, order_id in nearest if order_id in orders]
+    if len(ranked) < limit:
+        query = db.query(models.Order).filter(models.Order.ready_for_pickup_at.isnot(None))
+        if ranked:
+            query = query.filter(models.Order.id.notin_([o.id for o in ranked]))
+        ranked.extend(
+            query.order_by(models.Order.ready_for_pickup_at, models.Order.id)
+            .limit(limit - len(ranked))
+            .all()
+        )
+
+    load = crud.active_delivery_count(db, current_user.id)
+    result = []
+    for order in ranked:
+        item = schemas.AssignableOrder.model_validate(order, from_attributes=True)
+        distance = distances.get(order.id)
+        item.distance_km = round(distance, 3) if distance is not None else None
+        item.eta_minutes = geo.eta_minutes(distance, load)
+        result.append(item)
+    return result
+
+
+@router.put("/location", response_model=schemas.Location)
+def report_location(
+    location: schemas.Location,
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
+    db: Session = Depends(dependencies.get_db),
+):
+    return crud.update_rider_location(db, current_user.id, location)
+
+
+@router.post(
+    "/claim-next",
+    response_model=schemas.DeliveryAssignment,
     dependencies=[Depends(dependencies.delivery_required)],
 )
-def list_assignable_orders(db: Session = Depends(dependencies.get_db)):
-    # orders paid and not yet assigned
-    return (
-        db.query(models.Order)
-        .filter(
-            models.Order.status == models.OrderStatus.paid,
-            models.Order.delivery_assignment == None,  # noqa: E711
+def claim_next_order(
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
+    db: Session = Depends(dependencies.get_db),
+):
+    assignment = crud.claim_order_for_delivery(db, current_user.id)
+    if assignment is None:
+        raise HTTPException(status_code=404, detail="No orders ready for pickup")
+    return assignment
+
+
+@router.post("/claim-batch", response_model=schemas.DeliveryRoute)
+def claim_batch(
+    size: int = Query(routing.DEFAULT_BATCH_SIZE, ge=1, le=10),
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
+    db: Session = Depends(dependencies.get_db),
+):
+    """Claim a batch of nearby orders and return them in visiting order."""
+    location = crud.get_rider_location(db, current_user.id)
+    if not location:
+        raise HTTPException(status_code=400, detail="Report your location first")
+    start = (location.latitude, location.longitude)
+
+    nearest = crud.nearest_ready_orders(db, *start, limit=size * 4)
+    candidates = crud.get_order_coordinates(db, [order_id for _, order_id in nearest])
+    plan = routing.plan_batches(candidates, {current_user.id: start}, batch_size=size)
+
+    # one transaction for the whole batch: a failure below releases every order
+    orders = {
+        order.id: order
+        for order in crud.claim_orders_for_delivery(db, current_user.id, plan.get(current_user.id, []))
+    }
+    if not orders:
+        raise HTTPException(status_code=404, detail="No orders ready for pickup nearby")
+
+    # another rider may have won some of the planned orders; re-sequence
+    claimed = list(orders)
+    sequence = [claimed[i] for i in routing.solve_route(start, [candidates[o] for o in claimed])]
+    legs = routing.route_legs(start, [candidates[o] for o in sequence])
+    now = datetime.datetime.utcnow()
+    stops, travelled = [], 0.0
+    for index, (order_id, leg) in enumerate(zip(sequence, legs)):
+        travelled += leg
+        minutes = routing.stop_eta_minutes(travelled, index)
+        eta = now + datetime.timedelta(minutes=minutes)
+        orders[order_id].estimated_delivery = eta
+        stops.append(
+            {
+                "order_id": order_id,
+                "sequence": index + 1,
+                "distance_km": round(leg, 3),
+                "eta_minutes": minutes,
+                "estimated_delivery": eta,
+            }
         )
-        .all()
+    crud.notify_order_status(
+        db, [orders[o] for o in sequence], models.OrderStatus.out_for_delivery
     )
+    return {"stops": stops, "total_km": round(travelled, 3)}
 
 
 @router.post(
@@ -31,22 +130,12 @@ def list_assignable_orders(db: Session = Depends(dependencies.get_db)):
 )
 def take_order(
     order_id: int,
-    current_user: models.User = Depends(dependencies.delivery_required),
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
     db: Session = Depends(dependencies.get_db),
 ):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
-    if not order or order.status != models.OrderStatus.paid:
+    assignment = crud.claim_order_for_delivery(db, current_user.id, order_id)
+    if assignment is None:
         raise HTTPException(status_code=400, detail="Order not assignable")
-    if order.delivery_assignment:
-        raise HTTPException(status_code=400, detail="Already assigned")
-    assignment = models.DeliveryAssignment(
-        order_id=order.id, delivery_partner_id=current_user.id
-    )
-    # Compute and set estimated delivery time (ETA)
-    order.estimated_delivery = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
-    db.add(assignment)
-    crud.update_order_status(db, order, models.OrderStatus.out_for_delivery)
-    db.refresh(assignment)
     return assignment
 
 
@@ -57,7 +146,7 @@ def take_order(
 )
 def mark_delivered(
     order_id: int,
-    current_user: models.User = Depends(dependencies.delivery_required),
+    current_user: auth.Principal = Depends(dependencies.delivery_required),
     db: Session = Depends(dependencies.get_db),
 ):
     assignment = (
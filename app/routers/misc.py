@@ -1,10 +1,20 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+
+from .. import schemas, serviceability
 
 router = APIRouter(prefix="/serviceable", tags=["misc"])
 
-# Dummy pincode serviceability
-PINCODES = {"560001", "560002", "110001"}
+MAX_BULK_PINCODES = 1000
+
+
+@router.post("/bulk", response_model=list[schemas.Serviceability])
+def check_pincodes(payload: schemas.PincodeList):
+    """Check a whole address book in one call."""
+    if len(payload.pincodes) > MAX_BULK_PINCODES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_PINCODES} pincodes per request")
+    return [serviceability.check(p) for p in payload.pincodes]
+
 
-@router.get("/{pincode}")
+@router.get("/{pincode}", response_model=schemas.Serviceability)
 def check_pincode(pincode: str):
-    return {"serviceable": pincode in PINCODES}
+    return serviceability.check(pincode)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from .. import schemas, crud, auth, models
@@ -6,24 +6,40 @@ from ..dependencies import get_db
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+MAX_PAGE_SIZE = 100
+
 
 @router.get("/", response_model=list[schemas.Notification])
 def get_notifications(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
 ):
-    return (
-        db.query(models.Notification)
-        .filter(models.Notification.user_id == current_user.id)
-        .all()
-    )
+    return crud.get_notifications(db, current_user.id, skip=skip, limit=limit)
+
+
+@router.get("/unread-count", response_model=schemas.UnreadCount)
+def unread_count(
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    return {"unread": crud.unread_notification_count(db, current_user.id)}
+
+
+@router.post("/mark-all-read", response_model=schemas.MarkAllReadResult)
+def mark_all_read(
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_user),
+):
+    return {"updated": crud.mark_all_notifications_read(db, current_user.id)}
 
 
 @router.patch("/{notification_id}/read", response_model=schemas.Notification)
 def mark_read(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: auth.Principal = Depends(auth.get_current_user),
 ):
     notif = (
         db.query(models.Notification)
@@ -7,10 +7,17 @@ from ..dependencies import get_db, admin_required, delivery_required
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 @router.put("/{order_id}/status", response_model=schemas.Order)
-def update_status(order_id: int, status: schemas.OrderStatus, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def update_status(order_id: int, status: schemas.OrderStatus, db: Session = Depends(get_db), current_user: auth.Principal = Depends(auth.get_current_user)):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if not current_user.is_admin and not current_user.is_delivery_partner:
         raise HTTPException(status_code=403, detail="Not allowed")
+    if order.status == models.OrderStatus.pending and status not in (
+        schemas.OrderStatus.pending, schemas.OrderStatus.cancelled
+    ):
+        # marked paid (or further) by hand: the coupon counts now
+        if not crud.redeem_order_coupon(db, order):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Coupon usage limit reached")
     return crud.update_order_status(db, order, status)
@@ -1,7 +1,14 @@
+import csv
+import datetime
+import io
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from .. import schemas, models, dependencies, auth as auth_utils, crud
+from .. import schemas, models, dependencies, auth as auth_utils, crud, geo, coupon_rules
+from ..database import SessionLocal
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -14,7 +21,7 @@ def place_order(
     address_id: int,
     coupon_code: str | None = Query(None),
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     # ── Fetch cart items ──────────────────────────────────────────────
     cart_items = (
@@ -32,19 +39,16 @@ def place_order(
 
     # ── Calculate total & apply coupon (if any) ───────────────────────
     total = sum(ci.quantity * float(ci.product.price) for ci in cart_items)
-    coupon = None
+    offer = None
     if coupon_code:
-        coupon = (
-            db.query(models.Coupon)
-            .filter(
-                models.Coupon.code == coupon_code,
-                models.Coupon.active.is_(True),
-            )
-            .first()
-        )
-        if not coupon:
+        if coupon_rules.find(db, coupon_code) is None:
             raise HTTPException(status_code=404, detail="Invalid coupon")
-        total *= 1 - (coupon.discount_percent / 100)
+        basket = coupon_rules.Basket.from_cart(cart_items)
+        offer = coupon_rules.apply_code(db, current_user.id, basket, coupon_code)
+        if offer is None:
+            raise HTTPException(status_code=400, detail="Coupon not applicable to this cart")
+        # the redemption is counted when the order is paid (payments router)
+        total -= offer.discount
 
     # ── Create order ──────────────────────────────────────────────────
     order = models.Order(
@@ -52,7 +56,8 @@ def place_order(
         shipping_address_id=address_id,
         total=total,
         status=models.OrderStatus.pending,
-        coupon_id=coupon.id if coupon else None,
+        coupon_id=offer.rule.id if offer else None,
+        delivery_cell=geo.cell_of(address.latitude, address.longitude),
     )
     db.add(order)
     db.commit()
@@ -82,7 +87,7 @@ def place_order(
 @router.get("/", response_model=list[schemas.Order])
 def list_orders(
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     return (
         db.query(models.Order)
@@ -100,7 +105,108 @@ def list_orders(
     dependencies=[Depends(dependencies.admin_required)],
 )
 def list_all_orders(db: Session = Depends(dependencies.get_db)):
-    return db.query(models.Order).all()
+    return ORJSONResponse(crud.get_order_rows(db))
+
+
+# ──────────────────────────
+# 3b. Admin: stream an export of orders
+# ──────────────────────────
+EXPORT_FLUSH_EVERY = 500
+CSV_COLUMNS = [
+    "order_id",
+    "user_id",
+    "created_at",
+    "status",
+    "total",
+    "coupon_id",
+    "shipping_address_id",
+    "estimated_delivery",
+    "product_id",
+    "quantity",
+    "price",
+]
+
+
+def _iso(value: datetime.datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _order_record(order, items) -> dict:
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "shipping_address_id": order.shipping_address_id,
+        "created_at": _iso(order.created_at),
+        "total": order.total,
+        "coupon_id": order.coupon_id,
+        "status": order.status.value if order.status else None,
+        "estimated_delivery": _iso(order.estimated_delivery),
+        "items": [
+            {"product_id": i.product_id, "quantity": i.quantity, "price": i.price}
+            for i in items
+        ],
+    }
+
+
+def _ndjson_lines(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def _csv_lines(record: dict) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    head = [
+        record["id"],
+        record["user_id"],
+        record["created_at"],
+        record["status"],
+        record["total"],
+        record["coupon_id"],
+        record["shipping_address_id"],
+        record["estimated_delivery"],
+    ]
+    for item in record["items"] or [{}]:
+        writer.writerow(head + [item.get("product_id"), item.get("quantity"), item.get("price")])
+    return buf.getvalue()
+
+
+def _stream_export(render, header, start, end, status):
+    # The request-scoped session is closed before a streaming body is sent,
+    # so the generator owns its own session for the duration of the export.
+    db = SessionLocal()
+    try:
+        chunk = [header] if header else []
+        for order, items in crud.iter_orders_for_export(db, start, end, status):
+            chunk.append(render(_order_record(order, items)))
+            if len(chunk) >= EXPORT_FLUSH_EVERY:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+    finally:
+        db.close()
+
+
+@router.get("/export", dependencies=[Depends(dependencies.admin_required)])
+def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: datetime.datetime | None = Query(None, description="created_at >= start"),
+    end: datetime.datetime | None = Query(None, description="created_at < end"),
+    status: schemas.OrderStatus | None = Query(None),
+):
+    model_status = models.OrderStatus(status.value) if status else None
+    if format == "csv":
+        header = ",".join(CSV_COLUMNS) + "\r\n"
+        body = _stream_export(_csv_lines, header, start, end, model_status)
+        media_type = "text/csv"
+    else:
+        body = _stream_export(_ndjson_lines, None, start, end, model_status)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
 
 
 # ──────────────────────────
@@ -110,7 +216,7 @@ def list_all_orders(db: Session = Depends(dependencies.get_db)):
 def get_order(
     order_id: int,
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
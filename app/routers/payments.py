@@ -46,6 +46,9 @@ def confirm_payment(order_id: int, db: Session = Depends(dependencies.get_db)):
         status=models.PaymentStatus.confirmed,
     )
     db.add(payment)
+    if not crud.redeem_order_coupon(db, order):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Coupon usage limit reached")
     crud.update_order_status(db, order, models.OrderStatus.paid)
     db.refresh(payment)
     db.refresh(order)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
-from .. import schemas, crud, models
+from .. import schemas, crud, models, product_facets, suggest
 from ..dependencies import get_db, admin_required
 
 router = APIRouter(prefix="/products", tags=["products"])
@@ -12,7 +13,40 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     # ensure category exists
     if product.category_id is None:
         raise HTTPException(status_code=400, detail="category_id required")
-    return crud.create_product(db, product)
+    db_product = crud.create_product(db, product)
+    product_facets.invalidate()
+    suggest.add_product(db_product)
+    return db_product
+
+
+@router.get("/suggest", response_model=list[schemas.Suggestion])
+def suggest_products(
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(8, ge=1, le=suggest.MAX_SUGGESTIONS),
+):
+    """Typeahead: products, brands and categories starting with ``q``, best sellers first."""
+    return ORJSONResponse(suggest.suggest(q, limit))
+
+
+@router.get("/facets", response_model=schemas.ProductFacets)
+def product_facets_for_search(
+    search: str | None = Query(None, description="Search query"),
+    q: str | None = Query(None, description="Search query"),
+    brand: str | None = Query(None),
+    price_min: float | None = Query(None),
+    price_max: float | None = Query(None),
+    category_id: int | None = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Brand / category / price-band counts for the same filters as ``GET /products``."""
+    return product_facets.facets(
+        db,
+        q=search or q,
+        category_id=category_id,
+        brand=brand,
+        price_min=price_min,
+        price_max=price_max,
+    )
 
 
 @router.get("/", response_model=list[schemas.Product])
@@ -25,11 +59,30 @@ def list_products(
     price_min: float | None = Query(None),
     price_max: float | None = Query(None),
     category_id: int | None = Query(None),
-    sort: str | None = Query(None, description="price_asc or price_desc"),
+    sort: str | None = Query(None, description="price_asc, price_desc or discount_desc"),
+    fields: str | None = Query(None, description="Comma-separated columns to return"),
+    view: str | None = Query(None, description="card: compact storefront tiles"),
     db: Session = Depends(get_db),
 ):
     query = search or q
-    return crud.get_products(
+    columns = None
+    if view == "card":
+        if fields:
+            raise HTTPException(status_code=400, detail="Use either fields or view")
+        columns = crud.PRODUCT_CARD_FIELDS
+    elif view not in (None, "full"):
+        raise HTTPException(status_code=400, detail="view must be card or full")
+    elif fields:
+        columns = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in columns if f not in crud.PRODUCT_FIELDS]
+        if unknown or not columns:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+    # full rows already match schemas.Product (projections return just the
+    # requested keys); returning the response directly skips per-item
+    # validation, response_model still documents the default shape
+    rows = crud.get_product_rows(
         db,
         skip=skip,
         limit=limit,
@@ -39,5 +92,6 @@ def list_products(
         price_min=price_min,
         price_max=price_max,
         sort=sort,
+        fields=columns,
     )
-
+    return ORJSONResponse(rows)
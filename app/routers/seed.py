@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from ..dependencies import get_db
 
 
+from .. import crud, schemas
 from ..models import Product    # adjust path if your models live elsewhere
 
 router = APIRouter(tags=["dev-tools"])
@@ -38,7 +39,7 @@ def seed_products(db: Session = Depends(get_db)):
     if db.query(Product).count() > 0:
         raise HTTPException(status_code=400, detail="Products already exist")
 
+    # through crud so price history and the category menu counts follow
     for item in DEMO_PRODUCTS:
-        db.add(Product(**item))
-    db.commit()
+        crud.create_product(db, schemas.ProductCreate(**item))
     return {"inserted": len(DEMO_PRODUCTS)}
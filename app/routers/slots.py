@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from .. import schemas, crud, delivery_slots, serviceability
+from ..dependencies import get_db, admin_required
+
+router = APIRouter(prefix="/slots", tags=["slots"])
+
+
+@router.post("/", response_model=schemas.DeliverySlot, dependencies=[Depends(admin_required)])
+def create_slot(slot: schemas.DeliverySlotBase, db: Session = Depends(get_db)):
+    if slot.ends_at <= slot.starts_at:
+        raise HTTPException(status_code=400, detail="Slot must end after it starts")
+    db_slot = crud.create_delivery_slot(db, slot)
+    if db_slot is None:
+        raise HTTPException(status_code=409, detail="Zone already has a slot starting then")
+    delivery_slots.invalidate(db_slot.zone)
+    return db_slot
+
+
+@router.get("/{pincode}", response_model=list[schemas.AvailableSlot])
+def available_slots(pincode: str, db: Session = Depends(get_db)):
+    zone = serviceability.check(pincode).get("zone")
+    if not zone:
+        raise HTTPException(status_code=404, detail="Pincode not serviceable")
+    return delivery_slots.available_slots(db, zone)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from .. import schemas, models, dependencies, crud, auth as auth_utils
+from .. import schemas, dependencies, crud, auth as auth_utils
 
 router = APIRouter(prefix="/wishlist", tags=["wishlist"])
 
@@ -10,7 +10,7 @@ router = APIRouter(prefix="/wishlist", tags=["wishlist"])
 def add_item(
     item: schemas.WishlistItemBase,
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     product = crud.get_product(db, item.product_id)
     if not product:
@@ -22,7 +22,7 @@ def add_item(
 def remove_item(
     item: schemas.WishlistItemBase,
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     crud.remove_from_wishlist(db, current_user.id, item.product_id)
     return {"detail": "removed"}
@@ -31,6 +31,6 @@ def remove_item(
 @router.get("/", response_model=list[schemas.WishlistItem])
 def list_items(
     db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(auth_utils.get_current_user),
+    current_user: auth_utils.Principal = Depends(auth_utils.get_current_user),
 ):
     return crud.list_wishlist(db, current_user.id)
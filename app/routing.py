@@ -0,0 +1,130 @@
+"""Batch planning for riders: cluster nearby orders and sequence the stops.
+
+Distances are great-circle kilometres computed as NumPy matrices, so planning
+for hundreds of open orders and dozens of riders is a handful of array
+operations.  Each batch is sequenced with nearest-neighbour followed by 2-opt,
+which is near-optimal for the handful of stops a rider carries.
+"""
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from . import geo
+
+DEFAULT_BATCH_SIZE = 5
+MAX_PICKUP_KM = 5.0  # rider -> first stop
+MAX_CLUSTER_KM = 3.0  # first stop -> any other stop in the batch
+
+Point = Tuple[float, float]
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def distance_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Haversine distances (km) between every row of ``a`` and of ``b``.
+
+    Both arrays are ``(n, 2)`` of ``(latitude, longitude)`` in degrees.
+    """
+    a = np.radians(np.asarray(a, dtype=float).reshape(-1, 2))
+    b = np.radians(np.asarray(b, dtype=float).reshape(-1, 2))
+    return _haversine(a[:, 0:1], a[:, 1:2], b[:, 0], b[:, 1])
+
+
+def _path_length(order: List[int], dist: np.ndarray) -> float:
+    return float(sum(dist[order[i], order[i + 1]] for i in range(len(order) - 1)))
+
+
+def solve_route(start: Point, stops: Sequence[Point]) -> List[int]:
+    """Return the visiting order (indices into ``stops``) starting at ``start``.
+
+    The path is open: the rider does not return to ``start``.
+    """
+    if len(stops) <= 1:
+        return list(range(len(stops)))
+    points = np.vstack([np.asarray(start, dtype=float), np.asarray(stops, dtype=float)])
+    dist = distance_matrix(points, points)
+
+    # nearest neighbour from the rider (node 0)
+    path = [0]
+    remaining = set(range(1, len(points)))
+    while remaining:
+        last = path[-1]
+        nxt = min(remaining, key=lambda j: dist[last, j])
+        path.append(nxt)
+        remaining.remove(nxt)
+
+    # 2-opt on the open path, keeping the start fixed
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(path) - 1):
+            for k in range(i + 1, len(path)):
+                candidate = path[:i] + path[i : k + 1][::-1] + path[k + 1 :]
+                if _path_length(candidate, dist) + 1e-9 < _path_length(path, dist):
+                    path = candidate
+                    improved = True
+    return [node - 1 for node in path[1:]]
+
+
+def route_legs(start: Point, stops: Sequence[Point]) -> List[float]:
+    """Kilometres of each leg when visiting ``stops`` in the given order."""
+    if not stops:
+        return []
+    points = np.radians(
+        np.vstack([np.asarray(start, dtype=float), np.asarray(stops, dtype=float)])
+    )
+    a, b = points[:-1], points[1:]
+    return _haversine(a[:, 0], a[:, 1], b[:, 0], b[:, 1]).tolist()
+
+
+def stop_eta_minutes(cumulative_km: float, stop_index: int) -> int:
+    """Minutes until the ``stop_index``-th (0-based) stop of a route is reached."""
+    travel = cumulative_km / geo.AVERAGE_SPEED_KMH * 60
+    return math.ceil(geo.HANDLING_MINUTES * (stop_index + 1) + travel)
+
+
+def plan_batches(
+    orders: Dict[int, Point],
+    riders: Dict[int, Point],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_pickup_km: float = MAX_PICKUP_KM,
+    max_cluster_km: float = MAX_CLUSTER_KM,
+) -> Dict[int, List[int]]:
+    """Give each rider a batch of nearby orders, in visiting order.
+
+    Riders closest to any open order choose first.  A rider's batch is seeded
+    with its nearest order and grown with the orders closest to that seed
+    (within ``max_cluster_km``).  Orders are never given to two riders.
+    Returns ``{rider_id: [order_id, ...]}`` for riders that received work.
+    """
+    if not orders or not riders:
+        return {}
+    order_ids = list(orders)
+    rider_ids = list(riders)
+    order_pts = np.array([orders[o] for o in order_ids], dtype=float)
+    rider_pts = np.array([riders[r] for r in rider_ids], dtype=float)
+    d_ro = distance_matrix(rider_pts, order_pts)
+    d_oo = distance_matrix(order_pts, order_pts)
+    free = np.ones(len(order_ids), dtype=bool)
+
+    plans = {}
+    for r in np.argsort(d_ro.min(axis=1)):
+        if not free.any():
+            break
+        to_orders = np.where(free, d_ro[r], np.inf)
+        seed = int(np.argmin(to_orders))
+        if to_orders[seed] > max_pickup_km:
+            continue
+        to_seed = np.where(free, d_oo[seed], np.inf)
+        members = [i for i in np.argsort(to_seed)[:batch_size] if to_seed[i] <= max_cluster_km]
+        free[members] = False
+        sequence = solve_route(tuple(rider_pts[r]), order_pts[members])
+        plans[rider_ids[r]] = [order_ids[members[i]] for i in sequence]
+    return plans
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr, conint
+from typing import List, Optional, TypedDict
+from pydantic import BaseModel, EmailStr, confloat, conint
 import datetime
 from enum import Enum
 
@@ -25,6 +25,10 @@ class CategoryBase(BaseModel):
     name: str
 
 
+class CategoryCreate(CategoryBase):
+    parent_id: Optional[int] = None
+
+
 class Category(CategoryBase):
     id: int
 
@@ -32,6 +36,16 @@ class Category(CategoryBase):
         orm_mode = True
 
 
+class CategoryListItem(Category):
+    parent_id: Optional[int] = None
+
+
+class CategoryNode(BaseModel):
+    id: int
+    name: str
+    children: List["CategoryNode"] = []
+
+
 # Product
 class ProductBase(BaseModel):
     name: str
@@ -53,11 +67,61 @@ class Product(ProductBase):
     id: int
     category: Optional[Category] = None
     reserved: int
+    effective_discount: float = 0
+    lowest_price_30d: Optional[float] = None
 
     class Config:
         orm_mode = True
 
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class CategoryFacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class ProductFacets(BaseModel):
+    brand: List[FacetCount]
+    category: List[CategoryFacetCount]
+    price_band: List[FacetCount]
+
+
+class Suggestion(BaseModel):
+    kind: str  # product | brand | category
+    id: Optional[int] = None
+    text: str
+
+
+class ProductBulkUpdateItem(BaseModel):
+    """Partial stock/price change for one product.
+
+    ``stock`` sets an absolute level and ``stock_delta`` adjusts the current
+    one; supplying both for the same product is rejected.
+    """
+
+    id: int
+    stock: Optional[conint(ge=0)] = None
+    stock_delta: Optional[int] = None
+    price: Optional[confloat(ge=0)] = None
+    mrp: Optional[confloat(ge=0)] = None
+    discount_pct: Optional[conint(ge=0, le=100)] = None
+
+
+class ProductBulkUpdate(BaseModel):
+    items: List[ProductBulkUpdateItem]
+
+
+class ProductBulkUpdateResult(BaseModel):
+    updated: int
+    not_found: List[int] = []
+    rejected: List[int] = []
+
+
 # User
 class UserCreate(BaseModel):
     email: EmailStr
@@ -122,6 +186,46 @@ class CartItem(CartItemBase):
         orm_mode = True
 
 
+class CartBulkLine(BaseModel):
+    product_id: int
+    quantity: conint(ge=0)
+
+
+class CartBulkUpdate(BaseModel):
+    items: List[CartBulkLine]
+
+
+class CartSummaryRow(TypedDict):
+    items: List[dict]  # CartLine fields, left as dicts for ORJSONResponse
+    subtotal: float
+    coupon_code: Optional[str]
+    discount: float
+    total: float
+
+
+class CartLine(BaseModel):
+    id: int
+    product_id: int
+    name: str
+    brand: Optional[str] = None
+    category_id: Optional[int] = None
+    image_url: Optional[str] = None
+    price: float
+    mrp: Optional[float] = None
+    quantity: int
+    line_total: float
+    available: int
+    in_stock: bool
+
+
+class CartSummary(BaseModel):
+    items: List[CartLine]
+    subtotal: float
+    coupon_code: Optional[str] = None
+    discount: float
+    total: float
+
+
 class WishlistItemBase(BaseModel):
     product_id: int
 
@@ -151,12 +255,79 @@ class Order(BaseModel):
     coupon_id: Optional[int] = None
     status: OrderStatus
     estimated_delivery: Optional[datetime.datetime] = None
+    delivery_slot_id: Optional[int] = None
     items: List[OrderItem]
 
     class Config:
         orm_mode = True
 
 
+# Read-only rows for hot list endpoints.  These are built straight from SQL
+# result tuples (see crud.get_*_rows) and serialized without validation, so
+# they must keep the same keys as Category / Product / Order above.
+class CategoryRow(TypedDict):
+    id: int
+    name: str
+
+
+class CategoryListRow(CategoryRow):
+    parent_id: Optional[int]
+
+
+class CategoryNodeRow(TypedDict):
+    id: int
+    name: str
+    children: List["CategoryNodeRow"]
+
+
+class ProductRow(TypedDict):
+    id: int
+    name: str
+    description: Optional[str]
+    brand: Optional[str]
+    mrp: Optional[float]
+    price: float
+    discount_pct: int
+    image_url: Optional[str]
+    stock: int
+    reserved: int
+    category_id: Optional[int]
+    effective_discount: float
+    lowest_price_30d: Optional[float]
+    category: Optional[CategoryRow]
+
+
+class ProductCardRow(TypedDict):
+    """Storefront grid tile (``GET /products?view=card``)."""
+
+    id: int
+    name: str
+    price: float
+    mrp: Optional[float]
+    discount_pct: int
+    image_url: Optional[str]
+    in_stock: bool
+    category_name: Optional[str]
+
+
+class OrderItemRow(TypedDict):
+    product_id: int
+    quantity: int
+    price: float
+
+
+class OrderRow(TypedDict):
+    id: int
+    shipping_address_id: int
+    created_at: datetime.datetime
+    total: float
+    coupon_id: Optional[int]
+    status: OrderStatus
+    estimated_delivery: Optional[datetime.datetime]
+    delivery_slot_id: Optional[int]
+    items: List[OrderItemRow]
+
+
 # Payment
 class Payment(BaseModel):
     id: int
@@ -181,6 +352,53 @@ class DeliveryAssignment(BaseModel):
         orm_mode = True
 
 
+class Location(BaseModel):
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+
+
+class AssignableOrder(Order):
+    distance_km: Optional[float] = None
+    eta_minutes: Optional[int] = None
+
+
+class RouteStop(BaseModel):
+    order_id: int
+    sequence: int
+    distance_km: float
+    eta_minutes: int
+    estimated_delivery: datetime.datetime
+
+
+class DeliveryRoute(BaseModel):
+    stops: List[RouteStop]
+    total_km: float
+
+
+# Delivery slots
+class DeliverySlotBase(BaseModel):
+    zone: str
+    starts_at: datetime.datetime
+    ends_at: datetime.datetime
+    capacity: conint(gt=0)
+
+
+class DeliverySlot(DeliverySlotBase):
+    id: int
+    booked: int
+
+    class Config:
+        orm_mode = True
+
+
+class AvailableSlot(BaseModel):
+    id: int
+    zone: str
+    starts_at: datetime.datetime
+    ends_at: datetime.datetime
+    remaining: int
+
+
 # -------- Additional Schemas --------
 class AddressBase(BaseModel):
     address_line: str
@@ -188,6 +406,8 @@ class AddressBase(BaseModel):
     pincode: str
     label: Optional[str] = None
     is_default: bool = False
+    latitude: Optional[confloat(ge=-90, le=90)] = None
+    longitude: Optional[confloat(ge=-180, le=180)] = None
 
 
 class Address(AddressBase):
@@ -217,11 +437,23 @@ class Coupon(BaseModel):
     code: str
     discount_percent: int
     active: bool
+    min_basket: Optional[float] = None
+    category_id: Optional[int] = None
+    brand: Optional[str] = None
+    per_user_limit: Optional[int] = None
+    starts_at: Optional[datetime.datetime] = None
+    ends_at: Optional[datetime.datetime] = None
 
     class Config:
         orm_mode = True
 
 
+class CouponOffer(BaseModel):
+    code: str
+    discount_percent: int
+    discount: float
+
+
 class WalletTransaction(BaseModel):
     id: int
     user_id: int
@@ -244,6 +476,14 @@ class Notification(BaseModel):
         orm_mode = True
 
 
+class UnreadCount(BaseModel):
+    unread: int
+
+
+class MarkAllReadResult(BaseModel):
+    updated: int
+
+
 class OTPRequest(BaseModel):
     id: int
     phone_number: str
@@ -253,3 +493,16 @@ class OTPRequest(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class Serviceability(BaseModel):
+    pincode: str
+    serviceable: bool
+    zone: Optional[str] = None
+    dark_store: Optional[str] = None
+    delivery_fee: Optional[float] = None
+    eta_minutes: Optional[int] = None
+
+
+class PincodeList(BaseModel):
+    pincodes: List[str]
@@ -0,0 +1,156 @@
+"""Pincode serviceability lookups.
+
+The pincode -> zone dataset is loaded into two parallel arrays (sorted 6-digit
+pincodes and an index into a small zone table), so a lookup is one bisect
+over ~20k ints with no per-pincode Python objects.  The source is either a
+CSV file (``PINCODES_SOURCE``, default ``app/data/pincodes.csv``) or, with
+``PINCODES_SOURCE=db``, the ``serviceable_pincodes`` table.  The source is
+re-checked at most every ``PINCODES_RELOAD_SECONDS`` and reloaded when it
+changed, so edits go live without a restart.  A source that fails to load
+(malformed or half-written) is logged and the previous index keeps serving
+until the source changes again.
+"""
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import func
+
+from . import database, models
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(__file__), "data", "pincodes.csv")
+RELOAD_SECONDS = float(os.getenv("PINCODES_RELOAD_SECONDS", "5"))
+# six ASCII digits, no leading zero (str.isdigit also accepts e.g. "١٢٣٤٥٦")
+_PINCODE = re.compile(r"[1-9][0-9]{5}")
+
+logger = logging.getLogger("greenbasket.serviceability")
+
+
+class Zone(NamedTuple):
+    zone: str
+    dark_store: Optional[str]
+    delivery_fee: float
+    eta_minutes: int
+
+
+class PincodeIndex:
+    def __init__(self, rows: Iterable[tuple], version=None):
+        zones: List[Zone] = []
+        zone_ids = {}
+        pairs = []
+        for pincode, zone, dark_store, fee, eta in rows:
+            # a truncated file ends in a short row: refuse it rather than index it
+            if not zone or not _PINCODE.fullmatch(str(pincode)):
+                raise ValueError(f"bad pincode row {pincode!r}, {zone!r}")
+            key = Zone(zone, dark_store or None, float(fee or 0), int(eta or 0))
+            if key not in zone_ids:
+                zone_ids[key] = len(zones)
+                zones.append(key)
+            pairs.append((int(pincode), zone_ids[key]))
+        pairs.sort()
+        self.pincodes = array("I", (p for p, _ in pairs))
+        self.zone_ids = array("H", (z for _, z in pairs))
+        self.zones = zones
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.pincodes)
+
+    def lookup(self, pincode: str) -> Optional[Zone]:
+        if not _PINCODE.fullmatch(pincode):
+            return None
+        key = int(pincode)
+        i = bisect_left(self.pincodes, key)
+        if i < len(self.pincodes) and self.pincodes[i] == key:
+            return self.zones[self.zone_ids[i]]
+        return None
+
+
+def _source() -> str:
+    return os.getenv("PINCODES_SOURCE", DEFAULT_SOURCE)
+
+
+def _source_version(source: str):
+    if source == "db":
+        db = database.SessionLocal()
+        try:
+            table = models.ServiceablePincode
+            return tuple(
+                db.query(func.count(table.pincode), func.max(table.updated_at)).one()
+            )
+        finally:
+            db.close()
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load(source: str, version) -> PincodeIndex:
+    if source == "db":
+        db = database.SessionLocal()
+        try:
+            table = models.ServiceablePincode
+            rows = db.query(
+                table.pincode,
+                table.zone,
+                table.dark_store,
+                table.delivery_fee,
+                table.eta_minutes,
+            ).all()
+        finally:
+            db.close()
+        return PincodeIndex(rows, version)
+    if version is None:
+        return PincodeIndex([], version)
+    with open(source, newline="") as fh:
+        rows = [
+            (r["pincode"], r["zone"], r.get("dark_store"), r.get("delivery_fee"), r.get("eta_minutes"))
+            for r in csv.DictReader(fh)
+        ]
+    return PincodeIndex(rows, version)
+
+
+_index: Optional[PincodeIndex] = None
+_checked_at = 0.0
+# version of the source that last failed to load; not retried until it changes
+_failed_version = None
+_lock = threading.Lock()
+
+
+def get_index() -> PincodeIndex:
+    """Return the current index, reloading it if the source changed."""
+    global _index, _checked_at, _failed_version
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < RELOAD_SECONDS:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < RELOAD_SECONDS:
+            return _index
+        source = _source()
+        version = None
+        try:
+            version = _source_version(source)
+            if _index is None or version not in (_index.version, _failed_version):
+                _index = _load(source, version)
+        except Exception:
+            logger.exception("could not load pincodes from %s, keeping the previous index", source)
+            _failed_version = version
+            if _index is None:
+                _index = PincodeIndex([])
+        _checked_at = now
+        return _index
+
+
+def check(pincode: str) -> dict:
+    zone = get_index().lookup(pincode.strip())
+    if zone is None:
+        return {"pincode": pincode, "serviceable": False}
+    return {"pincode": pincode, "serviceable": True, **zone._asdict()}
@@ -0,0 +1,259 @@
+"""Typeahead suggestions over product names, brands and category names.
+
+Every suggestable term is indexed under each of its word starts ("amul gold
+milk" under "amul gold milk", "gold milk" and "milk") in one sorted list of
+``(key, entry)`` tuples, so a prefix is a ``bisect`` range.  Scanning a range
+is only cheap while it is small, so for every prefix matching more than
+``HOT_RANGE`` keys the best ``HOT_SIZE`` entries are precomputed (bottom-up
+over the sorted keys, like the nodes of a trie).  Entries are ranked by units
+sold; brands and categories by the sum over their products.
+
+Product writes through the API update the index in place (``add_product``,
+``remove_product``); category changes and the sales ranking are picked up by
+a full rebuild every ``SUGGEST_REBUILD_SECONDS``, done in a background
+thread while the old index keeps serving.  A rebuild that overlapped a
+product write or ``invalidate()`` is thrown away (the write is already in
+the serving index) and retried on a later lookup.  Other workers only see
+product writes after their next rebuild.
+"""
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from . import database, models
+
+REBUILD_SECONDS = float(os.getenv("SUGGEST_REBUILD_SECONDS", "600"))
+MAX_SUGGESTIONS = 10
+HOT_RANGE = 256
+# precomputed lists keep some slack so removals rarely force a rescan
+HOT_SIZE = 2 * MAX_SUGGESTIONS
+_END = "\uffff"
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _word_starts(term: str) -> List[str]:
+    words = term.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _prefixes(key: str):
+    return (key[:n] for n in range(1, len(key) + 1))
+
+
+class SuggestIndex:
+    def __init__(self, products, categories, units_sold: Dict[int, int]):
+        self.entries: List[Optional[dict]] = []
+        self.scores: List[tuple] = []
+        self.keys: List[tuple] = []
+        self.hot: Dict[str, List[int]] = {}
+        self.product_entries: Dict[int, int] = {}
+        self.brand_entries: Dict[str, int] = {}
+
+        brand_units = defaultdict(int)
+        category_units = defaultdict(int)
+        for product_id, name, brand, category_id in products:
+            units = units_sold.get(product_id, 0)
+            self.product_entries[product_id] = self._add(
+                {"kind": "product", "id": product_id, "text": name}, units
+            )
+            if brand:
+                brand_units[brand] += units
+            if category_id:
+                category_units[category_id] += units
+        for brand, units in brand_units.items():
+            self.brand_entries[normalize(brand)] = self._add(
+                {"kind": "brand", "id": None, "text": brand}, units
+            )
+        for category_id, name in categories:
+            self._add(
+                {"kind": "category", "id": category_id, "text": name},
+                category_units.get(category_id, 0),
+            )
+        self.keys.sort()
+        self._build_hot(0, len(self.keys), "")
+        self.built_at = time.monotonic()
+
+    def _build_hot(self, lo: int, hi: int, prefix: str) -> List[int]:
+        """Best entries for keys[lo:hi] (all starting with ``prefix``).
+
+        Large ranges are split by the next character and their children's
+        lists merged, so every key is scanned once overall.
+        """
+        if hi - lo <= HOT_RANGE:
+            return self._best((ref for _, ref in self.keys[lo:hi]), HOT_SIZE)
+        depth = len(prefix)
+        candidates = set()
+        pos = lo
+        while pos < hi and len(self.keys[pos][0]) == depth:  # the prefix itself
+            candidates.add(self.keys[pos][1])
+            pos += 1
+        while pos < hi:
+            child = prefix + self.keys[pos][0][depth]
+            end = bisect_left(self.keys, (child + _END,), pos, hi)
+            candidates.update(self._build_hot(pos, end, child))
+            pos = end
+        best = self._best(candidates, HOT_SIZE)
+        if prefix:
+            self.hot[prefix] = best
+        return best
+
+    def _add(self, entry: dict, units: int, keep_sorted: bool = False) -> int:
+        ref = len(self.entries)
+        self.entries.append(entry)
+        # higher sales first, then shorter text
+        self.scores.append((units, -len(entry["text"])))
+        for key in _word_starts(normalize(entry["text"])):
+            if keep_sorted:
+                insort(self.keys, (key, ref))
+                self._offer(key, ref)
+            else:
+                self.keys.append((key, ref))
+        return ref
+
+    def _best(self, refs, limit: int = MAX_SUGGESTIONS) -> List[int]:
+        live = {r for r in refs if self.entries[r] is not None}
+        return heapq.nlargest(limit, live, key=self.scores.__getitem__)
+
+    def _range(self, prefix: str) -> List[int]:
+        lo = bisect_left(self.keys, (prefix,))
+        hi = bisect_left(self.keys, (prefix + _END,))
+        return [ref for _, ref in self.keys[lo:hi]]
+
+    def lookup(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[dict]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        refs = self.hot.get(prefix)
+        if refs is None:
+            refs = self._best(self._range(prefix), limit)
+        return [self.entries[r] for r in refs[:limit]]
+
+    # ── incremental updates (callers hold _lock) ──
+    def _offer(self, key: str, ref: int) -> None:
+        for prefix in _prefixes(key):
+            best = self.hot.get(prefix)
+            if best is not None:
+                self.hot[prefix] = self._best([*best, ref], HOT_SIZE)
+
+    def add_product(self, product_id: int, name: str, brand: Optional[str]) -> None:
+        old = self.product_entries.get(product_id)
+        units = self.scores[old][0] if old is not None else 0  # keep sales rank on edits
+        self.remove_product(product_id)
+        self.product_entries[product_id] = self._add(
+            {"kind": "product", "id": product_id, "text": name}, units, keep_sorted=True
+        )
+        if brand and normalize(brand) not in self.brand_entries:
+            self.brand_entries[normalize(brand)] = self._add(
+                {"kind": "brand", "id": None, "text": brand}, 0, keep_sorted=True
+            )
+
+    def remove_product(self, product_id: int) -> None:
+        ref = self.product_entries.pop(product_id, None)
+        if ref is None:
+            return
+        text = self.entries[ref]["text"]
+        # leave a tombstone; its keys go away with the next full rebuild
+        self.entries[ref] = None
+        for key in _word_starts(normalize(text)):
+            for prefix in _prefixes(key):
+                best = self.hot.get(prefix)
+                if best is None or ref not in best:
+                    continue
+                best = [r for r in best if r != ref]
+                if len(best) < MAX_SUGGESTIONS:
+                    best = self._best(self._range(prefix), HOT_SIZE)
+                self.hot[prefix] = best
+
+
+def build() -> SuggestIndex:
+    db = database.SessionLocal()
+    try:
+        products = db.query(
+            models.Product.id,
+            models.Product.name,
+            models.Product.brand,
+            models.Product.category_id,
+        ).all()
+        categories = db.query(models.Category.id, models.Category.name).all()
+        units_sold = dict(
+            db.query(models.OrderItem.product_id, func.sum(models.OrderItem.quantity))
+            .group_by(models.OrderItem.product_id)
+            .all()
+        )
+    finally:
+        db.close()
+    return SuggestIndex(products, categories, units_sold)
+
+
+_index: Optional[SuggestIndex] = None
+_rebuilding = False
+# bumped by every write to the index and by invalidate()
+_generation = 0
+_lock = threading.Lock()
+
+
+def _rebuild() -> None:
+    global _index, _rebuilding
+    generation = _generation
+    try:
+        fresh = build()
+        with _lock:
+            if generation == _generation:
+                _index = fresh
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def get_index() -> SuggestIndex:
+    """Return the current index; builds it on first use, refreshes it when stale."""
+    global _index, _rebuilding
+    index = _index
+    if index is None:
+        with _lock:
+            if _index is None:
+                _index = build()
+            return _index
+    if time.monotonic() - index.built_at > REBUILD_SECONDS and not _rebuilding:
+        with _lock:
+            start, _rebuilding = not _rebuilding, True
+        if start:
+            threading.Thread(target=_rebuild, daemon=True).start()
+    return index
+
+
+def suggest(prefix: str, limit: int = MAX_SUGGESTIONS) -> List[dict]:
+    return get_index().lookup(prefix, limit)
+
+
+def add_product(product: models.Product) -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        if _index is not None:
+            _index.add_product(product.id, product.name, product.brand)
+
+
+def remove_product(product_id: int) -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        if _index is not None:
+            _index.remove_product(product_id)
+
+
+def invalidate() -> None:
+    """Drop the index; the next lookup rebuilds it."""
+    global _index, _generation
+    with _lock:
+        _generation += 1
+        _index = None
@@ -0,0 +1,48 @@
+"""Per-request cost of ``auth.get_current_user``: DB lookup vs token claims.
+
+    python -m benchmarks.auth_overhead [users] [requests]
+
+``legacy token`` only carries ``sub`` and needs the user lookup (the old
+path); ``claims token`` is what ``/auth/login`` issues now.
+"""
+import sys
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import auth, database, models, revocations  # noqa: E402
+
+
+def main() -> None:
+    n_users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    models.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as conn:
+        conn.execute(
+            models.User.__table__.insert(),
+            [{"id": i, "email": f"u{i}@bench.test", "hashed_password": "x"} for i in range(1, n_users + 1)],
+        )
+    db = database.SessionLocal()
+    user = db.get(models.User, n_users // 2)
+    legacy = auth.create_access_token({"sub": user.email})
+    claims = auth.create_user_access_token(user)
+    revocations.sync()
+
+    def verify(token):
+        for _ in range(n):
+            auth.get_current_user(token, db)
+            db.expire_all()
+
+    def decode_only(token):
+        for _ in range(n):
+            auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+
+    report("jwt decode only", timed(decode_only, claims, repeat=3), n)
+    report("legacy token (decode + user query)", timed(verify, legacy, repeat=3), n)
+    report("claims token (decode + revocation map)", timed(verify, claims, repeat=3), n)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
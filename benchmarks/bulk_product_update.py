@@ -0,0 +1,78 @@
+"""Throughput of ``PATCH /admin/products/bulk`` vs. per-product updates.
+
+    python -m benchmarks.bulk_product_update [products] [updates]
+"""
+import random
+import sys
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, schemas  # noqa: E402
+
+
+def seed(n: int) -> None:
+    db = database.SessionLocal()
+    db.execute(
+        models.Product.__table__.insert(),
+        [
+            {
+                "name": f"Product {i}",
+                "price": 10,
+                "mrp": 12,
+                "discount_pct": 16,
+                "stock": 100,
+                "reserved": i % 5,
+            }
+            for i in range(1, n + 1)
+        ],
+    )
+    db.commit()
+    db.close()
+
+
+def make_updates(n_products: int, n_updates: int):
+    rng = random.Random(42)
+    return [
+        schemas.ProductBulkUpdateItem(
+            id=rng.randint(1, n_products),
+            stock_delta=rng.randint(-5, 20),
+            price=round(rng.uniform(5, 50), 2),
+        )
+        for _ in range(n_updates)
+    ]
+
+
+def per_product(items) -> None:
+    db = database.SessionLocal()
+    for item in items:
+        product = crud.get_product(db, item.id)
+        data = schemas.ProductCreate(
+            name=product.name,
+            price=item.price,
+            stock=max(product.stock + item.stock_delta, 0),
+        )
+        crud.update_product(db, product, data)
+    db.close()
+
+
+def bulk(items) -> None:
+    db = database.SessionLocal()
+    crud.bulk_update_products(db, items)
+    db.close()
+
+
+def main() -> None:
+    n_products = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_updates = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    models.Base.metadata.create_all(bind=database.engine)
+    seed(n_products)
+    items = make_updates(n_products, n_updates)
+
+    report("per-product update_product", timed(per_product, items[:500]), 500)
+    report(f"bulk_update_products ({n_updates})", timed(bulk, items, repeat=3), n_updates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Cart page: per-line product fetches vs the one-query cart summary.
+
+    python -m benchmarks.cart_summary [lines] [products]
+
+``per-line`` is what the app did: list the cart items, then load every
+product (``GET /products/{id}`` per line) and add up the totals client-side.
+"""
+import sys
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models  # noqa: E402
+
+
+def seed(db, lines: int, products: int) -> None:
+    db.add(models.User(id=1, email="cart@bench.test", hashed_password="x"))
+    db.add(models.Coupon(code="BENCH10", discount_percent=10, active=True))
+    db.execute(
+        models.Product.__table__.insert(),
+        [{"id": i, "name": f"product {i}", "price": 10 + i % 90, "stock": 100, "reserved": 0}
+         for i in range(1, products + 1)],
+    )
+    step = products // lines
+    db.execute(
+        models.CartItem.__table__.insert(),
+        [{"user_id": 1, "product_id": 1 + i * step, "quantity": 1 + i % 3} for i in range(lines)],
+    )
+    db.commit()
+
+
+def per_line(db) -> None:
+    items = db.query(models.CartItem).filter(models.CartItem.user_id == 1).all()
+    total = 0.0
+    for item in items:
+        product = crud.get_product(db, item.product_id)
+        total += item.quantity * float(product.price)
+    db.query(models.Coupon).filter(models.Coupon.code == "BENCH10").first()
+    db.expire_all()
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, lines, products)
+    report(f"per-line fetches ({lines} lines)", timed(per_line, db, repeat=50), 1)
+    report("cart summary (1 query)", timed(crud.get_cart_summary, db, 1, "BENCH10", repeat=50), 1)
+    report("bulk set quantities", timed(
+        crud.set_cart_quantities, db, 1, {1 + i: 2 for i in range(lines)}, repeat=20), lines)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
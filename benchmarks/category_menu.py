@@ -0,0 +1,58 @@
+"""``GET /categories?counts=true`` on a 4-level taxonomy.
+
+    python -m benchmarks.category_menu [products]
+
+Compares the cached menu (maintained counters rolled up the cached tree)
+with counting in-stock products per category subtree on every request, and
+shows what a rebuild after ``menu.bump()`` costs.
+"""
+import sys
+
+import orjson
+from sqlalchemy import func, select
+
+from .category_tree import seed
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import category_tree, crud, database, menu, models  # noqa: E402
+
+
+def counted_per_request(db) -> bytes:
+    # the naive endpoint: one grouped count, rolled up per subtree
+    own = dict(
+        db.execute(
+            select(models.Product.category_id, func.count())
+            .where(models.Product.stock > 0)
+            .group_by(models.Product.category_id)
+        ).all()
+    )
+    tree = category_tree.get_tree()
+    return orjson.dumps([
+        {**row, "product_count": sum(own.get(m, 0) for m in tree.subtree[row["id"]])}
+        for row in tree.rows
+    ])
+
+
+def rebuilt() -> None:
+    menu.bump()
+    menu.payload("flat", True)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    rows = seed(db, n)
+    report(f"backfill counters ({len(rows)} categories)", timed(crud.recount_in_stock, db), len(rows))
+    assert orjson.loads(menu.payload("flat", True)[0]) == orjson.loads(counted_per_request(db))
+
+    report("group-by count per request", timed(counted_per_request, db, repeat=10), 1)
+    report("rebuild after bump()", timed(rebuilt, repeat=10), 1)
+    report("cached payload", timed(lambda: menu.payload("flat", True), repeat=1000), 1)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
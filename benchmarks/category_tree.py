@@ -0,0 +1,90 @@
+"""Filtering products by an ancestor category on a 4-level taxonomy.
+
+    python -m benchmarks.category_tree [products]
+
+Compares the cached subtree ``IN`` list with resolving descendants by a
+recursive CTE on every request.
+"""
+import random
+import sys
+
+from sqlalchemy import func, select
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import category_tree, database, models  # noqa: E402
+
+FANOUT = (12, 6, 6, 6)  # roots, then children per level: 12 + 72 + 432 + 2592
+BATCH = 50_000
+
+
+def seed(db, n: int) -> list:
+    rows, leaves, next_id = [], [], 1
+    level = [(None, "")]
+    for depth, fanout in enumerate(FANOUT):
+        below = []
+        for parent_id, path in level:
+            for _ in range(fanout):
+                rows.append({"id": next_id, "name": f"c{next_id}", "parent_id": parent_id,
+                             "path": f"{path or '/'}{next_id}/"})
+                below.append((next_id, rows[-1]["path"]))
+                next_id += 1
+        level = below
+    leaves = [cid for cid, _ in level]
+    db.execute(models.Category.__table__.insert(), rows)
+    rng = random.Random(4)
+    for start in range(1, n + 1, BATCH):
+        db.execute(
+            models.Product.__table__.insert(),
+            [{"id": i, "name": f"p{i}", "price": 10, "stock": 1, "category_id": rng.choice(leaves)}
+             for i in range(start, min(start + BATCH, n + 1))],
+        )
+    db.commit()
+    return rows
+
+
+def _page(db, condition) -> None:
+    # same listing query both ways: cheapest 20 in the subtree
+    db.execute(
+        select(models.Product.id, models.Product.name, models.Product.price)
+        .where(condition)
+        .order_by(models.Product.price, models.Product.id)
+        .limit(20)
+    ).all()
+
+
+def cached_filter(db, category_id: int) -> None:
+    _page(db, models.Product.category_id.in_(category_tree.subtree_ids(category_id)))
+
+
+def recursive_filter(db, category_id: int) -> None:
+    c = models.Category
+    tree = select(c.id).where(c.id == category_id).cte(recursive=True)
+    tree = tree.union_all(select(c.id).where(c.parent_id == tree.c.id))
+    _page(db, models.Product.category_id.in_(select(tree.c.id)))
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    rows = seed(db, n)
+    report(f"load tree ({len(rows)} categories)", timed(category_tree.load, repeat=5), len(rows))
+    tree = category_tree.get_tree()
+    root = rows[0]["id"]
+    print(f"{'':<40} root subtree: {len(tree.subtree[root])} categories,"
+          f" {db.scalar(select(func.count()).where(models.Product.category_id.in_(tree.subtree[root])))} products")
+
+    for label, category_id in (("root", root), ("level 2", rows[12]["id"]), ("leaf", rows[-1]["id"])):
+        report(f"{label}: cached subtree IN list",
+               timed(cached_filter, db, category_id, repeat=20), 1)
+        report(f"{label}: recursive CTE per request",
+               timed(recursive_filter, db, category_id, repeat=20), 1)
+    report("GET /categories?view=tree payload (cached)", timed(lambda: category_tree.get_tree().nested, repeat=100), 1)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Shared helpers for the benchmark scripts.
+
+Every script runs against a throwaway SQLite file unless ``BENCH_DATABASE_URL``
+points somewhere else, so benchmarks never touch ``greenbasket.db``.  The
+database URL has to be fixed *before* anything under ``app`` is imported.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+
+def use_scratch_database() -> str:
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        fd, path = tempfile.mkstemp(prefix="greenbasket-bench-", suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    return url
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs) -> float:
+    """Return the median wall time in seconds of ``fn(*args, **kwargs)``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def report(name: str, seconds: float, ops: int) -> None:
+    rate = ops / seconds if seconds else float("inf")
+    print(f"{name:<40} {seconds * 1000:10.1f} ms  {rate:12.0f} ops/s")
@@ -0,0 +1,94 @@
+"""Best-coupon evaluation over many active coupons.
+
+    python -m benchmarks.coupon_rules [coupons] [cart_lines]
+
+Compares the compiled rule set (scope buckets, best percentage first) with
+checking every active coupon against the cart, and with the old per-code
+database lookup.
+"""
+import datetime
+import random
+import sys
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import coupon_rules, database, models  # noqa: E402
+
+CATEGORIES = 200
+BRANDS = [f"Brand {i}" for i in range(500)]
+
+
+def seed(db, n: int) -> None:
+    rng = random.Random(5)
+    now = datetime.datetime.utcnow()
+    rows = []
+    for i in range(1, n + 1):
+        kind = rng.random()
+        rows.append(
+            {
+                "id": i,
+                "code": f"C{i:06d}",
+                "discount_percent": rng.randint(1, 60),
+                "active": True,
+                "min_basket": rng.choice([None, 100, 300, 1000, 5000]),
+                "category_id": rng.randint(1, CATEGORIES) if 0.2 < kind < 0.6 or kind > 0.9 else None,
+                "brand": rng.choice(BRANDS) if kind > 0.6 else None,
+                "per_user_limit": rng.choice([None, None, 1, 3]),
+                "starts_at": now - datetime.timedelta(days=rng.randint(-3, 30)),
+                "ends_at": now + datetime.timedelta(days=rng.randint(1, 30)),
+            }
+        )
+    db.execute(models.Coupon.__table__.insert(), rows)
+    db.commit()
+
+
+def basket(lines: int) -> coupon_rules.Basket:
+    rng = random.Random(9)
+    return coupon_rules.Basket(
+        (rng.randint(1, CATEGORIES), rng.choice(BRANDS), rng.randint(20, 400) * 1.0)
+        for _ in range(lines)
+    )
+
+
+def check_every_coupon(rules: coupon_rules.RuleSet, cart: coupon_rules.Basket, used, now):
+    best = None
+    for rule in rules.by_code.values():
+        discount = cart.discount(rule, used.get(rule.id, 0), now)
+        if discount is not None and (best is None or discount > best.discount):
+            best = coupon_rules.Offer(rule, discount)
+    return best
+
+
+def lookup_by_code(db, code: str) -> None:
+    db.query(models.Coupon).filter(models.Coupon.code == code, models.Coupon.active.is_(True)).first()
+    db.expire_all()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n)
+
+    report(f"compile {n} coupons", timed(coupon_rules.compile_rules, db, repeat=5), n)
+    rules = coupon_rules.compile_rules(db)
+    cart = basket(lines)
+    used = {i: 1 for i in range(1, n + 1, 7)}
+    now = datetime.datetime.utcnow()
+    fast, slow = rules.best(cart, used, now), check_every_coupon(rules, cart, used, now)
+    assert fast.discount == slow.discount, (fast, slow)
+    print(f"{'':<40} best: {fast.rule.code} {fast.rule.discount_percent}% -> {fast.discount}")
+
+    report(f"build basket ({lines} lines)", timed(basket, lines, repeat=200), 1)
+    report("best offer (scope buckets)", timed(rules.best, cart, used, now, repeat=200), 1)
+    report("best offer (check every coupon)", timed(check_every_coupon, rules, cart, used, now, repeat=20), 1)
+    report("one code, DB lookup (old path)", timed(lookup_by_code, db, "C005000", repeat=200), 1)
+    report("one code, compiled rules", timed(rules.by_code.get, "C005000", repeat=200), 1)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
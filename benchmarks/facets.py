@@ -0,0 +1,84 @@
+"""Facet counts on a large catalogue: client-side paging vs grouped query vs cache.
+
+    python -m benchmarks.facets [products]
+
+``client-side paging`` is what the storefront did before: page through
+``GET /products`` (500 per page) and count brands/categories/bands locally.
+"""
+import random
+import sys
+from collections import Counter
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, product_facets  # noqa: E402
+
+BATCH = 50_000
+SEARCHES = {
+    "no filter": {},
+    "q": {"q": "rice"},
+    "brand": {"brand": "Brand7"},
+    "category + price": {"category_id": 4, "price_min": 50, "price_max": 300},
+}
+
+
+def seed(db, n: int) -> None:
+    rng = random.Random(7)
+    words = ["rice", "milk", "apple", "bread", "oil", "soap", "tea", "dal"]
+    db.execute(
+        models.Category.__table__.insert(),
+        [{"id": i, "name": f"Category {i}"} for i in range(1, 41)],
+    )
+    for start in range(1, n + 1, BATCH):
+        db.execute(
+            models.Product.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": f"{rng.choice(words)} {i}",
+                    "brand": f"Brand{rng.randint(1, 300)}",
+                    "price": round(rng.uniform(5, 900), 2),
+                    "stock": 10,
+                    "category_id": rng.randint(1, 40),
+                }
+                for i in range(start, min(start + BATCH, n + 1))
+            ],
+        )
+    db.commit()
+
+
+def client_side(db) -> dict:
+    brands, categories, bands = Counter(), Counter(), Counter()
+    skip = 0
+    while True:
+        page = crud.get_product_rows(db, skip=skip, limit=500)
+        if not page:
+            break
+        for p in page:
+            brands[p["brand"]] += 1
+            categories[p["category_id"]] += 1
+            band = next(b for b, _, hi in crud.PRICE_BANDS if hi is None or p["price"] < hi)
+            bands[band] += 1
+        skip += len(page)
+    return {"brand": brands, "category": categories, "price_band": bands}
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n)
+
+    report("client-side paging (no filter)", timed(client_side, db), n)
+    for name, filters in SEARCHES.items():
+        report(f"grouped query ({name})", timed(crud.get_product_facets, db, **filters, repeat=3), 1)
+    for name, filters in SEARCHES.items():
+        product_facets.facets(db, **filters)
+        report(f"cached ({name})", timed(product_facets.facets, db, **filters, repeat=1000), 1)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""End-to-end load test: seed a synthetic dataset, run uvicorn, drive traffic.
+
+    python -m benchmarks.loadtest --users 500 --products 5000 --orders 20000 \\
+        --clients 32 --duration 30 --output results.json
+    python -m benchmarks.loadtest ... --compare results.json
+
+Virtual clients pick weighted scenarios (browse the catalogue, fill the cart,
+check out, riders taking orders) and every HTTP call is timed under its route
+template.  The report (RPS, p50/p95/p99, status codes per endpoint) is
+printed and written as JSON so runs can be diffed with ``--compare``.
+The database is a scratch SQLite file unless ``--database-url`` is given;
+the server is started here unless ``--base-url`` points at a running one
+(which must use the same database).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from .common import use_scratch_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {"browse": 60, "cart": 25, "checkout": 10, "delivery": 5}
+SEARCH_TERMS = ["apple", "milk", "rice", "oil", "tea", "soap"]
+BATCH = 5_000
+
+
+# ─── Dataset ──────────────────────────────────────────────
+def seed(args) -> dict:
+    """Insert the synthetic dataset and return ids/tokens the clients need."""
+    from app import crud, database, geo, models  # noqa: F401
+    from app import auth
+
+    rng = random.Random(args.seed)
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    conn = db.connection()
+    hashed = auth.get_password_hash("loadtest")
+    now = datetime.datetime.utcnow()
+
+    categories = [f"Category {i}" for i in range(20)]
+    conn.execute(models.Category.__table__.insert(), [{"id": i + 1, "name": n} for i, n in enumerate(categories)])
+
+    def chunks(n):
+        for start in range(1, n + 1, BATCH):
+            yield range(start, min(start + BATCH, n + 1))
+
+    for ids in chunks(args.products):
+        conn.execute(
+            models.Product.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": f"{rng.choice(SEARCH_TERMS).title()} product {i}",
+                    "description": "synthetic",
+                    "brand": f"Brand {i % 50}",
+                    "mrp": 120,
+                    "price": 100,
+                    "discount_pct": 16,
+                    "stock": 10_000_000,
+                    "reserved": 0,
+                    "category_id": i % len(categories) + 1,
+                }
+                for i in ids
+            ],
+        )
+
+    n_people = args.users + args.riders
+    for ids in chunks(n_people):
+        conn.execute(
+            models.User.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "email": f"user{i}@load.test",
+                    "hashed_password": hashed,
+                    "is_active": True,
+                    "is_admin": False,
+                    "is_delivery_partner": i > args.users,
+                }
+                for i in ids
+            ],
+        )
+        points = {i: (rng.uniform(12.90, 13.00), rng.uniform(77.55, 77.65)) for i in ids}
+        conn.execute(
+            models.Address.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "user_id": i,
+                    "address_line": f"{i} Load St",
+                    "city": "Bengaluru",
+                    "pincode": "560001",
+                    "latitude": lat,
+                    "longitude": lon,
+                }
+                for i, (lat, lon) in points.items()
+            ],
+        )
+        conn.execute(
+            models.RiderLocation.__table__.insert(),
+            [
+                {"user_id": i, "latitude": lat, "longitude": lon, "updated_at": now}
+                for i, (lat, lon) in points.items()
+                if i > args.users
+            ],
+        )
+
+    statuses = [models.OrderStatus.delivered.name] * 9 + [models.OrderStatus.paid.name]
+    for ids in chunks(args.orders):
+        rows = []
+        for i in ids:
+            user_id = rng.randint(1, args.users)
+            status = rng.choice(statuses)
+            lat, lon = rng.uniform(12.90, 13.00), rng.uniform(77.55, 77.65)
+            ready = status == models.OrderStatus.paid.name
+            rows.append(
+                {
+                    "id": i,
+                    "user_id": user_id,
+                    "shipping_address_id": user_id,
+                    "created_at": now - datetime.timedelta(minutes=i),
+                    "total": 200.0,
+                    "status": status,
+                    "ready_for_pickup_at": now if ready else None,
+                    "delivery_cell": geo.cell_of(lat, lon) if ready else None,
+                }
+            )
+        conn.execute(models.Order.__table__.insert(), rows)
+        conn.execute(
+            models.OrderItem.__table__.insert(),
+            [
+                {"order_id": i, "product_id": rng.randint(1, args.products), "quantity": 2, "price": 100.0}
+                for i in ids
+            ],
+        )
+    db.commit()
+    db.close()
+
+    def token(uid):
+        # same claims /auth/login issues, so requests take the stateless path
+        user = models.User(
+            id=uid,
+            email=f"user{uid}@load.test",
+            is_admin=False,
+            is_delivery_partner=uid > args.users,
+            token_version=0,
+        )
+        return "Bearer " + auth.create_user_access_token(user)
+
+    return {
+        "customers": [(uid, token(uid)) for uid in range(1, args.users + 1)],
+        "riders": [token(uid) for uid in range(args.users + 1, n_people + 1)],
+    }
+
+
+# ─── Scenarios ────────────────────────────────────────────
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    async def call(self, client, label, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+            status = resp.status_code
+        except httpx.HTTPError:
+            resp, status = None, "error"
+        if self.recording:
+            self.samples[label].append(time.perf_counter() - start)
+            self.statuses[label][str(status)] += 1
+        return resp
+
+
+async def browse(client, rec, rng, ctx, args):
+    params = {"skip": rng.randint(0, max(0, args.products - 20)), "limit": 20}
+    roll = rng.random()
+    if roll < 0.3:
+        params = {"search": rng.choice(SEARCH_TERMS), "limit": 20}
+    elif roll < 0.5:
+        params["category_id"] = rng.randint(1, 20)
+        params["sort"] = rng.choice(["price_asc", "price_desc"])
+    await rec.call(client, "GET /products", "GET", "/products/", params=params)
+
+
+async def cart(client, rec, rng, ctx, args):
+    _, token = rng.choice(ctx["customers"])
+    headers = {"Authorization": token}
+    body = {"product_id": rng.randint(1, args.products), "quantity": 1}
+    await rec.call(client, "POST /cart", "POST", "/cart/", json=body, headers=headers)
+    await rec.call(client, "GET /cart", "GET", "/cart/", headers=headers)
+
+
+async def checkout(client, rec, rng, ctx, args):
+    user_id, token = rng.choice(ctx["customers"])
+    headers = {"Authorization": token}
+    body = {"product_id": rng.randint(1, args.products), "quantity": 1}
+    await rec.call(client, "POST /cart", "POST", "/cart/", json=body, headers=headers)
+    await rec.call(
+        client, "POST /checkout", "POST", "/checkout", params={"address_id": user_id}, headers=headers
+    )
+
+
+async def delivery(client, rec, rng, ctx, args):
+    headers = {"Authorization": rng.choice(ctx["riders"])}
+    resp = await rec.call(
+        client, "GET /delivery/assignable", "GET", "/delivery/assignable",
+        params={"limit": 5}, headers=headers,
+    )
+    if resp is None or resp.status_code != 200 or not resp.json():
+        return
+    order_id = rng.choice(resp.json())["id"]
+    await rec.call(
+        client, "POST /delivery/assign/{order_id}", "POST", f"/delivery/assign/{order_id}",
+        headers=headers,
+    )
+
+
+SCENARIO_FUNCS = {"browse": browse, "cart": cart, "checkout": checkout, "delivery": delivery}
+
+
+async def virtual_client(n, client, rec, ctx, args, deadline):
+    rng = random.Random(args.seed + n)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name] for name in names]
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        await SCENARIO_FUNCS[name](client, rec, rng, ctx, args)
+
+
+async def drive(args, ctx) -> tuple:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        if args.warmup:
+            deadline = time.monotonic() + args.warmup
+            await asyncio.gather(*(virtual_client(n, client, rec, ctx, args, deadline) for n in range(args.clients)))
+        rec.recording = True
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_client(n, client, rec, ctx, args, deadline) for n in range(args.clients)))
+        elapsed = time.monotonic() - start
+    return rec, elapsed
+
+
+# ─── Reporting ────────────────────────────────────────────
+def percentile(sorted_samples, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples) + 0.5) - 1))
+    return sorted_samples[rank]
+
+
+def summarize(samples, statuses, elapsed) -> dict:
+    ordered = sorted(samples)
+    errors = sum(n for s, n in statuses.items() if s == "error" or s.startswith("5"))
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "statuses": dict(statuses),
+    }
+
+
+def build_report(args, rec, elapsed) -> dict:
+    endpoints = {
+        label: summarize(rec.samples[label], rec.statuses[label], elapsed)
+        for label in sorted(rec.samples)
+    }
+    everything = [s for samples in rec.samples.values() for s in samples]
+    merged = defaultdict(int)
+    for statuses in rec.statuses.values():
+        for status, n in statuses.items():
+            merged[status] += n
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "git_commit": commit,
+            "python": platform.python_version(),
+            "elapsed_s": round(elapsed, 2),
+            "config": config,
+        },
+        "endpoints": endpoints,
+        "total": summarize(everything, merged, elapsed),
+    }
+
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    head = f"{'endpoint':<34}{'count':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(head + ("   Δp95     Δrps" if baseline else ""))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for label, r in rows:
+        line = (f"{label:<34}{r['count']:>8}{r['errors']:>6}{r['rps']:>9.1f}"
+                f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+        old = (baseline or {}).get("endpoints", {}).get(label) if label != "TOTAL" else (baseline or {}).get("total")
+        if old:
+            dp95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+            drps = (r["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0.0
+            line += f"{dp95:>+7.1f}%{drps:>+8.1f}%"
+        print(line)
+
+
+# ─── Server ───────────────────────────────────────────────
+def start_server(args, database_url):
+    # every virtual client comes from 127.0.0.1; measure the app, not the limiter
+    env = {"RATE_LIMIT_ENABLED": "0", **os.environ, "DATABASE_URL": database_url}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+         "--no-access-log"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,  # SMS/email placeholders print per order
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{args.base_url}/serviceable/560001", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            break
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not come up")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--riders", type=int, default=20)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-url", default=None, help="use a running server")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", default=None, help="previous results JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ["BENCH_DATABASE_URL"] = args.database_url
+    database_url = use_scratch_database()
+    external = args.base_url is not None
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+
+    print(f"seeding {args.users} users, {args.products} products, {args.orders} orders ...")
+    ctx = seed(args)
+    proc = None if external else start_server(args, database_url)
+    try:
+        print(f"driving {args.clients} clients for {args.duration:.0f}s against {args.base_url}")
+        rec, elapsed = asyncio.run(drive(args, ctx))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    report = build_report(args, rec, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-request overhead of the metrics middleware and SQL event hooks.
+
+    python -m benchmarks.metrics_overhead [requests]
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+from app import metrics, query_timing
+
+
+class _Route:
+    path = "/products/{product_id}"
+
+
+async def bare_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, n: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await app({"type": "http", "method": "GET", "path": "/products/1"}, receive, send)
+    return time.perf_counter() - start
+
+
+def queries(engine, n: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(n):
+            conn.execute(text("SELECT 1"))
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bare = asyncio.run(drive(bare_app, n))
+    wrapped = asyncio.run(drive(metrics.MetricsMiddleware(bare_app), n))
+    print(f"ASGI request  bare {bare / n * 1e6:7.2f} us  with metrics {wrapped / n * 1e6:7.2f} us"
+          f"  overhead {(wrapped - bare) / n * 1e6:6.2f} us/request")
+
+    engine = create_engine("sqlite://")
+    plain = queries(engine, n)
+    query_timing.subscribe(engine, metrics._record_query)
+    hooked = queries(engine, n)
+    print(f"SELECT 1      plain {plain / n * 1e6:6.2f} us  with hooks {hooked / n * 1e6:7.2f} us"
+          f"  overhead {(hooked - plain) / n * 1e6:6.2f} us/query")
+
+
+if __name__ == "__main__":
+    main()
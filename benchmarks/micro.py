@@ -0,0 +1,229 @@
+"""Micro benchmarks for crud/serialization/auth hot paths at fixed data sizes.
+
+    python -m benchmarks.micro --sizes 1000,100000 --output micro.json
+    python -m benchmarks.micro --sizes 1000,100000 --compare micro.json
+
+Every case is timed ``--repeat`` times per dataset size (median and min are
+reported) so scaling is visible side by side.  ``--compare`` flags cases that
+got slower than ``--threshold`` percent against a previous run and exits
+non-zero (changes under ``--min-delta-ms`` are treated as noise), which makes
+it usable as a regression gate.  ``-k`` filters cases
+by substring.  Each size gets its own scratch SQLite database.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .common import use_scratch_database
+
+use_scratch_database()
+
+from app import auth, crud, models, recommendations, schemas  # noqa: E402
+
+BATCH = 50_000
+SERIALIZE_CAP = 100_000  # ORM lists beyond this mostly measure memory
+PRODUCTS = TypeAdapter(list[schemas.Product])
+ORDERS = TypeAdapter(list[schemas.Order])
+
+
+# ─── Dataset ──────────────────────────────────────────────
+def build_database(size: int, rng: random.Random):
+    fd, path = tempfile.mkstemp(prefix=f"greenbasket-micro-{size}-", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    now = datetime.datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            models.Category.__table__.insert(),
+            [{"id": i, "name": f"Category {i}"} for i in range(1, 21)],
+        )
+        conn.execute(
+            models.User.__table__.insert(),
+            [{"id": i, "email": f"u{i}@micro.test", "hashed_password": "x"} for i in range(1, 101)],
+        )
+        for start in range(1, size + 1, BATCH):
+            ids = range(start, min(start + BATCH, size + 1))
+            conn.execute(
+                models.Product.__table__.insert(),
+                [
+                    {
+                        "id": i,
+                        "name": f"{'Apple' if i % 7 == 0 else 'Item'} {i}",
+                        "description": "x" * 80,
+                        "brand": f"Brand{i % 50}",
+                        "mrp": 120,
+                        "price": rng.randint(10, 500),
+                        "discount_pct": 10,
+                        "stock": 100,
+                        "reserved": 0,
+                        "category_id": i % 20 + 1,
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                models.WalletTransaction.__table__.insert(),
+                [{"user_id": 1, "amount": 1.5, "description": "txn", "created_at": now} for _ in ids],
+            )
+            conn.execute(
+                models.Order.__table__.insert(),
+                [
+                    {
+                        "id": i,
+                        "user_id": i % 100 + 1,
+                        "shipping_address_id": 1,
+                        "created_at": now,
+                        "total": 10.0,
+                        "status": models.OrderStatus.delivered.name,
+                    }
+                    for i in ids
+                ],
+            )
+            conn.execute(
+                models.OrderItem.__table__.insert(),
+                [
+                    {"order_id": i, "product_id": rng.randint(1, size), "quantity": 1, "price": 10.0}
+                    for i in ids
+                ],
+            )
+    return sessionmaker(bind=engine, autoflush=False), path
+
+
+# ─── Cases ────────────────────────────────────────────────
+# name -> fn(db, size) returning a zero-arg callable to time
+PRODUCT_FILTERS = {
+    "none": {},
+    "q": {"q": "apple"},
+    "category": {"category_id": 3},
+    "brand": {"brand": "Brand7"},
+    "price_range": {"price_min": 100, "price_max": 200},
+    "sort_price_asc": {"sort": "price_asc"},
+    "sort_price_desc": {"sort": "price_desc"},
+    "all": {"q": "apple", "category_id": 3, "brand": "Brand", "price_min": 50,
+            "price_max": 400, "sort": "price_asc"},
+}
+
+
+def _get_products_case(filters):
+    def setup(db, size):
+        return lambda: crud.get_products(db, limit=20, **filters)
+    return setup
+
+
+def _serialize_products(db, size):
+    rows = db.query(models.Product).limit(min(size, SERIALIZE_CAP)).all()
+    return lambda: PRODUCTS.dump_json(PRODUCTS.validate_python(rows, from_attributes=True))
+
+
+def _serialize_orders(db, size):
+    rows = db.query(models.Order).limit(min(size, SERIALIZE_CAP)).all()
+    for order in rows:
+        order.items  # load relationships up front: this times serialization only
+    return lambda: ORDERS.dump_json(ORDERS.validate_python(rows, from_attributes=True))
+
+
+def _token_roundtrip(db, size):
+    def run():
+        token = auth.create_access_token({"sub": "u1@micro.test"})
+        auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    return run
+
+
+CASES = {f"crud.get_products[{name}]": _get_products_case(f) for name, f in PRODUCT_FILTERS.items()}
+CASES.update(
+    {
+        "schemas.Product serialize": _serialize_products,
+        "schemas.Order serialize": _serialize_orders,
+        "auth.create_access_token+decode": _token_roundtrip,
+        "crud.get_wallet_balance": lambda db, size: (lambda: crud.get_wallet_balance(db, 1)),
+        "recommendations.get_recommendations": (
+            lambda db, size: (lambda: recommendations.get_recommendations(db, 1))
+        ),
+    }
+)
+
+
+def run_case(setup, db, size, repeat):
+    fn = setup(db, size)
+    fn()  # warm caches / first-call costs
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        db.expire_all()
+    return {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    regressions = []
+    for key, r in results.items():
+        old = baseline.get("results", {}).get(key)
+        if not old or not old["median_ms"]:
+            continue
+        change = (r["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+        r["change_pct"] = round(change, 1)
+        # sub-millisecond cases jitter by tens of percent; ignore that noise
+        if change > threshold and r["median_ms"] - old["median_ms"] > min_delta_ms:
+            regressions.append((key, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-k", dest="keyword", default="")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--threshold", type=float, default=20.0, help="percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    cases = {name: fn for name, fn in CASES.items() if args.keyword in name}
+    results = {}
+    for size in sizes:
+        print(f"building dataset with {size} rows ...", file=sys.stderr)
+        Session, path = build_database(size, random.Random(size))
+        db = Session()
+        for name, setup in cases.items():
+            results[f"{name}@{size}"] = run_case(setup, db, size, args.repeat)
+        db.close()
+        os.unlink(path)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(results, json.load(fh), args.threshold, args.min_delta_ms)
+
+    print(f"{'case':<44}" + "".join(f"{s:>20}" for s in sizes) + "   (median ms)")
+    for name in cases:
+        cells = ""
+        for size in sizes:
+            r = results[f"{name}@{size}"]
+            change = f"{r['change_pct']:+.0f}%" if "change_pct" in r else ""
+            cells += f"{r['median_ms']:>14.3f}{change:>6}"
+        print(f"{name:<44}{cells}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"sizes": sizes, "repeat": args.repeat, "results": results}, fh, indent=2)
+    for key, change in regressions:
+        print(f"REGRESSION {key}: {change:+.1f}% (threshold {args.threshold}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Nearest-order lookups for riders over a large dispatch queue.
+
+    python -m benchmarks.nearest_orders [open_orders] [queries]
+
+Compares ``crud.nearest_ready_orders`` (grid cells + indexed ``IN`` lookup)
+with a full scan that ranks every open order by distance.
+"""
+import datetime
+import random
+import sys
+
+from sqlalchemy import select
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, geo, models  # noqa: E402
+
+BATCH = 20_000
+# Roughly the Bengaluru metro area.
+LAT_RANGE = (12.80, 13.10)
+LON_RANGE = (77.45, 77.80)
+
+
+def seed(n: int, rng: random.Random) -> None:
+    db = database.SessionLocal()
+    now = datetime.datetime.utcnow()
+    for start in range(1, n + 1, BATCH):
+        ids = range(start, min(start + BATCH, n + 1))
+        points = {i: (rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for i in ids}
+        db.execute(
+            models.Address.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "address_line": f"{i} Main Rd",
+                    "city": "Bengaluru",
+                    "pincode": "560001",
+                    "latitude": lat,
+                    "longitude": lon,
+                }
+                for i, (lat, lon) in points.items()
+            ],
+        )
+        db.execute(
+            models.Order.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "shipping_address_id": i,
+                    "status": models.OrderStatus.paid.name,
+                    "ready_for_pickup_at": now,
+                    "delivery_cell": geo.cell_of(lat, lon),
+                }
+                for i, (lat, lon) in points.items()
+            ],
+        )
+    db.commit()
+    db.close()
+
+
+def full_scan(db, lat, lon, limit=20):
+    orders, addresses = models.Order.__table__, models.Address.__table__
+    rows = db.execute(
+        select(orders.c.id, addresses.c.latitude, addresses.c.longitude)
+        .join(addresses, addresses.c.id == orders.c.shipping_address_id)
+        .where(orders.c.ready_for_pickup_at.isnot(None))
+    )
+    ranked = sorted((geo.haversine_km(lat, lon, r.latitude, r.longitude), r.id) for r in rows)
+    return ranked[:limit]
+
+
+def run(fn, db, points):
+    for lat, lon in points:
+        fn(db, lat, lon, 20)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    models.Base.metadata.create_all(bind=database.engine)
+    seed(n, rng)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(n_queries)]
+
+    db = database.SessionLocal()
+    assert [o for _, o in crud.nearest_ready_orders(db, *points[0])] == [
+        o for _, o in full_scan(db, *points[0])
+    ]
+    report("nearest_ready_orders (grid)", timed(run, crud.nearest_ready_orders, db, points), n_queries)
+    scans = points[: max(1, n_queries // 20)]
+    report("full scan + sort", timed(run, full_scan, db, scans), len(scans))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
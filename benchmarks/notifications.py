@@ -0,0 +1,106 @@
+"""Notification inbox: badge count, first page and mark-all-read.
+
+    python -m benchmarks.notifications [notifications] [users]
+
+Compares the maintained unread counter with ``COUNT(*)``, a newest-first
+page with fetching the whole history, and the set-based mark-all-read with
+marking notifications one at a time.
+"""
+import datetime
+import random
+import sys
+
+from sqlalchemy import func, select
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models  # noqa: E402
+
+BATCH = 50_000
+
+
+def seed(db, n: int, n_users: int) -> None:
+    db.execute(
+        models.User.__table__.insert(),
+        [{"id": i, "email": f"u{i}@bench.test", "hashed_password": "x"} for i in range(1, n_users + 1)],
+    )
+    rng = random.Random(5)
+    start_time = datetime.datetime.utcnow() - datetime.timedelta(days=60)
+    step = datetime.timedelta(days=60) / n  # spread evenly over the last 60 days
+    for start in range(1, n + 1, BATCH):
+        db.execute(
+            models.Notification.__table__.insert(),
+            [{"id": i, "user_id": rng.randint(1, n_users), "message": f"Order {i} status updated",
+              "created_at": start_time + step * i, "read": rng.random() < 0.8}
+             for i in range(start, min(start + BATCH, n + 1))],
+        )
+    db.commit()
+    # backfill the counters the way a migration would
+    n_table, user = models.Notification.__table__, models.User.__table__
+    unread = (
+        select(func.count()).where(n_table.c.user_id == user.c.id, n_table.c.read.is_(False))
+        .scalar_subquery()
+    )
+    db.execute(user.update().values(unread_notifications=unread))
+    db.commit()
+
+
+def counted_unread(db, user_id: int) -> int:
+    n = models.Notification
+    return db.scalar(select(func.count()).where(n.user_id == user_id, n.read.is_(False)))
+
+
+def whole_history(db, user_id: int) -> None:
+    db.query(models.Notification).filter(models.Notification.user_id == user_id).all()
+    db.expire_all()
+
+
+def first_page(db, user_id: int) -> None:
+    crud.get_notifications(db, user_id, limit=20)
+    db.expire_all()
+
+
+def one_by_one(db, user_id: int) -> None:
+    n = models.Notification
+    for notif in db.query(n).filter(n.user_id == user_id, n.read.is_(False)).all():
+        crud.mark_notification_read(db, notif)
+
+
+def reset_unread(db, user_id: int) -> None:
+    n = models.Notification
+    changed = db.query(n).filter(n.user_id == user_id).update({"read": False})
+    db.query(models.User).filter(models.User.id == user_id).update({"unread_notifications": changed})
+    db.commit()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    n_users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n, n_users)
+    user_id = n_users // 2
+    assert crud.unread_notification_count(db, user_id) == counted_unread(db, user_id)
+    print(f"{'':<40} user {user_id}: {n // n_users} notifications on average")
+
+    report("unread: COUNT(*) per request", timed(counted_unread, db, user_id, repeat=50), 1)
+    report("unread: maintained counter", timed(crud.unread_notification_count, db, user_id, repeat=50), 1)
+    report("list: whole history", timed(whole_history, db, user_id, repeat=20), 1)
+    report("list: newest 20 (indexed)", timed(first_page, db, user_id, repeat=20), 1)
+
+    reset_unread(db, user_id)
+    report("mark read one at a time", timed(one_by_one, db, user_id), 1)
+    reset_unread(db, user_id)
+    report("mark-all-read (one UPDATE)", timed(crud.mark_all_notifications_read, db, user_id), 1)
+
+    aged = datetime.datetime.utcnow() + datetime.timedelta(days=crud.NOTIFICATION_RETENTION_DAYS - 30)
+    seconds = timed(crud.purge_notifications, db, aged)
+    left = db.scalar(select(func.count()).select_from(models.Notification))
+    report(f"retention purge (~half, {left} left)", seconds, n - left)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Peak memory of the streaming order export vs. materialising ``/orders/all``.
+
+    python -m benchmarks.order_export [orders]
+
+Defaults to one million synthetic orders with two items each.  The list
+baseline (ORM objects with lazily loaded items, as ``/orders/all`` does) is
+capped at 20k orders because its memory and time grow with the result.
+Timings are inflated by ``tracemalloc``; compare the peaks, not the seconds.
+"""
+import datetime
+import sys
+import time
+import tracemalloc
+
+from .common import use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models  # noqa: E402,F401
+from app.routers import orders as orders_router  # noqa: E402
+
+BATCH = 50_000
+LIST_BASELINE_CAP = 20_000
+
+
+def seed(n: int) -> None:
+    db = database.SessionLocal()
+    base = datetime.datetime(2025, 1, 1)
+    statuses = list(models.OrderStatus)
+    for start in range(1, n + 1, BATCH):
+        ids = range(start, min(start + BATCH, n + 1))
+        db.execute(
+            models.Order.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "user_id": i % 1000,
+                    "shipping_address_id": i % 1000,
+                    "created_at": base + datetime.timedelta(seconds=i),
+                    "total": 12.5,
+                    "status": statuses[i % len(statuses)].name,
+                }
+                for i in ids
+            ],
+        )
+        db.execute(
+            models.OrderItem.__table__.insert(),
+            [
+                {"order_id": i, "product_id": (i + k) % 500, "quantity": 1 + k, "price": 5.0}
+                for i in ids
+                for k in range(2)
+            ],
+        )
+        db.commit()
+    db.close()
+
+
+def measure(label: str, fn) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {count:>10}  {elapsed:8.1f} s  peak {peak / 2**20:8.1f} MiB")
+
+
+def stream(render, header) -> int:
+    size = 0
+    for chunk in orders_router._stream_export(render, header, None, None, None):
+        size += len(chunk)
+    return size
+
+
+def materialise(limit: int) -> int:
+    db = database.SessionLocal()
+    try:
+        rows = db.query(models.Order).limit(limit).all()
+        payload = [
+            {**{c: getattr(o, c) for c in ("id", "total", "status")}, "items": list(o.items)}
+            for o in rows
+        ]
+        return len(payload)
+    finally:
+        db.close()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    models.Base.metadata.create_all(bind=database.engine)
+    print(f"seeding {n} orders ...")
+    seed(n)
+    measure("stream ndjson (bytes)", lambda: stream(orders_router._ndjson_lines, None))
+    measure("stream csv (bytes)", lambda: stream(orders_router._csv_lines, "header\r\n"))
+    measure(f"ORM list ({min(n, LIST_BASELINE_CAP)} orders)", lambda: materialise(LIST_BASELINE_CAP))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Discount sort and 30-day lowest price on a large catalogue.
+
+    python -m benchmarks.price_history [products]
+
+``sort=discount_desc`` reads the indexed ``effective_discount`` column; the
+"before" number is what a client had to do without it (fetch every product
+and compute the discount itself).
+"""
+import datetime
+import random
+import sys
+
+from sqlalchemy import text
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, schemas  # noqa: E402
+
+BATCH = 50_000
+
+
+def seed(db, n: int) -> None:
+    rng = random.Random(11)
+    db.add(models.Category(id=1, name="bench"))
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(days=40)
+    for start in range(1, n + 1, BATCH):
+        ids = range(start, min(start + BATCH, n + 1))
+        rows = []
+        for i in ids:
+            mrp = rng.randint(20, 500)
+            rows.append({"id": i, "name": f"p{i}", "mrp": mrp, "price": mrp - rng.randint(0, mrp // 2),
+                         "stock": 10, "reserved": 0, "category_id": 1})
+        db.execute(models.Product.__table__.insert(), rows)
+        db.execute(
+            models.PriceHistory.__table__.insert(),
+            [{"product_id": r["id"], "price": r["price"] - 5, "mrp": r["mrp"], "changed_at": long_ago}
+             for r in rows]
+            + [{"product_id": r["id"], "price": r["price"], "mrp": r["mrp"],
+                "changed_at": long_ago + datetime.timedelta(days=1)} for r in rows],
+        )
+    db.commit()
+
+
+def client_side_sort(db) -> None:
+    rows = crud.get_product_rows(db, limit=10**9)
+    sorted(rows, key=lambda r: -(((r["mrp"] or 0) - r["price"]) / r["mrp"] if r["mrp"] else 0))[:20]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n)
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM products ORDER BY effective_discount DESC LIMIT 20"
+    )).all()
+    print(f"{'':<40} plan: {plan[-1][-1]}")
+
+    report("sort=discount_desc (indexed)", timed(crud.get_product_rows, db, sort="discount_desc", repeat=20), 1)
+    report("fetch all + sort client-side", timed(client_side_sort, db, repeat=3), 1)
+
+    product = db.get(models.Product, n // 2)
+    data = schemas.ProductCreate(name=product.name, mrp=float(product.mrp), price=float(product.price),
+                                 stock=10, category_id=1)
+    prices = iter(range(10**6))
+
+    def reprice():
+        data.price = 10 + next(prices) % 7
+        crud.update_product(db, product, data)
+
+    report("update_product with price change", timed(reprice, repeat=200), 1)
+
+    db.execute(models.Product.__table__.update().values(
+        lowest_price_until=datetime.datetime.utcnow() - datetime.timedelta(seconds=1)))
+    db.commit()
+    refreshed = [0]
+
+    def refresh():
+        refreshed[0] = crud.refresh_lowest_prices(db)
+
+    seconds = timed(refresh)
+    report(f"refresh {refreshed[0]} expired lowest prices", seconds, refreshed[0])
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-request overhead of the rate-limit middleware.
+
+    python -m benchmarks.ratelimit_overhead [requests]
+
+Requests come from a spread of client IPs, anonymous and with a bearer
+token (whose claims are cached after the first verification; the in-memory
+revocation check still runs per request).
+"""
+import asyncio
+import sys
+import time
+
+from .common import use_scratch_database
+
+use_scratch_database()
+
+from app import auth, database, models, ratelimit  # noqa: E402
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive(app, n: int, headers) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(n):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/products/1",
+            "headers": headers,
+            "client": (f"10.0.{i % 250}.{i % 1000 // 250}", 40000),
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    models.Base.metadata.create_all(bind=database.engine)
+    # the bench should never hit a limit
+    rules = [
+        ratelimit.Rule(
+            "catalog", ("/",),
+            ratelimit.TokenBucket("bench-ip", 10**9, 10**9),
+            ratelimit.TokenBucket("bench-user", 10**9, 10**9),
+        )
+    ]
+    token = auth.create_access_token({"sub": "bench@example.com", "uid": 1})
+    cases = {
+        "anonymous": [],
+        "bearer token": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    bare = asyncio.run(drive(bare_app, n, []))
+    for label, headers in cases.items():
+        ratelimit.get_backend().reset()
+        wrapped = asyncio.run(drive(ratelimit.RateLimitMiddleware(bare_app, rules), n, headers))
+        print(f"{label:<14} bare {bare / n * 1e6:7.2f} us  with limiter {wrapped / n * 1e6:7.2f} us"
+              f"  overhead {(wrapped - bare) / n * 1e6:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
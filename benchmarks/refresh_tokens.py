@@ -0,0 +1,82 @@
+"""Refresh-token rotation throughput on a large token table, and purge cost.
+
+    python -m benchmarks.refresh_tokens [historical_tokens] [refreshes]
+
+The table is seeded with ``historical_tokens`` rows (default 1M; the request
+target was 10M, which takes a while to seed on SQLite), 90% of them expired.
+Refreshes are timed before and after the purge.
+"""
+import datetime
+import sys
+import time
+import uuid
+
+from .common import report, use_scratch_database
+
+use_scratch_database()
+
+from app import auth, crud, database, models  # noqa: E402
+
+BATCH = 100_000
+
+
+def seed(db, n: int) -> None:
+    now = datetime.datetime.utcnow()
+    db.add(models.User(id=1, email="bench@example.com", hashed_password="x"))
+    db.commit()
+    for start in range(0, n, BATCH):
+        db.execute(
+            models.RefreshToken.__table__.insert(),
+            [
+                {
+                    "user_id": 1,
+                    "token_hash": crud.hash_token(str(i)),
+                    "family_id": f"{i // 5:032x}",
+                    "created_at": now,
+                    # 90% long expired, the rest still valid
+                    "expires_at": now + datetime.timedelta(days=-30 if i % 10 else 30),
+                }
+                for i in range(start, min(start + BATCH, n))
+            ],
+        )
+        db.commit()
+
+
+def refreshes(db, count: int) -> float:
+    """Log in once, then rotate ``count`` times like ``POST /auth/refresh``."""
+    user = db.get(models.User, 1)
+    family = uuid.uuid4().hex
+    expires = datetime.datetime.utcnow() + datetime.timedelta(days=30)
+    token = auth.create_refresh_token({"sub": user.email}, family_id=family)
+    crud.create_refresh_token_record(db, user, token, expires, family)
+    start = time.perf_counter()
+    for _ in range(count):
+        auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        row = crud.get_refresh_token(db, token)
+        token = auth.create_refresh_token({"sub": user.email}, family_id=row.family_id)
+        crud.rotate_refresh_token(db, row, token, expires)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    models.Base.metadata.create_all(bind=database.engine)
+    # the session cap would evict the seeded history on the first login
+    crud.MAX_SESSIONS_PER_USER = n + count
+    db = database.SessionLocal()
+    start = time.perf_counter()
+    seed(db, n)
+    report(f"seed {n} tokens", time.perf_counter() - start, n)
+
+    report(f"refresh with {n} rows", refreshes(db, count), count)
+    start = time.perf_counter()
+    purged = crud.purge_expired_refresh_tokens(db)
+    report(f"purge ({purged} expired)", time.perf_counter() - start, purged)
+    remaining = db.query(models.RefreshToken).count()
+    report(f"refresh with {remaining} rows", refreshes(db, count), count)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Batch planning time for many open orders and riders.
+
+    python -m benchmarks.route_batches [orders] [riders]
+
+Pure in-memory: no database is involved, only ``app.routing``.
+"""
+import random
+import sys
+
+from app import routing
+
+from .common import report, timed
+
+# Roughly the Bengaluru metro area.
+LAT_RANGE = (12.80, 13.10)
+LON_RANGE = (77.45, 77.80)
+
+
+def main() -> None:
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_riders = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(3)
+    point = lambda: (rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE))  # noqa: E731
+    orders = {i: point() for i in range(n_orders)}
+    riders = {10_000 + i: point() for i in range(n_riders)}
+
+    plans = routing.plan_batches(orders, riders)
+    planned = sum(len(stops) for stops in plans.values())
+    print(f"{len(plans)} riders received batches covering {planned}/{n_orders} orders")
+    report(
+        f"plan_batches ({n_orders} orders, {n_riders} riders)",
+        timed(routing.plan_batches, orders, riders, repeat=5),
+        1,
+    )
+    report(
+        "distance_matrix (orders x orders)",
+        timed(routing.distance_matrix, list(orders.values()), list(orders.values()), repeat=5),
+        n_orders * n_orders,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Cost of rendering list endpoints: ORM + response_model vs SQL rows + orjson.
+
+    python -m benchmarks.serialization [items]
+
+``orm+pydantic+json`` is what ``GET /products`` / ``/orders/all`` /
+``/categories`` did before (hydrate ORM objects, validate them against the
+response model, render with the stdlib encoder).  ``rows+orjson`` is the
+current path and ``card rows+orjson`` is ``GET /products?view=card``.  Times
+include the query; results are per 1k items.
+"""
+import datetime
+import sys
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from .common import timed, use_scratch_database
+
+use_scratch_database()
+
+from app import category_tree, crud, database, models, schemas  # noqa: E402
+
+
+def pydantic_render(adapter, response_class, rows):
+    validated = adapter.validate_python(rows, from_attributes=True)
+    return response_class(adapter.dump_python(validated, mode="json")).body
+
+
+def seed(db, n: int) -> None:
+    now = datetime.datetime.utcnow()
+    db.execute(
+        models.Category.__table__.insert(),
+        [{"id": i, "name": f"Category {i}"} for i in range(1, n + 1)],
+    )
+    db.execute(
+        models.Product.__table__.insert(),
+        [
+            {
+                "id": i,
+                "name": f"Product {i}",
+                "description": "Fresh and crunchy, sourced daily",
+                "brand": f"Brand{i % 40}",
+                "mrp": 99.0,
+                "price": 79.5,
+                "discount_pct": 20,
+                "image_url": f"https://cdn.example.com/p/{i}.jpg",
+                "stock": 50,
+                "reserved": 0,
+                "category_id": i % 25 + 1,
+            }
+            for i in range(1, n + 1)
+        ],
+    )
+    db.execute(
+        models.Order.__table__.insert(),
+        [
+            {
+                "id": i,
+                "user_id": 1,
+                "shipping_address_id": 1,
+                "created_at": now,
+                "total": 240.0,
+                "status": models.OrderStatus.delivered.name,
+            }
+            for i in range(1, n + 1)
+        ],
+    )
+    db.execute(
+        models.OrderItem.__table__.insert(),
+        [
+            {"order_id": i // 3 + 1, "product_id": i % n + 1, "quantity": 2, "price": 40.0}
+            for i in range(3 * n)
+        ],
+    )
+    db.commit()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n)
+
+    endpoints = {
+        "products": (
+            TypeAdapter(list[schemas.Product]),
+            lambda: db.query(models.Product).limit(n).all(),
+            lambda: crud.get_product_rows(db, limit=n),
+        ),
+        "orders/all": (
+            TypeAdapter(list[schemas.Order]),
+            lambda: db.query(models.Order).all(),
+            lambda: crud.get_order_rows(db),
+        ),
+        "categories": (
+            TypeAdapter(list[schemas.Category]),
+            lambda: db.query(models.Category).all(),
+            lambda: category_tree.load().rows,
+        ),
+    }
+    print(f"{'endpoint / path':<40} {'ms per 1k items':>16}")
+    for name, (adapter, orm_query, row_query) in endpoints.items():
+        paths = {
+            "orm+pydantic+json": lambda: pydantic_render(adapter, JSONResponse, orm_query()),
+            "orm+pydantic+orjson": lambda: pydantic_render(adapter, ORJSONResponse, orm_query()),
+            "rows+orjson": lambda: ORJSONResponse(row_query()).body,
+        }
+        if name == "products":
+            paths["card rows+orjson"] = lambda: ORJSONResponse(
+                crud.get_product_rows(db, limit=n, fields=crud.PRODUCT_CARD_FIELDS)
+            ).body
+        for label, fn in paths.items():
+            fn()
+            seconds = timed(lambda: (fn(), db.expire_all()), repeat=5)
+            print(f"{name + ' ' + label:<40} {seconds * 1000 / n * 1000:16.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Pincode lookups against a 20k-pincode index.
+
+    python -m benchmarks.serviceability [pincodes] [lookups]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import serviceability  # noqa: E402
+
+
+def write_dataset(path: str, n: int, rng: random.Random) -> list[str]:
+    pincodes = sorted(rng.sample(range(110001, 855117), n))
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["pincode", "zone", "dark_store", "delivery_fee", "eta_minutes"])
+        for p in pincodes:
+            zone = p // 1000
+            writer.writerow([p, f"Z{zone}", f"DS{zone % 200}", zone % 3 * 10, 30 + zone % 4 * 15])
+    return [str(p) for p in pincodes]
+
+
+def lookups(queries) -> None:
+    for p in queries:
+        serviceability.check(p)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    rng = random.Random(11)
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    known = write_dataset(path, n, rng)
+    os.environ["PINCODES_SOURCE"] = path
+
+    start = time.perf_counter()
+    index = serviceability.get_index()
+    print(f"loaded {len(index)} pincodes / {len(index.zones)} zones "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    queries = [rng.choice(known) if rng.random() < 0.8 else str(rng.randint(100000, 999999))
+               for _ in range(n_lookups)]
+    seconds = timed(lookups, queries, repeat=3)
+    report("serviceability.check", seconds, n_lookups)
+    print(f"{seconds / n_lookups * 1e6:.2f} us per lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Concurrent slot bookings: no overbooking, and cached slot listing speed.
+
+    python -m benchmarks.slot_booking [checkouts] [capacity] [threads]
+
+Each checkout books the slot and inserts its order in one transaction, the
+same way ``POST /checkout`` does.
+"""
+import datetime
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, delivery_slots, models  # noqa: E402
+
+ZONE = "BLR-CENTRAL"
+
+
+def checkout(slot_id: int) -> bool:
+    while True:
+        db = database.SessionLocal()
+        try:
+            if not crud.book_delivery_slot(db, slot_id):
+                db.rollback()
+                return False
+            db.add(models.Order(status=models.OrderStatus.paid, delivery_slot_id=slot_id))
+            db.commit()
+            return True
+        except OperationalError:  # SQLite "database is locked": retry
+            db.rollback()
+        finally:
+            db.close()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    now = datetime.datetime.utcnow()
+    for h in range(48):
+        db.add(
+            models.DeliverySlot(
+                zone=ZONE,
+                starts_at=now + datetime.timedelta(hours=h + 1),
+                ends_at=now + datetime.timedelta(hours=h + 2),
+                capacity=capacity,
+            )
+        )
+    db.commit()
+    slot_id = db.query(models.DeliverySlot.id).order_by(models.DeliverySlot.starts_at).first()[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        booked = sum(pool.map(checkout, [slot_id] * n))
+    elapsed = time.perf_counter() - start
+    slot = db.get(models.DeliverySlot, slot_id)
+    orders = db.query(models.Order).filter(models.Order.delivery_slot_id == slot_id).count()
+    print(f"{n} concurrent checkouts, capacity {capacity}: booked {booked}, "
+          f"slot.booked {slot.booked}, orders {orders} in {elapsed:.2f} s")
+    assert booked == slot.booked == orders == min(n, capacity), "overbooked!"
+
+    reads = 20_000
+    report("list_available_slots (uncached)",
+           timed(lambda: [crud.list_available_slots(db, ZONE, now) for _ in range(500)]), 500)
+    report("delivery_slots.available_slots (cached)",
+           timed(lambda: [delivery_slots.available_slots(db, ZONE) for _ in range(reads)]), reads)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Typeahead latency: in-memory prefix index vs ``GET /products?search=``.
+
+    python -m benchmarks.suggest [products]
+"""
+import random
+import sys
+import time
+
+from .common import report, timed, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, suggest  # noqa: E402
+
+BATCH = 50_000
+WORDS = ["organic", "fresh", "amul", "basmati", "rice", "milk", "toned", "whole",
+         "wheat", "atta", "green", "tea", "masala", "oats", "honey", "ghee"]
+PREFIXES = ["o", "or", "org", "organ", "fresh m", "basmati ri", "zzz"]
+
+
+def seed(db, n: int) -> None:
+    rng = random.Random(3)
+    db.execute(
+        models.Category.__table__.insert(),
+        [{"id": i, "name": f"{rng.choice(WORDS)} aisle {i}"} for i in range(1, 61)],
+    )
+    for start in range(1, n + 1, BATCH):
+        ids = range(start, min(start + BATCH, n + 1))
+        db.execute(
+            models.Product.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": " ".join(rng.sample(WORDS, 3)) + f" {i}",
+                    "brand": f"{rng.choice(WORDS).title()} Foods {i % 500}",
+                    "price": 50,
+                    "stock": 10,
+                    "category_id": rng.randint(1, 60),
+                }
+                for i in ids
+            ],
+        )
+        db.execute(
+            models.OrderItem.__table__.insert(),
+            [{"order_id": 1, "product_id": i, "quantity": rng.randint(0, 50), "price": 1} for i in ids],
+        )
+    db.commit()
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    seed(db, n)
+
+    start = time.perf_counter()
+    index = suggest.get_index()
+    report("full build", time.perf_counter() - start, n)
+    print(f"{'':<40} {len(index.keys)} keys, {len(index.hot)} hot prefixes")
+
+    for prefix in PREFIXES:
+        report(f"suggest {prefix!r}", timed(index.lookup, prefix, 8, repeat=2000), 1)
+    for prefix in PREFIXES[2:5]:
+        report(f"ILIKE search {prefix!r}", timed(crud.get_product_rows, db, q=prefix, limit=8, repeat=5), 1)
+
+    product = models.Product(id=n + 1, name="organic fresh mango", brand="Amul Foods 1")
+    report("incremental add", timed(suggest.add_product, product), 1)
+    report("incremental remove", timed(suggest.remove_product, n + 1), 1)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+# ──────────────────────────────────────────────────────────────
+#  Prepare isolated SQLite database *before* importing the app
+# ──────────────────────────────────────────────────────────────
+DB_FD, DB_PATH = tempfile.mkstemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# the suite fires far more requests per client than the API limits allow
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+from app import auth, models, database
+from app.main import app
+from app.dependencies import get_db as orig_get_db
+
+# Create tables on the fresh DB
+models.Base.metadata.create_all(bind=database.engine)
+
+
+# -----------------------------------------------------------------
+# Replace the original get_db dependency so all tests share one DB
+# -----------------------------------------------------------------
+def override_get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+app.dependency_overrides[orig_get_db] = override_get_db
+_client = TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def client():
+    return _client
+
+
+# -----------------------------------------------------------------------------
+# PyTest fixture that creates one admin + one normal user and returns JWT tokens
+# -----------------------------------------------------------------------------
+@pytest.fixture(scope="session")
+def tokens():
+    db = database.SessionLocal()
+    admin = models.User(
+        email="admin@example.com",
+        hashed_password=auth.get_password_hash("admin"),
+        is_admin=True,
+    )
+    user = models.User(
+        email="user@example.com",
+        hashed_password=auth.get_password_hash("user"),
+    )
+    db.add_all([admin, user])
+    db.commit()
+    db.refresh(user)
+
+    admin_token = auth.create_access_token({"sub": admin.email})
+    user_token = auth.create_access_token({"sub": user.email})
+    db.close()
+
+    return {
+        "admin": f"Bearer {admin_token}",
+        "user": f"Bearer {user_token}",
+        "user_id": user.id,
+    }
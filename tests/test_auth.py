@@ -0,0 +1,188 @@
+import datetime
+
+from app import auth, database, models
+
+
+def test_refresh_tokens_hashed_rotated_capped_and_purged(client, monkeypatch):
+    from app import crud, housekeeping
+
+    client.post("/auth/register", json={"email": "rotate@example.com", "password": "pw"})
+    login = client.post("/auth/login", json={"email": "rotate@example.com", "password": "pw"}).json()
+    old = login["refresh_token"]
+    db = database.SessionLocal()
+    stored = crud.get_refresh_token(db, old)
+    assert stored.token_hash == crud.hash_token(old) and old not in stored.token_hash
+    family, user_id = stored.family_id, stored.user_id
+    db.close()
+
+    rotated = client.post("/auth/refresh", json={"refresh_token": old})
+    assert rotated.status_code == 200
+    new = rotated.json()["refresh_token"]
+    # replaying the rotated-out token revokes the whole family
+    assert client.post("/auth/refresh", json={"refresh_token": old}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": new}).status_code == 401
+    db = database.SessionLocal()
+    assert db.query(models.RefreshToken).filter_by(family_id=family).count() == 0
+    db.close()
+
+    # two refreshes with one token: the one that loses the rotation is reuse
+    racing = client.post("/auth/login", json={"email": "rotate@example.com", "password": "pw"}).json()
+    real_get = crud.get_refresh_token
+
+    def loaded_then_rotated_elsewhere(db, token):
+        row = real_get(db, token)
+        other = database.SessionLocal()
+        expires = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        assert crud.rotate_refresh_token(other, real_get(other, token), "winner", expires) is not None
+        other.close()
+        return row
+
+    monkeypatch.setattr(crud, "get_refresh_token", loaded_then_rotated_elsewhere)
+    assert client.post("/auth/refresh", json={"refresh_token": racing["refresh_token"]}).status_code == 401
+    monkeypatch.setattr(crud, "get_refresh_token", real_get)
+    db = database.SessionLocal()
+    assert crud.get_refresh_token(db, "winner") is None  # family revoked
+    db.close()
+
+    monkeypatch.setattr(crud, "MAX_SESSIONS_PER_USER", 3)
+    tokens = [
+        client.post("/auth/login", json={"email": "rotate@example.com", "password": "pw"}).json()
+        for _ in range(5)
+    ]
+    db = database.SessionLocal()
+    assert db.query(models.RefreshToken).filter_by(user_id=user_id).count() == 3
+    assert crud.get_refresh_token(db, tokens[0]["refresh_token"]) is None
+    assert crud.get_refresh_token(db, tokens[-1]["refresh_token"]) is not None
+
+    expired = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    db.add_all(
+        models.RefreshToken(user_id=user_id, token_hash=f"{i:064x}", family_id="old", expires_at=expired)
+        for i in range(25)
+    )
+    db.commit()
+    assert crud.purge_expired_refresh_tokens(db, batch_size=10) == 25
+    db.close()
+    assert housekeeping.run_once()["expired_refresh_tokens"] == 0
+
+
+def test_otp_rate_limit_hot_store_and_sweeper(client, monkeypatch):
+    from app import crud, otp, ratelimit, sms
+
+    sent = []
+
+    class Capture(sms.SMSProvider):
+        def send_sms(self, to, message):
+            sent.append(message.rsplit(" ", 1)[-1])
+
+    monkeypatch.setattr(sms, "get_sms_driver", Capture)
+    monkeypatch.setattr(ratelimit, "_backend", ratelimit.MemoryBackend())
+    phone = {"phone_number": "+919900000001"}
+
+    for _ in range(3):
+        assert client.post("/auth/request-otp", json=phone).status_code == 200
+    limited = client.post("/auth/request-otp", json=phone)
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) > 0
+    assert len(sent) == 3
+
+    # the latest code is answered from the hot store, older ones from the table
+    calls = []
+    monkeypatch.setattr(crud, "verify_otp_code", lambda *a: calls.append(a) or False)
+    ok = client.post("/auth/verify-otp", json={**phone, "code": sent[-1]})
+    assert ok.status_code == 200 and calls == []
+    monkeypatch.undo()
+    monkeypatch.setattr(ratelimit, "_backend", ratelimit.MemoryBackend())
+    assert client.post("/auth/verify-otp", json={**phone, "code": sent[0]}).status_code == 200
+    assert client.post("/auth/verify-otp", json={**phone, "code": sent[0]}).status_code == 400
+    # brute force is cut off
+    codes = [client.post("/auth/verify-otp", json={**phone, "code": "000000"}).status_code for _ in range(5)]
+    assert codes[-1] == 429
+
+    db = database.SessionLocal()
+    db.add(
+        models.OTPRequest(
+            phone_number="+919900000002",
+            code="1",
+            expires_at=datetime.datetime.utcnow() - datetime.timedelta(minutes=1),
+        )
+    )
+    db.commit()
+    # two used codes + the expired one go; the unused live one stays
+    assert crud.purge_otp_requests(db, batch_size=2) == 3
+    assert db.query(models.OTPRequest).filter_by(phone_number=phone["phone_number"]).count() == 1
+    db.close()
+
+
+def test_access_tokens_verify_without_db_and_can_be_revoked(client):
+    from sqlalchemy import event, func
+
+    from app import revocations
+
+    client.post("/auth/register", json={"email": "stateless@example.com", "password": "pw"})
+
+    def login():
+        body = client.post("/auth/login", json={"email": "stateless@example.com", "password": "pw"}).json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["refresh_token"]
+
+    headers, refresh = login()
+    revocations.sync()
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(database.engine, "before_cursor_execute", listener)
+    try:
+        assert client.get("/wallet/balance", headers=headers).status_code == 200
+    finally:
+        event.remove(database.engine, "before_cursor_execute", listener)
+    # only the balance query itself; no user lookup
+    assert not any("FROM users" in s for s in statements)
+    assert client.get("/orders/all", headers=headers).status_code == 403
+
+    other, other_refresh = login()
+    as_bearer = {"Authorization": f"Bearer {other_refresh}"}
+    legacy = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'stateless@example.com'})}"}
+    assert client.get("/wallet/balance", headers=as_bearer).status_code == 401
+    assert client.get("/wallet/balance", headers=legacy).status_code == 200
+    assert client.post("/auth/logout", json={"refresh_token": refresh}, headers=headers).status_code == 200
+    assert client.get("/wallet/balance", headers=headers).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": refresh}).status_code == 401
+    assert client.get("/wallet/balance", headers=other).status_code == 200
+
+    # another worker learns about revocations from the table
+    revocations.reset()
+    assert client.get("/wallet/balance", headers=headers).status_code == 401
+
+    assert client.post("/auth/logout-all", headers=other).status_code == 200
+    assert client.get("/wallet/balance", headers=other).status_code == 401
+    # neither the session's refresh token nor a pre-claims token outlives it
+    assert client.get("/wallet/balance", headers=as_bearer).status_code == 401
+    assert client.get("/wallet/balance", headers=legacy).status_code == 401
+    fresh, _ = login()
+    assert client.get("/wallet/balance", headers=fresh).status_code == 200
+
+    # a revocation whose (lower) id commits after a higher one was synced
+    db = database.SessionLocal()
+    user = db.query(models.User).filter_by(email="stateless@example.com").one()
+    top = db.query(func.max(models.TokenRevocation.id)).scalar()
+    claims = auth.jwt.get_unverified_claims(fresh["Authorization"].split()[1])
+    expires = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    db.add(models.TokenRevocation(id=top + 5, user_id=user.id, jti="0" * 32, expires_at=expires))
+    db.commit()
+    revocations.sync()
+    db.add(models.TokenRevocation(id=top + 2, user_id=user.id, jti=claims["jti"], expires_at=expires))
+    db.commit()
+    revocations.sync()
+    assert client.get("/wallet/balance", headers=fresh).status_code == 401
+
+    # tokens carry the role flags: promoting, demoting or deactivating revokes them
+    staff, _ = login()
+    user.is_admin = True
+    db.commit()
+    assert client.get("/orders/all", headers=staff).status_code == 401
+    staff, _ = login()
+    assert client.get("/orders/all", headers=staff).status_code == 200
+    user.is_admin = False
+    db.commit()
+    assert client.get("/orders/all", headers=staff).status_code == 401
+    user.is_active = False
+    db.commit()
+    db.close()
+    assert client.post("/auth/login", json={"email": "stateless@example.com", "password": "pw"}).status_code == 401
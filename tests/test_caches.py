@@ -0,0 +1,62 @@
+import pytest
+
+from app import category_tree, coupon_rules, crud, database, delivery_slots, product_facets
+
+
+def _value(entry):
+    # cache entries are (expires_at, value)
+    return entry[1] if entry else None
+
+
+# (module whose loader is patched, loader name, read through the cache,
+#  invalidate, the value currently cached)
+CACHES = [
+    pytest.param(
+        category_tree, "load",
+        lambda db: category_tree.get_tree(),
+        category_tree.invalidate,
+        lambda: _value(category_tree._cached),
+        id="category_tree",
+    ),
+    pytest.param(
+        coupon_rules, "compile_rules",
+        coupon_rules.get_rules,
+        coupon_rules.invalidate,
+        lambda: _value(coupon_rules._cached),
+        id="coupon_rules",
+    ),
+    pytest.param(
+        crud, "list_available_slots",
+        lambda db: delivery_slots.available_slots(db, "race-zone"),
+        lambda: delivery_slots.invalidate("race-zone"),
+        lambda: _value(delivery_slots._cache.get("race-zone")),
+        id="delivery_slots",
+    ),
+    pytest.param(
+        crud, "get_product_facets",
+        product_facets.facets,
+        product_facets.invalidate,
+        lambda: _value(product_facets._cache.get(product_facets.signature())),
+        id="product_facets",
+    ),
+]
+
+
+@pytest.mark.parametrize("owner, loader, get, invalidate, cached", CACHES)
+def test_cache_not_filled_when_invalidated_mid_load(monkeypatch, owner, loader, get, invalidate, cached):
+    real = getattr(owner, loader)
+
+    def load_racing_a_write(*args, **kwargs):
+        value = real(*args, **kwargs)
+        invalidate()
+        return value
+
+    db = database.SessionLocal()
+    invalidate()
+    monkeypatch.setattr(owner, loader, load_racing_a_write)
+    get(db)
+    assert cached() is None
+    monkeypatch.setattr(owner, loader, real)
+    value = get(db)
+    assert cached() is value
+    db.close()
@@ -0,0 +1,85 @@
+from app import database, models
+
+
+def test_cart_summary_single_query_and_bulk_update(client, tokens):
+    from sqlalchemy import event
+
+    from app import coupon_rules
+
+    headers = {"Authorization": tokens["user"]}
+    db = database.SessionLocal()
+    apple = models.Product(name="Summary apple", price=2.5, mrp=3, stock=10, reserved=0, image_url="a.png")
+    pear = models.Product(name="Summary pear", price=4, stock=1, reserved=0)
+    coupon = models.Coupon(code="SUMMARY10", discount_percent=10, active=True)
+    db.add_all([apple, pear, coupon])
+    db.commit()
+    apple_id, pear_id = apple.id, pear.id
+    db.close()
+    coupon_rules.invalidate()
+
+    for item in client.get("/cart/", headers=headers).json():
+        client.delete(f"/cart/{item['id']}", headers=headers)
+
+    resp = client.put(
+        "/cart/bulk",
+        json={"items": [{"product_id": apple_id, "quantity": 4}, {"product_id": pear_id, "quantity": 1}]},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    summary = resp.json()
+    assert [(l["name"], l["quantity"], l["line_total"]) for l in summary["items"]] == [
+        ("Summary apple", 4, 10.0),
+        ("Summary pear", 1, 4.0),
+    ]
+    assert summary["items"][0]["image_url"] == "a.png"
+    assert summary["subtotal"] == 14.0 and summary["total"] == 14.0
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/cart/summary", params={"coupon_code": "SUMMARY10"}, headers=headers)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+    assert resp.status_code == 200
+    assert len([s for s in statements if "cart_items" in s]) == 1
+    assert resp.json()["discount"] == 1.4 and resp.json()["total"] == 12.6
+    assert resp.json()["coupon_code"] == "SUMMARY10"
+    assert client.get("/cart/summary", params={"coupon_code": "NOPE"}, headers=headers).status_code == 404
+
+    # all or nothing: pear has no stock left, so apple stays at 4
+    resp = client.put(
+        "/cart/bulk",
+        json={"items": [{"product_id": apple_id, "quantity": 6}, {"product_id": pear_id, "quantity": 2}]},
+        headers=headers,
+    )
+    assert resp.status_code == 400 and resp.json()["detail"] == {"insufficient_stock": [pear_id]}
+    assert client.put("/cart/bulk", json={"items": [{"product_id": 10**9, "quantity": 1}]},
+                      headers=headers).status_code == 404
+
+    resp = client.put(
+        "/cart/bulk",
+        json={"items": [{"product_id": apple_id, "quantity": 2}, {"product_id": pear_id, "quantity": 0}]},
+        headers=headers,
+    )
+    assert [(l["product_id"], l["quantity"]) for l in resp.json()["items"]] == [(apple_id, 2)]
+    db = database.SessionLocal()
+    assert db.get(models.Product, apple_id).reserved == 2
+    assert db.get(models.Product, pear_id).reserved == 0
+    db.close()
+
+    # other carts hold more than is left: the line can't be filled any more,
+    # though stock alone would still cover it
+    db = database.SessionLocal()
+    db.query(models.Product).filter(models.Product.id == apple_id).update({"reserved": 11})
+    db.commit()
+    line = client.get("/cart/summary", headers=headers).json()["items"][0]
+    assert (line["available"], line["in_stock"]) == (-1, False)
+    db.query(models.Product).filter(models.Product.id == apple_id).update({"reserved": 2})
+    db.commit()
+    line = client.get("/cart/summary", headers=headers).json()["items"][0]
+    assert (line["available"], line["in_stock"]) == (8, True)
+    db.close()
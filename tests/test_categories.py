@@ -0,0 +1,143 @@
+import datetime
+
+from app import database, models
+
+
+def test_category_tree_nested_listing_and_ancestor_filter(client, tokens):
+    admin = {"Authorization": tokens["admin"]}
+
+    def create(name, parent_id=None):
+        resp = client.post("/categories/", json={"name": name, "parent_id": parent_id}, headers=admin)
+        assert resp.status_code == 200
+        return resp.json()["id"]
+
+    fresh = create("Tree fruits & veg")
+    fruits = create("Tree fruits", fresh)
+    citrus = create("Tree citrus", fruits)
+    greens = create("Tree greens", fresh)
+    for name, category_id in [("Tree lime", citrus), ("Tree apple", fruits), ("Tree kale", greens)]:
+        client.post("/products/", json={"name": name, "price": 10, "stock": 1, "category_id": category_id},
+                    headers=admin)
+
+    def names(category_id):
+        rows = client.get("/products/", params={"category_id": category_id, "limit": 100}).json()
+        return sorted(r["name"] for r in rows)
+
+    assert names(fresh) == ["Tree apple", "Tree kale", "Tree lime"]
+    assert names(fruits) == ["Tree apple", "Tree lime"]
+    assert names(citrus) == ["Tree lime"]
+
+    tree = client.get("/categories/", params={"view": "tree"}).json()
+    root = next(n for n in tree if n["id"] == fresh)
+    assert [c["name"] for c in root["children"]] == ["Tree fruits", "Tree greens"]
+    assert root["children"][0]["children"] == [{"id": citrus, "name": "Tree citrus", "children": []}]
+    flat = {r["id"]: r for r in client.get("/categories/").json()}
+    assert flat[citrus]["parent_id"] == fruits
+
+    # cycles are refused; moving a subtree rewrites its paths
+    resp = client.put(f"/categories/{fresh}", json={"name": "Tree fruits & veg", "parent_id": citrus},
+                      headers=admin)
+    assert resp.status_code == 400
+    resp = client.put(f"/categories/{fruits}", json={"name": "Tree fruits", "parent_id": greens},
+                      headers=admin)
+    assert resp.status_code == 200
+    assert names(greens) == ["Tree apple", "Tree kale", "Tree lime"]
+    db = database.SessionLocal()
+    assert db.get(models.Category, citrus).path == f"/{fresh}/{greens}/{fruits}/{citrus}/"
+    db.close()
+    assert client.delete(f"/categories/{greens}", headers=admin).status_code == 400
+
+    # an existing name is returned as-is under its own parent, refused under another
+    assert create("Tree citrus", fruits) == citrus
+    resp = client.post("/categories/", json={"name": "Tree citrus", "parent_id": fresh}, headers=admin)
+    assert resp.status_code == 409
+
+
+def test_category_menu_counts_maintained_incrementally_and_cached(client, tokens):
+    from sqlalchemy import event
+
+    from app import crud, menu
+
+    admin = {"Authorization": tokens["admin"]}
+    root = client.post("/categories/", json={"name": "Menu pantry"}, headers=admin).json()["id"]
+    leaf = client.post("/categories/", json={"name": "Menu pulses", "parent_id": root}, headers=admin).json()["id"]
+    other = client.post("/categories/", json={"name": "Menu snacks"}, headers=admin).json()["id"]
+
+    def counts():
+        rows = client.get("/categories/", params={"counts": True}).json()
+        return {r["id"]: r["product_count"] for r in rows if r["id"] in (root, leaf, other)}
+
+    def create(name, category_id, stock):
+        body = {"name": name, "price": 10, "stock": stock, "category_id": category_id}
+        return client.post("/products/", json=body, headers=admin).json()["id"]
+
+    dal = create("Menu dal", leaf, 5)
+    create("Menu rajma", leaf, 0)
+    oil = create("Menu oil", root, 2)
+    assert counts() == {root: 2, leaf: 1, other: 0}
+
+    # out of stock, moved, deleted
+    client.patch("/admin/products/bulk", json={"items": [{"id": dal, "stock": 0}]}, headers=admin)
+    assert counts() == {root: 1, leaf: 0, other: 0}
+    body = {"name": "Menu dal", "price": 10, "stock": 3, "category_id": other}
+    client.put(f"/admin/products/{dal}", json=body, headers=admin)
+    assert counts() == {root: 1, leaf: 0, other: 1}
+    client.delete(f"/admin/products/{dal}", headers=admin)
+    assert counts() == {root: 1, leaf: 0, other: 0}
+
+    # carts reserving the last units take a product out of stock, like its in_stock field
+    user = {"Authorization": tokens["user"]}
+    item = client.post("/cart/", json={"product_id": oil, "quantity": 2}, headers=user).json()["id"]
+    assert counts() == {root: 0, leaf: 0, other: 0}
+    client.put(f"/cart/{item}", params={"quantity": 1}, headers=user)
+    assert counts() == {root: 1, leaf: 0, other: 0}
+    client.put("/cart/bulk", json={"items": [{"product_id": oil, "quantity": 2}]}, headers=user)
+    assert counts() == {root: 0, leaf: 0, other: 0}
+    client.delete(f"/cart/{item}", headers=user)
+    assert counts() == {root: 1, leaf: 0, other: 0}
+
+    # served from the cached payload: no SQL, and a matching ETag gets a 304
+    client.get("/categories/", params={"counts": True, "view": "tree"})
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/categories/", params={"counts": True, "view": "tree"})
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+    assert statements == []
+    node = next(n for n in resp.json() if n["id"] == root)
+    assert node["product_count"] == 1 and node["children"][0]["product_count"] == 0
+    again = client.get("/categories/", params={"counts": True, "view": "tree"},
+                       headers={"If-None-Match": resp.headers["etag"]})
+    assert again.status_code == 304
+
+    # drift from writes that bypass crud is repaired by the housekeeping recount
+    db = database.SessionLocal()
+    db.query(models.Category).filter(models.Category.id == other).update({"in_stock_count": 7})
+    db.commit()
+    assert crud.recount_in_stock(db) >= 1
+    db.close()
+    assert counts()[other] == 0
+    assert menu.payload("flat", True)[1] == client.get("/categories/", params={"counts": True}).headers["etag"]
+
+
+def test_counter_repairs_run_in_one_worker_per_period(monkeypatch):
+    from app import crud, housekeeping
+
+    calls = []
+    monkeypatch.setattr(housekeeping, "REPAIRS", {"recount": lambda db: calls.append(db) or 0})
+    db = database.SessionLocal()
+    db.query(models.JobLease).delete()
+    db.commit()
+    assert housekeeping.repair_once() == {"recount": 0}
+    # every other worker (or a later tick) finds the lease taken
+    assert housekeeping.repair_once() == {}
+    assert len(calls) == 1
+    later = datetime.datetime.utcnow() + datetime.timedelta(seconds=housekeeping.REPAIR_SECONDS + 1)
+    assert crud.claim_job_lease(db, housekeeping.REPAIR_LEASE, 60, now=later)
+    assert not crud.claim_job_lease(db, housekeeping.REPAIR_LEASE, 60, now=later)
+    db.close()
@@ -0,0 +1,116 @@
+import datetime
+
+from app import database, models
+
+
+def test_coupon_rules_scope_window_limit_and_best_offer(client, tokens):
+    from app import coupon_rules, crud
+
+    headers = {"Authorization": tokens["user"]}
+    admin = {"Authorization": tokens["admin"]}
+    now = datetime.datetime.utcnow()
+    db = database.SessionLocal()
+    dairy = models.Category(name="Coupon dairy")
+    db.add(dairy)
+    db.flush()
+    milk = models.Product(name="Coupon milk", brand="Amul", price=50, stock=50, reserved=0, category_id=dairy.id)
+    soap = models.Product(name="Coupon soap", brand="Dove", price=100, stock=50, reserved=0)
+    db.add_all([milk, soap])
+    db.commit()
+    dairy_id, milk_id, soap_id = dairy.id, milk.id, soap.id
+    db.close()
+
+    coupons = [
+        {"id": 9001, "code": "CART5", "discount_percent": 5, "active": True},
+        {"id": 9002, "code": "DAIRY20", "discount_percent": 20, "active": True, "category_id": dairy_id},
+        {"id": 9003, "code": "AMUL50", "discount_percent": 50, "active": True, "brand": "Amul",
+         "min_basket": 500},
+        {"id": 9004, "code": "LATER", "discount_percent": 90, "active": True,
+         "starts_at": (now + datetime.timedelta(days=1)).isoformat()},
+        {"id": 9005, "code": "ONCE", "discount_percent": 30, "active": True, "brand": "Dove",
+         "per_user_limit": 1},
+    ]
+    for coupon in coupons:
+        assert client.post("/coupons/", json=coupon, headers=admin).status_code == 200
+
+    for item in client.get("/cart/", headers=headers).json():
+        client.delete(f"/cart/{item['id']}", headers=headers)
+    client.put("/cart/bulk", json={"items": [{"product_id": milk_id, "quantity": 2}]}, headers=headers)
+
+    # milk 100: DAIRY20 (20) beats CART5 (5); AMUL50 needs 500 of Amul, LATER has not started
+    assert client.get("/coupons/best", headers=headers).json() == {
+        "code": "DAIRY20", "discount_percent": 20, "discount": 20.0}
+    summary = client.get("/cart/summary", params={"coupon_code": "AMUL50"}, headers=headers)
+    assert summary.status_code == 400
+    assert client.get("/cart/summary", params={"coupon_code": "LATER"}, headers=headers).status_code == 400
+
+    # + soap 100: ONCE (30% of 100) beats DAIRY20 (20% of 100)
+    client.put("/cart/bulk", json={"items": [{"product_id": soap_id, "quantity": 1}]}, headers=headers)
+    assert client.get("/coupons/best", headers=headers).json()["code"] == "ONCE"
+    summary = client.get("/cart/summary", params={"coupon_code": "ONCE"}, headers=headers).json()
+    assert (summary["subtotal"], summary["discount"], summary["total"]) == (200.0, 30.0, 170.0)
+
+    # per-user limit is enforced atomically by the counter row
+    db = database.SessionLocal()
+    user_id = db.query(models.User).filter(models.User.email == "user@example.com").first().id
+    assert crud.redeem_coupon(db, 9005, user_id, 1) is True
+    assert crud.redeem_coupon(db, 9005, user_id, 1) is False
+    db.commit()
+    db.close()
+    assert client.get("/coupons/best", headers=headers).json()["code"] == "DAIRY20"
+    assert client.get("/cart/summary", params={"coupon_code": "ONCE"}, headers=headers).status_code == 400
+
+    # editing a coupon invalidates the compiled rules
+    update = {**coupons[0], "discount_percent": 40}
+    assert client.put("/coupons/9001", json=update, headers=admin).status_code == 200
+    assert client.get("/coupons/best", headers=headers).json() == {
+        "code": "CART5", "discount_percent": 40, "discount": 80.0}
+    assert client.put("/coupons/9001", json={**update, "active": False}, headers=admin).status_code == 200
+    assert client.get("/cart/summary", params={"coupon_code": "CART5"}, headers=headers).status_code == 404
+    assert "CART5" not in coupon_rules.get_rules(database.SessionLocal()).by_code
+
+
+def test_coupon_redemption_counted_on_payment_not_on_pending_order(client, tokens):
+    headers = {"Authorization": tokens["user"]}
+    admin = {"Authorization": tokens["admin"]}
+    db = database.SessionLocal()
+    tea = models.Product(name="Redeem tea", price=100, stock=50, reserved=0)
+    db.add(tea)
+    db.commit()
+    tea_id = tea.id
+    db.close()
+    coupon = {"id": 9101, "code": "PAYONCE", "discount_percent": 10, "active": True, "per_user_limit": 1}
+    assert client.post("/coupons/", json=coupon, headers=admin).status_code == 200
+    address_id = client.post(
+        f"/users/{tokens['user_id']}/addresses/",
+        json={"address_line": "1 Redeem Rd", "city": "B", "pincode": "560001"},
+        headers=headers,
+    ).json()["id"]
+
+    def place():
+        for item in client.get("/cart/", headers=headers).json():
+            client.delete(f"/cart/{item['id']}", headers=headers)
+        client.put("/cart/bulk", json={"items": [{"product_id": tea_id, "quantity": 1}]}, headers=headers)
+        resp = client.post("/orders/", params={"address_id": address_id, "coupon_code": "PAYONCE"}, headers=headers)
+        assert resp.status_code == 200 and resp.json()["total"] == 90
+        return resp.json()["id"]
+
+    def redeemed():
+        db = database.SessionLocal()
+        row = db.query(models.CouponRedemption).filter_by(coupon_id=9101, user_id=tokens["user_id"]).first()
+        db.close()
+        return row.count if row else 0
+
+    first, second = place(), place()
+    assert redeemed() == 0  # pending orders do not use up the limit
+    assert client.post(f"/payments/{first}").status_code == 200
+    assert redeemed() == 1
+    resp = client.post(f"/payments/{second}")
+    assert resp.status_code == 400 and resp.json()["detail"] == "Coupon usage limit reached"
+    resp = client.put(f"/orders/{second}/status", params={"status": "paid"}, headers=admin)
+    assert resp.status_code == 400
+    db = database.SessionLocal()
+    assert db.get(models.Order, second).status == models.OrderStatus.pending
+    assert db.query(models.Payment).filter_by(order_id=second).count() == 0
+    db.close()
+    assert redeemed() == 1
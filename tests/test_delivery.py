@@ -0,0 +1,218 @@
+import datetime
+
+import pytest
+
+from app import auth, database, models
+
+
+def test_delivery_claim_next_hands_out_distinct_orders(client):
+    db = database.SessionLocal()
+    riders = [
+        models.User(email=f"rider{i}@example.com", hashed_password="x", is_delivery_partner=True)
+        for i in range(2)
+    ]
+    db.add_all(riders)
+    db.commit()
+    headers = [
+        {"Authorization": f"Bearer {auth.create_access_token({'sub': r.email})}"}
+        for r in riders
+    ]
+    db.close()
+
+    # drain anything left over from other tests
+    while client.post("/delivery/claim-next", headers=headers[0]).status_code == 200:
+        pass
+
+    db = database.SessionLocal()
+    now = datetime.datetime.utcnow()
+    orders = [
+        models.Order(status=models.OrderStatus.paid, ready_for_pickup_at=now)
+        for _ in range(2)
+    ]
+    db.add_all(orders)
+    db.commit()
+    order_ids = {o.id for o in orders}
+    db.close()
+
+    claimed = set()
+    for h in headers:
+        resp = client.post("/delivery/claim-next", headers=h)
+        assert resp.status_code == 200
+        claimed.add(resp.json()["order_id"])
+    assert claimed == order_ids
+
+    resp = client.post("/delivery/claim-next", headers=headers[0])
+    assert resp.status_code == 404
+    resp = client.post(f"/delivery/assign/{min(order_ids)}", headers=headers[1])
+    assert resp.status_code == 400
+
+
+def test_assignable_orders_sorted_by_distance_from_rider(client):
+    from app import geo, schemas
+
+    db = database.SessionLocal()
+    rider = models.User(email="georider@example.com", hashed_password="x", is_delivery_partner=True)
+    db.add(rider)
+    db.commit()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': rider.email})}"}
+    now = datetime.datetime.utcnow()
+    far = models.Address(address_line="far", city="B", pincode="560001", latitude=12.90, longitude=77.60)
+    near = models.Address(address_line="near", city="B", pincode="560001", latitude=12.972, longitude=77.595)
+    # well beyond GEO_MAX_RINGS: not ranked, but still offered
+    remote = models.Address(address_line="remote", city="M", pincode="570001", latitude=12.30, longitude=76.64)
+    db.add_all([far, near, remote])
+    db.commit()
+    orders = [
+        models.Order(
+            status=models.OrderStatus.paid,
+            ready_for_pickup_at=now,
+            shipping_address_id=a.id,
+            delivery_cell=geo.cell_of(a.latitude, a.longitude),
+        )
+        for a in (far, near, remote)
+    ]
+    db.add_all(orders)
+    db.commit()
+    far_id, near_id, remote_id = (o.id for o in orders)
+    db.close()
+
+    resp = client.put(
+        "/delivery/location",
+        json={"latitude": 12.9716, "longitude": 77.5946},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+    resp = client.get("/delivery/assignable", headers=headers)
+    assert resp.status_code == 200
+    ids = [o["id"] for o in resp.json()]
+    assert ids.index(near_id) < ids.index(far_id)
+    nearest = resp.json()[0]
+    assert nearest["id"] == near_id
+    assert nearest["distance_km"] < 1
+    assert nearest["eta_minutes"] >= geo.HANDLING_MINUTES
+    assert ids.index(far_id) < ids.index(remote_id)
+    assert resp.json()[ids.index(remote_id)]["distance_km"] is None
+
+    # the lower bound must hold for every cell outside the searched rings
+    for lat in (0.0, 12.97, 60.0):
+        bound = geo.min_ring_distance_km(lat, 3)
+        assert 0 < bound < geo.haversine_km(lat, 0.001, lat, 0.001 + 4 * geo.CELL_DEGREES)
+        assert bound < geo.haversine_km(lat, 0.001, lat + 4 * geo.CELL_DEGREES, 0.001)
+
+    address = {"address_line": "x", "city": "B", "pincode": "560001"}
+    for bad in ({"latitude": 91, "longitude": 0}, {"latitude": 0, "longitude": -181}):
+        with pytest.raises(ValueError):
+            schemas.AddressBase(**address, **bad)
+
+
+def test_claim_batch_returns_sequenced_route(client, monkeypatch):
+    from app import geo, routing
+
+    db = database.SessionLocal()
+    rider = models.User(email="batchrider@example.com", hashed_password="x", is_delivery_partner=True)
+    db.add(rider)
+    db.commit()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': rider.email})}"}
+    now = datetime.datetime.utcnow()
+    # three drops heading east from the rider, inserted out of order
+    points = [(28.60, 77.23), (28.60, 77.21), (28.60, 77.22)]
+    addresses = [
+        models.Address(address_line="x", city="D", pincode="110001", latitude=lat, longitude=lon)
+        for lat, lon in points
+    ]
+    db.add_all(addresses)
+    db.commit()
+    orders = [
+        models.Order(
+            status=models.OrderStatus.paid,
+            ready_for_pickup_at=now,
+            shipping_address_id=a.id,
+            delivery_cell=geo.cell_of(a.latitude, a.longitude),
+        )
+        for a in addresses
+    ]
+    db.add_all(orders)
+    db.commit()
+    expected = [orders[1].id, orders[2].id, orders[0].id]
+    db.close()
+
+    client.put("/delivery/location", json={"latitude": 28.60, "longitude": 77.20}, headers=headers)
+
+    # a failure partway through the batch leaves every order on the queue
+    eta = routing.stop_eta_minutes
+
+    def fail_on_second_stop(travelled, index):
+        if index == 1:
+            raise RuntimeError("routing failed")
+        return eta(travelled, index)
+
+    monkeypatch.setattr(routing, "stop_eta_minutes", fail_on_second_stop)
+    with pytest.raises(RuntimeError):
+        client.post("/delivery/claim-batch", headers=headers)
+    monkeypatch.setattr(routing, "stop_eta_minutes", eta)
+    db = database.SessionLocal()
+    assert all(db.get(models.Order, o).ready_for_pickup_at is not None for o in expected)
+    assert db.query(models.DeliveryAssignment).filter(
+        models.DeliveryAssignment.order_id.in_(expected)).count() == 0
+    db.close()
+
+    resp = client.post("/delivery/claim-batch", headers=headers)
+    assert resp.status_code == 200
+    stops = resp.json()["stops"]
+    assert [s["order_id"] for s in stops] == expected
+    assert [s["eta_minutes"] for s in stops] == sorted(s["eta_minutes"] for s in stops)
+    db = database.SessionLocal()
+    # the stored ETAs are the route's, not a per-order estimate
+    assert [db.get(models.Order, s["order_id"]).estimated_delivery.isoformat() for s in stops] == [
+        s["estimated_delivery"] for s in stops
+    ]
+    assert {db.get(models.Order, o).status for o in expected} == {models.OrderStatus.out_for_delivery}
+    db.close()
+
+    resp = client.post("/delivery/claim-batch", headers=headers)
+    assert resp.status_code == 404
+
+
+def test_delivery_slots_never_overbook(client, tokens):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app import crud
+
+    start = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+    payload = {
+        "zone": "BLR-CENTRAL",
+        "starts_at": start.isoformat(),
+        "ends_at": (start + datetime.timedelta(hours=2)).isoformat(),
+        "capacity": 5,
+    }
+    resp = client.post("/slots/", json=payload, headers={"Authorization": tokens["admin"]})
+    assert resp.status_code == 200
+    slot_id = resp.json()["id"]
+    # one slot per zone and start time
+    resp = client.post("/slots/", json=payload, headers={"Authorization": tokens["admin"]})
+    assert resp.status_code == 409
+
+    resp = client.get("/slots/560001")
+    assert resp.status_code == 200
+    assert {"id": slot_id, "remaining": 5}.items() <= next(
+        s for s in resp.json() if s["id"] == slot_id
+    ).items()
+
+    def book(_):
+        db = database.SessionLocal()
+        try:
+            ok = crud.book_delivery_slot(db, slot_id)
+            db.commit()
+            return ok
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(book, range(60)))
+    assert sum(results) == 5
+
+    db = database.SessionLocal()
+    assert db.get(models.DeliverySlot, slot_id).booked == 5
+    db.close()
+    assert client.get("/slots/999999").status_code == 404
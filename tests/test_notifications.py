@@ -0,0 +1,87 @@
+import datetime
+
+from app import auth, database, models
+from app.crud import create_notification
+
+
+def test_notification_inbox_counter_pagination_and_retention(client):
+    from app import crud
+
+    db = database.SessionLocal()
+    user = models.User(email="inbox@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': user.email})}"}
+
+    ids = [create_notification(db, user_id, f"message {i}").id for i in range(5)]
+    now = datetime.datetime.utcnow()
+    for age, notif_id in enumerate(reversed(ids)):  # newest first, a minute apart
+        db.query(models.Notification).filter(models.Notification.id == notif_id).update(
+            {"created_at": now - datetime.timedelta(minutes=age)}
+        )
+    db.commit()
+
+    def unread():
+        return client.get("/notifications/unread-count", headers=headers).json()["unread"]
+
+    assert unread() == 5
+    page = client.get("/notifications/", params={"limit": 2}, headers=headers).json()
+    assert [n["id"] for n in page] == ids[:-3:-1]
+    page = client.get("/notifications/", params={"skip": 2, "limit": 2}, headers=headers).json()
+    assert [n["id"] for n in page] == ids[-3:-5:-1]
+    assert client.get("/notifications/", params={"limit": 0}, headers=headers).status_code == 422
+
+    # marking one read twice only counts once
+    for _ in range(2):
+        assert client.patch(f"/notifications/{ids[0]}/read", headers=headers).json()["read"]
+    assert unread() == 4
+
+    # retention: the two oldest (one read, one unread) go, the counter follows
+    db.query(models.Notification).filter(models.Notification.id.in_(ids[:2])).update(
+        {"created_at": now - datetime.timedelta(days=crud.NOTIFICATION_RETENTION_DAYS + 1)},
+        synchronize_session=False,
+    )
+    db.commit()
+    assert crud.purge_notifications(db, batch_size=1) == 2
+    assert unread() == 3
+    assert len(client.get("/notifications/", headers=headers).json()) == 3
+
+    resp = client.post("/notifications/mark-all-read", headers=headers)
+    assert resp.json() == {"updated": 3}
+    assert unread() == 0
+    assert client.post("/notifications/mark-all-read", headers=headers).json() == {"updated": 0}
+
+    # read between the purge's SELECT and its DELETE: decremented once, by the reader
+    from sqlalchemy import event
+
+    stale = create_notification(db, user_id, "stale").id
+    db.query(models.Notification).filter(models.Notification.id == stale).update(
+        {"created_at": now - datetime.timedelta(days=crud.NOTIFICATION_RETENTION_DAYS + 1)}
+    )
+    db.commit()
+    assert unread() == 1
+    raced = []
+
+    def read_first(conn, cursor, statement, *args):
+        if statement.startswith("DELETE FROM notifications") and not raced:
+            raced.append(statement)
+            other = database.SessionLocal()
+            crud.mark_notification_read(other, other.get(models.Notification, stale))
+            other.close()
+
+    event.listen(database.engine, "before_cursor_execute", read_first)
+    try:
+        assert crud.purge_notifications(db) == 1
+    finally:
+        event.remove(database.engine, "before_cursor_execute", read_first)
+    assert raced and unread() == 0
+
+    # drift from writes that bypass crud is repaired by the housekeeping recount
+    db.query(models.User).filter(models.User.id == user_id).update({"unread_notifications": 9})
+    db.commit()
+    create_notification(db, user_id, "fresh")
+    assert crud.recount_unread_notifications(db, batch_size=1) >= 1
+    assert unread() == 1
+    assert crud.recount_unread_notifications(db) == 0
+    db.close()
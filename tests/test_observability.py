@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+
+
+def test_metrics_endpoint_reports_routes_and_queries(client):
+    assert client.get("/products/").status_code == 200
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/products/",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/products/",le="+Inf"}' in body
+    assert 'db_queries_per_request_count{route="/products/"}' in body
+    assert "db_pool_connections_checked_out" in body
+
+
+def test_sql_profiling_flags_n_plus_one_and_sets_server_timing(monkeypatch, caplog):
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine, text
+
+    from app import profiling
+
+    engine = create_engine("sqlite://")
+    profiled = FastAPI()
+    profiling.install(profiled, engine, force=True)
+    monkeypatch.setattr(profiling, "N_PLUS_ONE_THRESHOLD", 3)
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", 0)
+
+    @profiled.get("/items/{item_id}")
+    def items(item_id: int):
+        with engine.connect() as conn:
+            for i in range(5):
+                conn.execute(text("SELECT :v"), {"v": f"secret-{i}"})
+        return {"ok": True}
+
+    with caplog.at_level("WARNING", logger="greenbasket.sql"):
+        resp = TestClient(profiled).get("/items/1")
+    assert resp.status_code == 200
+    assert 'desc="5 queries"' in resp.headers["server-timing"]
+    n_plus_one = [r.getMessage() for r in caplog.records if "N+1" in r.getMessage()]
+    assert len(n_plus_one) == 1 and "route=/items/{item_id}" in n_plus_one[0]
+    assert "secret" not in caplog.text
+
+
+def test_query_timing_shared_by_subscribers_and_clean_after_errors():
+    import pytest
+    from sqlalchemy import create_engine, exc, text
+
+    from app import query_timing
+
+    engine = create_engine("sqlite://")
+    first, second = [], []
+    query_timing.subscribe(engine, lambda statement, *args: first.append(statement))
+    query_timing.subscribe(engine, lambda statement, *args: second.append((statement, args[-1])))
+    with engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        # nothing left behind on the pooled connection by the failed statement
+        assert not any(isinstance(v, list) for v in conn.info.values())
+    assert first == ["SELECT 1"]
+    assert second[0][0] == "SELECT 1" and 0 <= second[0][1] < 1
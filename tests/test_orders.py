@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+from app import database, models
+
+
+def test_export_orders_streams_ndjson_and_csv(client, tokens):
+    db = database.SessionLocal()
+    order = models.Order(user_id=tokens["user_id"], total=4.0, status=models.OrderStatus.paid)
+    db.add(order)
+    db.commit()
+    db.add(models.OrderItem(order_id=order.id, product_id=1, quantity=2, price=2.0))
+    db.commit()
+    order_id = order.id
+    db.close()
+
+    resp = client.get(
+        "/orders/export",
+        params={"status": "paid"},
+        headers={"Authorization": tokens["admin"]},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in resp.text.splitlines()]
+    exported = next(r for r in records if r["id"] == order_id)
+    assert exported["items"] == [{"product_id": 1, "quantity": 2, "price": 2.0}]
+    assert all(r["status"] == "paid" for r in records)
+
+    resp = client.get(
+        "/orders/export",
+        params={"format": "csv"},
+        headers={"Authorization": tokens["admin"]},
+    )
+    assert resp.status_code == 200
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0][0] == "order_id"
+    exported = next(r for r in rows[1:] if r[0] == str(order_id))
+    assert exported[-3:] == ["1", "2", "2.0"]
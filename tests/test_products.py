@@ -0,0 +1,381 @@
+import datetime
+
+from app import database, models
+
+
+def test_bulk_product_update(client, tokens):
+    db = database.SessionLocal()
+    product = models.Product(name="Pear", price=2.0, stock=10, reserved=4)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+
+    resp = client.patch(
+        "/admin/products/bulk",
+        json={
+            "items": [
+                {"id": product_id, "stock_delta": 5, "price": 2.5},
+                {"id": product_id, "stock": 3},
+                {"id": 999999, "stock": 1},
+            ]
+        },
+        headers={"Authorization": tokens["admin"]},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["updated"] == 1
+    assert body["rejected"] == [product_id]  # 3 < 4 reserved
+    assert body["not_found"] == [999999]
+
+    db = database.SessionLocal()
+    product = db.get(models.Product, product_id)
+    assert product.stock == 15
+    assert float(product.price) == 2.5
+    db.close()
+
+    for bad in ({"price": -1}, {"mrp": -0.5}, {"discount_pct": 101}, {"discount_pct": -5}):
+        resp = client.patch(
+            "/admin/products/bulk",
+            json={"items": [{"id": product_id, **bad}]},
+            headers={"Authorization": tokens["admin"]},
+        )
+        assert resp.status_code == 422
+
+    resp = client.patch(
+        "/admin/products/bulk",
+        json={"items": [{"id": product_id, "stock": 1}]},
+        headers={"Authorization": tokens["user"]},
+    )
+    assert resp.status_code == 403
+
+
+def test_bulk_product_update_keeps_stock_changes_committed_meanwhile():
+    from sqlalchemy import event, update
+
+    from app import crud, schemas
+
+    db = database.SessionLocal()
+    product = models.Product(name="Quince", price=2.0, stock=10, reserved=4)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    table = models.Product.__table__
+    sold = []
+
+    def checkout_meanwhile(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE products") and not sold:
+            sold.append(statement)
+            other = database.SessionLocal()
+            other.execute(
+                update(table)
+                .where(table.c.id == product_id)
+                .values(stock=table.c.stock - 2, reserved=table.c.reserved - 2)
+            )
+            other.commit()
+            other.close()
+
+    def bulk(**change):
+        sold.clear()
+        event.listen(database.engine, "before_cursor_execute", checkout_meanwhile)
+        try:
+            return crud.bulk_update_products(db, [schemas.ProductBulkUpdateItem(id=product_id, **change)])
+        finally:
+            event.remove(database.engine, "before_cursor_execute", checkout_meanwhile)
+
+    def stock():
+        db.expire_all()
+        return db.get(models.Product, product_id).stock
+
+    assert bulk(stock_delta=5)["updated"] == 1
+    assert sold and stock() == 13  # 10 - 2 sold + 5
+    # an absolute count is written once the row stops moving
+    assert bulk(stock=20)["updated"] == 1
+    assert sold and stock() == 20
+    db.close()
+
+
+def test_lean_list_endpoints_match_response_schemas(client, tokens):
+    from app import category_tree, schemas
+
+    admin_headers = {"Authorization": tokens["admin"]}
+    db = database.SessionLocal()
+    try:
+        category = models.Category(name="Lean rows")
+        address = models.Address(address_line="x", city="L", pincode="560001")
+        db.add_all([category, address])
+        db.flush()
+        product = models.Product(
+            name="Lean apple", price=12.5, mrp=15, stock=3, category_id=category.id
+        )
+        db.add(product)
+        db.flush()
+        order = models.Order(shipping_address_id=address.id, total=25.0)
+        order.items = [models.OrderItem(product_id=product.id, quantity=2, price=12.5)]
+        db.add(order)
+        db.commit()
+
+        products = (
+            db.query(models.Product)
+            .filter(models.Product.name.ilike("%lean%"))
+            .order_by(models.Product.id)
+            .all()
+        )
+        expected_products = [
+            schemas.Product.model_validate(p, from_attributes=True).model_dump(mode="json")
+            for p in products
+        ]
+        # other tests insert bare orders without an address; skip those
+        orders = (
+            db.query(models.Order)
+            .filter(models.Order.shipping_address_id.isnot(None))
+            .order_by(models.Order.id)
+            .all()
+        )
+        expected_orders = [
+            schemas.Order.model_validate(o, from_attributes=True).model_dump(mode="json")
+            for o in orders
+        ]
+        expected_categories = [
+            {"id": c.id, "name": c.name, "parent_id": c.parent_id}
+            for c in db.query(models.Category).order_by(models.Category.id)
+        ]
+    finally:
+        db.close()
+
+    resp = client.get("/products/", params={"q": "lean", "limit": 100})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert sorted(resp.json(), key=lambda p: p["id"]) == expected_products
+    assert any(p["category"] for p in resp.json())
+
+    resp = client.get("/orders/all", headers=admin_headers)
+    assert resp.status_code == 200
+    listed = [o for o in resp.json() if o["shipping_address_id"] is not None]
+    assert listed == expected_orders
+    assert any(o["items"] for o in listed)
+
+    category_tree.invalidate()  # categories were added behind the API's back
+    assert client.get("/categories/").json() == expected_categories
+
+
+def test_product_card_view_and_field_projection(client):
+    db = database.SessionLocal()
+    category = models.Category(name="Card view")
+    db.add(category)
+    db.flush()
+    db.add_all(
+        [
+            models.Product(name="Card kiwi", price=40, mrp=50, discount_pct=20, stock=5,
+                           reserved=0, category_id=category.id, description="long text"),
+            models.Product(name="Card fig", price=90, stock=2, reserved=2),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    resp = client.get("/products/", params={"q": "card", "view": "card", "sort": "price_asc"})
+    assert resp.status_code == 200
+    kiwi, fig = resp.json()
+    assert kiwi == {
+        "id": kiwi["id"],
+        "name": "Card kiwi",
+        "price": 40.0,
+        "mrp": 50.0,
+        "discount_pct": 20,
+        "image_url": None,
+        "in_stock": True,
+        "category_name": "Card view",
+    }
+    assert fig["in_stock"] is False and fig["category_name"] is None
+
+    resp = client.get("/products/", params={"q": "card", "fields": "id, price,price"})
+    assert [sorted(p) for p in resp.json()] == [["id", "price"], ["id", "price"]]
+
+    assert client.get("/products/", params={"fields": "id,secret"}).status_code == 400
+    assert client.get("/products/", params={"view": "tiny"}).status_code == 400
+
+
+def test_product_facets_counts_and_cache(client, tokens):
+    db = database.SessionLocal()
+    dairy = models.Category(name="Facet dairy")
+    bakery = models.Category(name="Facet bakery")
+    db.add_all([dairy, bakery])
+    db.flush()
+    db.add_all(
+        [
+            models.Product(name="Facet milk", brand="Moo", price=30, stock=1, category_id=dairy.id),
+            models.Product(name="Facet curd", brand="Moo", price=60, stock=1, category_id=dairy.id),
+            models.Product(name="Facet ghee", brand="Gold", price=650, stock=1, category_id=dairy.id),
+            models.Product(name="Facet bun", brand="Oven", price=45, stock=1, category_id=bakery.id),
+        ]
+    )
+    db.commit()
+    dairy_id, bakery_id = dairy.id, bakery.id
+    db.close()
+
+    body = client.get("/products/facets", params={"q": "facet", "brand": "moo"}).json()
+    # the brand facet ignores the brand filter, the others honour it
+    assert body["brand"] == [
+        {"value": "Moo", "count": 2},
+        {"value": "Gold", "count": 1},
+        {"value": "Oven", "count": 1},
+    ]
+    assert body["category"] == [{"id": dairy_id, "name": "Facet dairy", "count": 2}]
+    assert body["price_band"] == [
+        {"value": "0-50", "count": 1},
+        {"value": "50-100", "count": 1},
+    ]
+
+    # cached until a product write invalidates it
+    product_id = client.get("/products/", params={"q": "facet bun"}).json()[0]["id"]
+    db = database.SessionLocal()
+    db.query(models.Product).filter(models.Product.id == product_id).update({"brand": "Moo"})
+    db.commit()
+    db.close()
+    assert client.get("/products/facets", params={"q": "Facet ", "brand": "Moo"}).json() == body
+    resp = client.put(
+        f"/admin/products/{product_id}",
+        json={"name": "Facet bun", "brand": "Moo", "price": 45, "stock": 1, "category_id": bakery_id},
+        headers={"Authorization": tokens["admin"]},
+    )
+    assert resp.status_code == 200
+    body = client.get("/products/facets", params={"q": "facet", "brand": "moo"}).json()
+    assert body["brand"][0] == {"value": "Moo", "count": 3}
+
+
+def test_product_suggest_prefix_ranking_and_incremental_updates(client, tokens):
+    from app import suggest
+
+    db = database.SessionLocal()
+    category = models.Category(name="Zesty snacks")
+    db.add(category)
+    db.flush()
+    chips = models.Product(name="Zesty lime chips", brand="Zorba", price=20, stock=5, category_id=category.id)
+    nuts = models.Product(name="Zesty nuts", brand="Zorba", price=80, stock=5, category_id=category.id)
+    db.add_all([chips, nuts])
+    db.flush()
+    address = models.Address(address_line="x", city="S", pincode="560001")
+    db.add(address)
+    db.flush()
+    order = models.Order(shipping_address_id=address.id, total=80)
+    order.items = [models.OrderItem(product_id=nuts.id, quantity=4, price=80)]
+    db.add(order)
+    db.commit()
+    chips_id, category_id = chips.id, category.id
+    db.close()
+    suggest.invalidate()
+
+    resp = client.get("/products/suggest", params={"q": "zes"})
+    assert resp.status_code == 200
+    texts = [s["text"] for s in resp.json()]
+    # best seller first, then its category, then the unsold product
+    assert texts[:3] == ["Zesty nuts", "Zesty snacks", "Zesty lime chips"]
+    # word starts inside a name match too, and brands are suggested
+    assert client.get("/products/suggest", params={"q": "LIME c"}).json() == [
+        {"kind": "product", "id": chips_id, "text": "Zesty lime chips"}
+    ]
+    assert {"kind": "brand", "id": None, "text": "Zorba"} in client.get(
+        "/products/suggest", params={"q": "zor"}
+    ).json()
+
+    admin = {"Authorization": tokens["admin"]}
+    client.post(
+        "/products/",
+        json={"name": "Zesty mango bar", "price": 30, "stock": 1, "category_id": category_id},
+        headers=admin,
+    )
+    assert client.delete(f"/admin/products/{chips_id}", headers=admin).status_code == 204
+    texts = [s["text"] for s in client.get("/products/suggest", params={"q": "zesty"}).json()]
+    assert "Zesty mango bar" in texts and "Zesty lime chips" not in texts
+    assert texts[0] == "Zesty nuts"
+    assert chips_id not in [s["id"] for s in client.get("/products/suggest", params={"q": "lime"}).json()]
+
+
+def test_product_suggest_rebuild_discarded_when_a_write_lands_meanwhile(monkeypatch):
+    from app import suggest
+
+    db = database.SessionLocal()
+    product = models.Product(name="Yuzu rebuild", price=5, stock=1)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+    suggest.invalidate()
+    serving = suggest.get_index()
+    real_build = suggest.build
+
+    def build_racing_a_delete():
+        index = real_build()
+        suggest.remove_product(product_id)
+        return index
+
+    monkeypatch.setattr(suggest, "build", build_racing_a_delete)
+    suggest._rebuilding = True
+    suggest._rebuild()
+    # the deleted product must not come back with the rebuilt index
+    assert suggest._index is serving and not suggest._rebuilding
+    assert suggest.suggest("yuzu re") == []
+    monkeypatch.setattr(suggest, "build", real_build)
+    suggest._rebuild()
+    assert suggest._index is not serving
+
+
+def test_price_history_discount_sort_and_30_day_lowest(client, tokens):
+    from app import crud
+
+    admin = {"Authorization": tokens["admin"]}
+    db = database.SessionLocal()
+    category = models.Category(name="History fruit")
+    db.add(category)
+    db.commit()
+    body = {"name": "History mango", "brand": "Orchard", "mrp": 200, "price": 150, "stock": 5,
+            "category_id": category.id}
+    db.close()
+    product_id = client.post("/products/", json=body, headers=admin).json()["id"]
+    # 150 -> 120 (PUT) -> 180 (bulk): the lowest stays 120
+    client.put(f"/admin/products/{product_id}", json={**body, "price": 120}, headers=admin)
+    client.patch("/admin/products/bulk", json={"items": [{"id": product_id, "price": 180}]}, headers=admin)
+    client.patch("/admin/products/bulk", json={"items": [{"id": product_id, "stock": 9}]}, headers=admin)
+
+    db = database.SessionLocal()
+    history = (
+        db.query(models.PriceHistory)
+        .filter(models.PriceHistory.product_id == product_id)
+        .order_by(models.PriceHistory.id)
+        .all()
+    )
+    assert [float(h.price) for h in history] == [150, 120, 180]  # stock-only update not recorded
+    product = db.get(models.Product, product_id)
+    assert float(product.lowest_price_30d) == 120
+    assert float(product.effective_discount) == 10.0
+    assert product.lowest_price_until is not None
+
+    # recomputing from history today gives the same answer
+    until = product.lowest_price_until
+    product.lowest_price_until = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    db.commit()
+    assert crud.refresh_lowest_prices(db) >= 1
+    db.refresh(product)
+    assert float(product.lowest_price_30d) == 120
+    assert abs((product.lowest_price_until - until).total_seconds()) < 1
+
+    # 31 days on, 120 has left the window and 180 is the only price in it
+    later = datetime.datetime.utcnow() + datetime.timedelta(days=31)
+    assert crud.refresh_lowest_prices(db, now=later) >= 1
+    db.refresh(product)
+    assert float(product.lowest_price_30d) == 180 and product.lowest_price_until is None
+    db.close()
+
+    client.post("/products/", json={**body, "name": "History deal", "price": 50}, headers=admin)
+    rows = client.get("/products/", params={"sort": "discount_desc", "limit": 2}).json()
+    assert rows[0]["name"] == "History deal" and rows[0]["effective_discount"] == 75.0
+    assert rows[0]["effective_discount"] >= rows[1]["effective_discount"]
+
+    # paging through many equal discounts visits every product exactly once
+    total = len(client.get("/products/", params={"limit": 10_000}).json())
+    seen = []
+    for skip in range(0, total, 2):
+        page = client.get("/products/", params={"sort": "discount_desc", "skip": skip, "limit": 2})
+        seen += [r["id"] for r in page.json()]
+    assert len(seen) == len(set(seen)) == total
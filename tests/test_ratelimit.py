@@ -0,0 +1,111 @@
+import datetime
+
+from fastapi.testclient import TestClient
+
+from app import auth, database
+
+
+def test_rate_limit_memory_eviction_keeps_other_buckets_state():
+    from app import ratelimit
+
+    backend = ratelimit.MemoryBackend()
+    backend.MAX_KEYS = 4
+    # a slow bucket (1 per 10 minutes) is drained...
+    assert backend.take("otp:+91990", 1 / 600, 1, now=0) == 0
+    assert backend.take("otp:+91990", 1 / 600, 1, now=1) > 0
+    # ...then many fast buckets come and go; none of them may reset it
+    for i in range(50):
+        assert backend.take(f"api-ip:10.0.0.{i}", 10, 5, now=2 + i) == 0
+    assert backend.take("otp:+91990", 1 / 600, 1, now=60) > 0
+    assert len(backend._buckets) <= backend.MAX_KEYS + 1
+
+
+def test_rate_limit_middleware_groups_ip_and_user_keys(client):
+    from fastapi import FastAPI
+
+    from app import ratelimit
+
+    backend = ratelimit.MemoryBackend()
+    rules = [
+        ratelimit.Rule("exempt", ("/metrics",), None, None),
+        ratelimit.Rule("login", ("/auth/",), ratelimit.TokenBucket("t-login", 60, 2, backend), None),
+        ratelimit.Rule(
+            "api", ("/",),
+            ratelimit.TokenBucket("t-api-ip", 60, 5, backend),
+            ratelimit.TokenBucket("t-api-user", 60, 2, backend),
+        ),
+    ]
+    limited = FastAPI()
+    limited.add_middleware(ratelimit.RateLimitMiddleware, rules=rules)
+
+    @limited.get("/{path:path}")
+    def anything(path: str):
+        return {"ok": True}
+
+    limited_client = TestClient(limited)
+    # login group: 2 per IP, independent of the api group
+    assert [limited_client.get("/auth/login").status_code for _ in range(3)] == [200, 200, 429]
+    denied = limited_client.get("/auth/login")
+    assert denied.json() == {"detail": "Too many requests"}
+    assert int(denied.headers["retry-after"]) >= 1
+    assert limited_client.get("/orders").status_code == 200
+    assert all(limited_client.get("/metrics").status_code == 200 for _ in range(10))
+
+    # per-user bucket: 2 for user 1 (the IP bucket still has room), user 2 unaffected
+    user1 = {"Authorization": "Bearer " + auth.create_access_token({"sub": "a@x", "uid": 1})}
+    user2 = {"Authorization": "Bearer " + auth.create_access_token({"sub": "b@x", "uid": 2})}
+    statuses = [limited_client.get("/orders", headers=user1).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert limited_client.get("/orders", headers=user2).status_code == 200
+    # ... and the shared IP bucket (5) is now exhausted for everyone
+    assert limited_client.get("/orders", headers=user2).status_code == 429
+
+    # behind a trusted proxy the bucket is the forwarded client's, not the proxy's
+    proxied = FastAPI()
+    proxied.add_middleware(ratelimit.RateLimitMiddleware, rules=rules, trusted_proxies=["testclient", "10.0.0.2"])
+    proxied.get("/{path:path}")(anything)
+    proxied_client = TestClient(proxied)
+
+    def via_proxy(chain):
+        return proxied_client.get("/auth/x", headers={"X-Forwarded-For": chain}).status_code
+
+    assert [via_proxy("203.0.113.7") for _ in range(3)] == [200, 200, 429]
+    assert via_proxy("198.51.100.1, 10.0.0.2") == 200
+    # a client cannot pick a fresh key by prepending its own entries
+    assert via_proxy("1.2.3.4, 203.0.113.7") == 429
+    untrusted = ratelimit.RateLimitMiddleware(None, rules=rules, trusted_proxies=["10.9.9.9"])
+    scope = {"client": ("testclient", 1), "headers": [(b"x-forwarded-for", b"5.6.7.8")]}
+    assert untrusted._client_ip(scope) == "testclient"
+
+
+def test_rate_limit_user_key_is_the_access_token_uid_while_valid(monkeypatch):
+    import time
+    import types
+
+    from app import ratelimit, revocations
+
+    middleware = ratelimit.RateLimitMiddleware(None, rules=[])
+
+    def user_of(token):
+        return middleware._user_id({"headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+    # refresh and pre-claims tokens name no user id: no second, email-keyed bucket
+    assert user_of(auth.create_refresh_token({"sub": "a@x"})) is None
+    assert user_of(auth.create_access_token({"sub": "a@x"})) is None
+    assert user_of("not-a-jwt") is None
+
+    jti = "c" * 32
+    token = auth.create_access_token({"sub": "a@x", "uid": 1, "jti": jti},
+                                     expires_delta=datetime.timedelta(minutes=1))
+    assert user_of(token) == 1
+    # the cached entry lapses with the token...
+    later = types.SimpleNamespace(time=lambda: time.time() + 120, monotonic=time.monotonic)
+    monkeypatch.setattr(ratelimit, "time", later)
+    assert user_of(token) is None and token not in middleware._users
+    monkeypatch.undo()
+    # ...and stops counting once the token is revoked
+    assert user_of(token) == 1
+    db = database.SessionLocal()
+    revocations.revoke_token(db, 1, jti, datetime.datetime.utcnow() + datetime.timedelta(minutes=1))
+    db.close()
+    assert user_of(token) is None
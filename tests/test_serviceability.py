@@ -0,0 +1,43 @@
+import os
+
+
+def test_serviceability_bulk_and_hot_reload(client, tmp_path, monkeypatch):
+    from app import serviceability
+
+    source = tmp_path / "pincodes.csv"
+    source.write_text(
+        "pincode,zone,dark_store,delivery_fee,eta_minutes\n"
+        "400001,MUM-SOUTH,MUM-DS-01,15,40\n"
+    )
+    monkeypatch.setenv("PINCODES_SOURCE", str(source))
+    monkeypatch.setattr(serviceability, "RELOAD_SECONDS", 0)
+    monkeypatch.setattr(serviceability, "_index", None)
+
+    resp = client.get("/serviceable/400001")
+    assert resp.json() == {
+        "pincode": "400001",
+        "serviceable": True,
+        "zone": "MUM-SOUTH",
+        "dark_store": "MUM-DS-01",
+        "delivery_fee": 15.0,
+        "eta_minutes": 40,
+    }
+
+    source.write_text(
+        "pincode,zone,dark_store,delivery_fee,eta_minutes\n"
+        "400002,MUM-SOUTH,MUM-DS-01,15,40\n"
+    )
+    os.utime(source, ns=(0, 1))  # make sure the mtime moves even on coarse clocks
+    resp = client.post("/serviceable/bulk", json={"pincodes": ["400001", "400002", "abc"]})
+    assert resp.status_code == 200
+    assert [r["serviceable"] for r in resp.json()] == [False, True, False]
+
+    # a malformed or half-written file is logged; the last good index keeps serving
+    source.write_text("pincode,zone\n4000")
+    os.utime(source, ns=(0, 2))
+    assert client.get("/serviceable/400002").json()["serviceable"] is True
+    assert serviceability._failed_version == serviceability._source_version(str(source))
+
+    # only six ASCII digits are pincodes ("٤٠٠٠٠٢" is 400002 in Arabic-Indic digits)
+    assert serviceability.get_index().lookup("\u0664\u0660\u0660\u0660\u0660\u0662") is None
+    assert serviceability.get_index().lookup("400002") is not None